@@ -0,0 +1,208 @@
+import argparse
+import json
+import logging
+import os
+
+import numpy as np
+import pandas as pd
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+
+from market_index import MarketIndex
+from markets_dataset import MARKETS_DATASET_PATH
+from strategy_matrix import compile_strategies
+
+logger = logging.getLogger(__name__)
+
+DISCOVERED_TRADES_PATH = './data/discovered_trades.json'
+
+
+def load_market_tokens(path=MARKETS_DATASET_PATH):
+    """
+    One row per token of every market in the markets dataset, open or not.
+
+    Columns: condition_id, market_slug, question, neg_risk, neg_risk_market_id, tradable, token_id,
+    outcome. `tradable` marks active, unclosed markets that accept orders on the order book.
+    Closed and paused markets are kept so neg-risk events can be checked for completeness.
+    """
+    table = pq.read_table(path, columns=['condition_id', 'market_slug', 'question', 'active', 'closed',
+                                         'accepting_orders', 'enable_order_book', 'neg_risk',
+                                         'neg_risk_market_id', 'tokens'])
+    tradable = pc.and_(pc.and_(pc.fill_null(table['active'], False), pc.invert(pc.fill_null(table['closed'], True))),
+                       pc.and_(pc.fill_null(table['accepting_orders'], False),
+                               pc.fill_null(table['enable_order_book'], False)))
+
+    tokens = table['tokens'].combine_chunks()
+    flat_tokens = pc.list_flatten(tokens)
+    repeats = pc.list_value_length(tokens).fill_null(0).to_numpy()
+
+    df = pd.DataFrame({
+        column: np.repeat(table[column].to_numpy(zero_copy_only=False), repeats)
+        for column in ['condition_id', 'market_slug', 'question', 'neg_risk', 'neg_risk_market_id']
+    })
+    df['tradable'] = np.repeat(tradable.to_numpy(zero_copy_only=False), repeats)
+    df['token_id'] = flat_tokens.field('token_id').to_numpy(zero_copy_only=False)
+    df['outcome'] = flat_tokens.field('outcome').to_numpy(zero_copy_only=False)
+    return df.dropna(subset=['token_id', 'market_slug']).drop_duplicates('token_id')
+
+
+def build_candidates(tokens):
+    """
+    Candidate baskets in the strategies.py trades schema, from load_market_tokens rows.
+
+    - Every tradable binary market: buy Yes and No (balanced, pays 1).
+    - Every neg-risk event (markets sharing a neg_risk_market_id, exactly one resolves Yes):
+      buy No on every tradable market (all_no; leaving a market out only raises the payout),
+      and buy Yes on every market (balanced, pays 1). The all-yes basket only pays 1 if it
+      holds every market of the event, so it is skipped when any member is not tradable.
+    """
+    candidates = []
+
+    binary = tokens[tokens['outcome'].isin(['Yes', 'No'])]
+    tradable = binary[binary['tradable'].astype(bool)]
+    for market_slug, question in tradable.groupby('market_slug', sort=False)['question'].first().items():
+        candidates.append({
+            "trade_name": f"{market_slug} yes+no",
+            "subtitle": f"Buy both outcomes of: {question}",
+            "side_a_trades": [(market_slug, "Yes")],
+            "side_b_trades": [(market_slug, "No")],
+            "method": "balanced",
+        })
+
+    neg_risk = binary[binary['neg_risk'].fillna(False).astype(bool) & binary['neg_risk_market_id'].notna()]
+    for event_id, event in neg_risk.groupby('neg_risk_market_id', sort=False):
+        slugs = list(dict.fromkeys(event.loc[event['tradable'].astype(bool), 'market_slug']))
+        if len(slugs) < 2:
+            continue
+        title = event['question'].iloc[0]
+        candidates.append({
+            "trade_name": f"neg-risk {event_id} all no",
+            "subtitle": f"Bet no on all {len(slugs)} mutually exclusive markets, e.g. {title}",
+            "positions": [(slug, "No") for slug in slugs],
+            "method": "all_no",
+        })
+        members = event['market_slug'].nunique()
+        if len(slugs) < members:
+            logger.info(f"Skipping all-yes basket for neg-risk event {event_id}: "
+                        f"only {len(slugs)} of its {members} markets are tradable")
+            continue
+        candidates.append({
+            "trade_name": f"neg-risk {event_id} all yes",
+            "subtitle": f"Bet yes on all {len(slugs)} mutually exclusive markets, e.g. {title}",
+            "side_a_trades": [(slugs[0], "Yes")],
+            "side_b_trades": [(slug, "Yes") for slug in slugs[1:]],
+            "method": "balanced",
+        })
+
+    return candidates
+
+
+def token_market_index(tokens):
+    """MarketIndex over the dataset's tokens, for resolving candidate legs."""
+    lookup = {}
+    for condition_id, market_slug, token_id, outcome in zip(tokens['condition_id'], tokens['market_slug'],
+                                                            tokens['token_id'], tokens['outcome']):
+        market = lookup.setdefault(condition_id, {"market_slug": market_slug, "tokens": []})
+        market["tokens"].append({"token_id": token_id, "outcome": outcome})
+    return MarketIndex(lookup)
+
+
+def rank_candidates(candidates, market_lookup, prices, min_arb=0.0):
+    """
+    Evaluate every candidate against one price per token in a single vectorised pass.
+
+    Args:
+        prices (dict): token_id -> price (e.g. best ask).
+
+    Returns:
+        pd.DataFrame: trade_name, method, legs, arb, sorted by arb descending, arb > min_arb only.
+    """
+    compiled = compile_strategies(candidates, market_lookup)
+    price_vector = np.array([prices.get(token_id, np.nan) for token_id in compiled.token_ids], dtype=float)
+    arb = compiled.evaluate(price_vector[:, None])[:, 0]
+
+    ranking = pd.DataFrame({
+        'trade_name': compiled.trade_names,
+        'method': np.where(compiled.is_all_no, 'all_no', 'balanced'),
+        'legs': compiled.leg_count,
+        'arb': arb,
+    })
+    ranking = ranking[ranking['arb'] > min_arb]
+    return ranking.sort_values('arb', ascending=False, kind='stable').reset_index(drop=True)
+
+
+def book_ask_prices(token_ids, books):
+    """token_id -> best ask from a `books` mapping (OrderBook or streamed L2Book values)."""
+    prices = {}
+    for token_id in token_ids:
+        book = books.get(token_id)
+        if book is not None:
+            price = book.best_ask()[0]
+            if price is not None:
+                prices[token_id] = price
+    return prices
+
+
+def discover_arbitrage(path=MARKETS_DATASET_PATH, books=None, min_arb=0.0, limit=50):
+    """
+    Scan the whole markets dataset for arbitrage baskets.
+
+    Every candidate is ranked once at the best ask of each of its legs, from `books` (e.g. a
+    streaming BookManager) or from the order books of every candidate token, fetched in
+    rate-limited batches. Baskets with a leg that has no ask are left out. Returns up to
+    `limit` ranked candidates in the trades schema (with the arb in the description), ready
+    for process_all_trades.
+    """
+    tokens = load_market_tokens(path)
+    candidates = build_candidates(tokens)
+    market_lookup = token_market_index(tokens)
+    logger.info(f"Built {len(candidates)} candidate baskets from {tokens['market_slug'].nunique()} markets")
+
+    compiled = compile_strategies(candidates, market_lookup)
+    if books is None:
+        from get_order_book import BOOK_BATCH_SIZE, collect_trade_tokens, fetch_order_books
+        books = fetch_order_books(collect_trade_tokens(candidates, market_lookup), batch_size=BOOK_BATCH_SIZE)
+    ranking = rank_candidates(candidates, market_lookup, book_ask_prices(compiled.token_ids, books), min_arb)
+    by_name = {candidate['trade_name']: candidate for candidate in candidates}
+
+    discovered = []
+    for trade_name, arb in zip(ranking['trade_name'].head(limit), ranking['arb'].head(limit)):
+        trade = dict(by_name[trade_name])
+        trade['description'] = f"Discovered basket, {arb:.2f}% arb at ask prices."
+        discovered.append(trade)
+    logger.info(f"Discovered {len(discovered)} baskets with arb above {min_arb}%")
+    return discovered
+
+
+def save_discovered_trades(discovered, path=DISCOVERED_TRADES_PATH):
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    with open(path, 'w') as f:
+        json.dump(discovered, f, indent=4)
+    logger.info(f"Saved {len(discovered)} discovered trades to {path}")
+
+
+def load_discovered_trades(path=DISCOVERED_TRADES_PATH):
+    """Read saved discoveries back into the trades schema (legs as (slug, outcome) tuples)."""
+    with open(path, 'r') as f:
+        discovered = json.load(f)
+    for trade in discovered:
+        for key in ('positions', 'side_a_trades', 'side_b_trades'):
+            if key in trade:
+                trade[key] = [tuple(leg) for leg in trade[key]]
+    return discovered
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    parser = argparse.ArgumentParser(description='Scan the market catalog for arbitrage baskets.')
+    parser.add_argument('--dataset', default=MARKETS_DATASET_PATH, help='Markets Parquet dataset.')
+    parser.add_argument('--limit', type=int, default=50, help='Number of baskets to keep.')
+    parser.add_argument('--min-arb', type=float, default=0.0, help='Minimum arb %% to keep a basket.')
+    parser.add_argument('--output', default=DISCOVERED_TRADES_PATH, help='Where to save the discovered trades.')
+    args = parser.parse_args()
+
+    discovered = discover_arbitrage(args.dataset, min_arb=args.min_arb, limit=args.limit)
+    save_discovered_trades(discovered, args.output)
+    for trade in discovered:
+        print(f"{trade['trade_name']}: {trade['description']}")
@@ -1,9 +1,11 @@
+import argparse
 import csv
 import json
 from py_clob_client.client import ClobClient
 from dotenv import load_dotenv
 import os
 from py_clob_client.clob_types import OpenOrderParams
+from market_sync import END_CURSOR, load_store_markets, sync_markets
 
 # Load environment variables
 load_dotenv("keys.env")
@@ -19,47 +21,53 @@ client = ClobClient(
     chain_id=chain_id
 )
 
-# Initialize variables for pagination
-markets_list = []
-next_cursor = None
+parser = argparse.ArgumentParser(description='Fetch all Polymarket CLOB markets and store them as CSV.')
+parser.add_argument('--incremental', action='store_true',
+                    help='Only fetch pages after the last checkpointed cursor into the local market store.')
+parser.add_argument('--reconcile', action='store_true',
+                    help='Re-walk every page, upserting changes and pruning removed markets in the local store.')
+args = parser.parse_args()
 
-# Fetch all available markets using pagination
-while True:
-    try:
-        # Print the cursor value for debugging
-        print(f"Fetching markets with next_cursor: {next_cursor}")
+if args.incremental or args.reconcile:
+    # Sync the local market store and build the CSV from it instead of re-downloading everything
+    sync_markets(client, reconcile=args.reconcile)
+    markets_list = list(load_store_markets())
+else:
+    # Initialize variables for pagination
+    markets_list = []
+    next_cursor = None
 
-        # Make the API call based on the cursor value
-        if next_cursor is None:
-            response = client.get_markets()
-        else:
-            response = client.get_markets(next_cursor=next_cursor)
+    # Fetch all available markets using pagination
+    while True:
+        try:
+            # Print the cursor value for debugging
+            print(f"Fetching markets with next_cursor: {next_cursor}")
 
-        # Print the raw response for debugging
-        print(f"API Response: {json.dumps(response, indent=2)}")
+            # Make the API call based on the cursor value
+            if next_cursor is None:
+                response = client.get_markets()
+            else:
+                response = client.get_markets(next_cursor=next_cursor)
 
-        # Check if the response is successful and contains data
-        if 'data' not in response:
-            print("No data found in response.")
-            break
-
-        markets_list.extend(response['data'])
-        next_cursor = response.get("next_cursor")
+            # Check if the response is successful and contains data
+            if 'data' not in response:
+                print("No data found in response.")
+                break
 
-        # Exit loop if there's no next_cursor indicating no more data to fetch
-        if not next_cursor:
-            break
+            markets_list.extend(response['data'])
+            print(f"Fetched {len(response['data'])} markets ({len(markets_list)} total)")
+            next_cursor = response.get("next_cursor")
 
-    except Exception as e:
-        # Print the exception details for debugging
-        print(f"Exception occurred: {e}")
-        print(f"Exception details: {e.__class__.__name__}")
-        print(f"Error message: {e.args}")
-        break
+            # Exit loop if there's no next_cursor indicating no more data to fetch
+            if not next_cursor or next_cursor == END_CURSOR:
+                break
 
-# Debugging step: Print out the raw data to understand its structure
-print("Raw Market Data:")
-print(json.dumps(markets_list, indent=2))
+        except Exception as e:
+            # Print the exception details for debugging
+            print(f"Exception occurred: {e}")
+            print(f"Exception details: {e.__class__.__name__}")
+            print(f"Error message: {e.args}")
+            break
 
 # Dynamically extract all keys from the markets to create the CSV columns
 csv_columns = set()
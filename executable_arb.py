@@ -0,0 +1,127 @@
+import logging
+
+import numpy as np
+import pandas as pd
+
+from order_book import OrderBook
+
+logger = logging.getLogger(__name__)
+
+# Share counts the arb is reported at
+DEFAULT_SIZES = (1, 10, 50, 100, 250, 500, 1000, 2500, 5000)
+
+
+def _ask_levels(book):
+    """Ask prices/sizes (best first) of an OrderBook or a streamed L2Book."""
+    if not isinstance(book, OrderBook):
+        book = book.to_order_book()
+    return book.ask_prices, book.ask_sizes
+
+
+def fill_cost(prices, sizes, quantities):
+    """
+    Cost of buying each of `quantities` shares by walking levels sorted best first.
+
+    Returns an array of costs, NaN where the book is not deep enough.
+    """
+    quantities = np.asarray(quantities, dtype=float)
+    depth = np.cumsum(sizes)
+    cost = np.cumsum(prices * sizes)
+    if not len(depth):
+        return np.full(quantities.shape, np.nan)
+
+    # Level at which each quantity is completed, and what was filled before it
+    level = np.searchsorted(depth, quantities, side='left')
+    filled = level >= len(depth)
+    level = np.minimum(level, len(depth) - 1)
+    depth_before = np.where(level > 0, depth[level - 1], 0.0)
+    cost_before = np.where(level > 0, cost[level - 1], 0.0)
+    costs = cost_before + (quantities - depth_before) * prices[level]
+    return np.where(filled, np.nan, costs)
+
+
+def trade_legs(trade):
+    """
+    Legs of a strategy and the payout per share of the full basket.
+
+    A balanced basket pays 1. An all-no basket of n legs pays n - 1, which is the original
+    all_no formula: sum(1 - p) - (1 - max_p) - max_p == n - 1 - sum(p).
+    """
+    if trade.get('method') == 'all_no':
+        legs = trade.get('positions', [])
+        return legs, len(legs) - 1
+    if trade.get('method') == 'balanced':
+        return trade.get('side_a_trades', []) + trade.get('side_b_trades', []), 1
+    return [], None
+
+
+def basket_arbitrage(leg_books, payout, sizes=DEFAULT_SIZES):
+    """
+    Arb % of buying `sizes` shares of every leg at the VWAP of its ask levels.
+
+    Returns (sizes, arb_pct, max_size): arb % per size (NaN where a leg is too thin) and the
+    largest share count at which the basket still costs less than its payout.
+    """
+    sizes = np.asarray(sizes, dtype=float)
+    levels = [_ask_levels(book) for book in leg_books]
+
+    leg_costs = np.vstack([fill_cost(prices, book_sizes, sizes) for prices, book_sizes in levels])
+    arb_pct = (payout - leg_costs.sum(axis=0) / sizes) * 100
+
+    return sizes, arb_pct, max_positive_size(levels, payout)
+
+
+def max_positive_size(levels, payout):
+    """
+    Largest share count at which payout * q exceeds the basket fill cost.
+
+    Profit is piecewise linear in q with breakpoints at every leg's cumulative depth, so it is
+    evaluated at the breakpoints and solved exactly inside the segment where it turns negative.
+    """
+    depths = [np.cumsum(sizes) for _, sizes in levels]
+    if not depths or any(not len(depth) for depth in depths):
+        return 0.0
+    max_depth = min(depth[-1] for depth in depths)
+
+    breakpoints = np.unique(np.concatenate([depth[depth <= max_depth] for depth in depths]))
+    costs = np.vstack([fill_cost(prices, sizes, breakpoints) for prices, sizes in levels]).sum(axis=0)
+    profit = payout * breakpoints - costs
+
+    negative = np.flatnonzero(profit <= 0)
+    if not len(negative):
+        return float(max_depth)
+
+    # Profit is linear between the previous breakpoint (or 0) and the first non-positive one
+    i = negative[0]
+    q0, p0 = (breakpoints[i - 1], profit[i - 1]) if i > 0 else (0.0, 0.0)
+    q1, p1 = breakpoints[i], profit[i]
+    if p0 <= 0:
+        return 0.0
+    return float(q0 + p0 * (q1 - q0) / (p0 - p1))
+
+
+def calculate_executable_arbitrage(trades, get_book, sizes=DEFAULT_SIZES):
+    """
+    Depth-aware arb for every strategy.
+
+    `get_book(slug, outcome)` returns the leg's order book or None. Returns a DataFrame with
+    one row per strategy and size: Trade Name, Size, Arbitrage %, Max Size.
+    """
+    rows = []
+    for trade in trades:
+        trade_name = trade['trade_name']
+        legs, payout = trade_legs(trade)
+        if not legs:
+            continue
+
+        leg_books = [get_book(slug, outcome) for slug, outcome in legs]
+        if any(book is None for book in leg_books):
+            logger.warning(f"Books incomplete for trade: {trade_name}, skipping executable arb.")
+            continue
+
+        trade_sizes, arb_pct, max_size = basket_arbitrage(leg_books, payout, sizes)
+        logger.info(f"Executable arb for {trade_name}: positive up to {max_size:.2f} shares")
+        rows.extend({'Trade Name': trade_name, 'Size': size, 'Arbitrage %': arb, 'Max Size': max_size}
+                    for size, arb in zip(trade_sizes, arb_pct))
+
+    return pd.DataFrame(rows, columns=['Trade Name', 'Size', 'Arbitrage %', 'Max Size'])
@@ -1,6 +1,9 @@
 import pandas as pd
 import json
 import ast
+import os
+from market_catalog import compile_market_catalog
+from markets_dataset import read_market_lookup
 
 def create_market_lookup(csv_file, output_json_file):
     """Create a JSON lookup from a CSV file for condition_id to description, market_slug, and tokens."""
@@ -28,16 +31,48 @@ def create_market_lookup(csv_file, output_json_file):
             "tokens": tokens_info
         }
 
+    write_market_lookup(lookup_dict, output_json_file)
+
+
+def create_market_lookup_from_dataset(dataset_file, output_json_file):
+    """Create the JSON lookup from the Parquet markets dataset, reading the nested tokens column directly."""
+    lookup_dict = read_market_lookup(dataset_file)
+    write_market_lookup(lookup_dict, output_json_file)
+
+
+def write_market_lookup(lookup_dict, output_json_file):
+    """Save the lookup as JSON and compile the binary catalog next to it."""
     # Save the dictionary as a JSON file
     with open(output_json_file, 'w') as json_file:
         json.dump(lookup_dict, json_file, indent=4)
 
     print(f"Lookup JSON file created: {output_json_file}")
 
+    # Compile the memory-mapped catalog next to the JSON so readers can skip parsing it
+    catalog_file = os.path.splitext(output_json_file)[0] + '.bin'
+    compile_market_catalog(lookup_dict, catalog_file)
+    print(f"Market catalog created: {catalog_file}")
+
+def create_market_lookup_from_newest(csv_file, dataset_file, output_json_file):
+    """
+    Build the lookup from whichever of the CSV and the Parquet dataset was written most recently,
+    so a freshly refreshed CSV is never shadowed by an older Parquet file (or vice versa).
+    """
+    sources = [path for path in (dataset_file, csv_file) if os.path.exists(path)]
+    if not sources:
+        raise FileNotFoundError(f"Neither {dataset_file} nor {csv_file} exists")
+    newest = max(sources, key=os.path.getmtime)
+    print(f"Building the market lookup from {newest}")
+    if newest == dataset_file:
+        create_market_lookup_from_dataset(dataset_file, output_json_file)
+    else:
+        create_market_lookup(csv_file, output_json_file)
+
 # Usage
 csv_file = './data/markets_data.csv'  # Replace with your actual file path
+dataset_file = './data/markets_data.parquet'
 output_json_file = './data/market_lookup.json'
-create_market_lookup(csv_file, output_json_file)
+create_market_lookup_from_newest(csv_file, dataset_file, output_json_file)
 
 
 
@@ -57,12 +92,6 @@ def get_market_slug_by_condition_id(lookup_json, condition_id):
 
 
 
-# Usage
-csv_file = './data/markets_data.csv'
-output_json_file = './data/market_lookup.json'
-create_market_lookup(csv_file, output_json_file)
-
-
 # Usage examples
 # print(query_description_by_keyword('market_lookup.json', 'Trump'))
 print(get_market_slug_by_condition_id('./data/market_lookup.json',
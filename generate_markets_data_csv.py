@@ -1,3 +1,4 @@
+import argparse
 import csv
 import json
 import os
@@ -7,6 +8,9 @@ from datetime import datetime, timedelta
 from py_clob_client.client import ClobClient
 from py_clob_client.clob_types import OpenOrderParams
 from py_clob_client.exceptions import PolyApiException
+from market_sync import END_CURSOR, load_store_markets, sync_markets
+from markets_dataset import fetch_markets_to_dataset, write_markets_to_dataset
+from question_index import load_question_index, rebuild_question_index
 
 
 # Access the environment variables
@@ -36,14 +40,14 @@ def fetch_all_markets(client):
             else:
                 response = client.get_markets(next_cursor=next_cursor)
 
-            print(f"API Response: {json.dumps(response, indent=2)}")
             if 'data' not in response:
                 print("No data found in response.")
                 break
 
             markets_list.extend(response['data'])
+            print(f"Fetched {len(response['data'])} markets ({len(markets_list)} total)")
             next_cursor = response.get("next_cursor")
-            if not next_cursor:
+            if not next_cursor or next_cursor == END_CURSOR:
                 break
 
         except Exception as e:
@@ -52,9 +56,6 @@ def fetch_all_markets(client):
             print(f"Error message: {e.args}")
             break
 
-    print("Raw Market Data:")
-    print(json.dumps(markets_list, indent=2))
-
     return markets_list
 
 def extract_specific_market_details(client, condition_id):
@@ -167,6 +168,9 @@ def create_condition_id_question_mapping():
         json.dump(condition_id_question_map, f, indent=2)
     print(f"Condition ID to Question mapping saved to {mapping_file_path}")
 
+    # Rebuild the keyword index from the same markets
+    rebuild_question_index(markets_list)
+
 # Function to check if the mapping file needs to be updated
 def update_mapping_if_needed():
     if os.path.exists(mapping_file_path):
@@ -191,21 +195,13 @@ def load_condition_id_question_mapping():
 
 # Function to search for keywords in questions
 def search_questions(keywords):
-    update_mapping_if_needed()
-    condition_id_question_map = load_condition_id_question_mapping()
-    if not condition_id_question_map:
+    question_index = load_question_index(update_mapping_if_needed, load_condition_id_question_mapping)
+    if not len(question_index):
         print("No mapping data available.")
         return []
 
-    # Ensure all keywords must be found in the question
-    def all_keywords_in_question(question, keywords):
-        return all(keyword.lower() in question.lower() for keyword in keywords)
-
-    matched_items = [
-        (condition_id, question)
-        for condition_id, question in condition_id_question_map.items()
-        if all_keywords_in_question(question, keywords)
-    ]
+    # All keywords must be found in the question (posting-list intersection on the index)
+    matched_items = question_index.search(keywords)
 
     # Print matched condition IDs along with their corresponding questions
     print(f"Matched Condition IDs and Questions for keywords '{', '.join(keywords)}':")
@@ -291,6 +287,26 @@ def update_csv_file_every_minute(csv_file, arb_opportunities):
         time.sleep(60)
 
 if __name__ == "__main__":
-    # Fetch all markets and write to CSV
-    markets_list = fetch_all_markets(client)
-    write_markets_to_csv(markets_list)
+    parser = argparse.ArgumentParser(description='Fetch Polymarket markets and write them to CSV.')
+    parser.add_argument('--incremental', action='store_true',
+                        help='Only fetch pages after the last checkpointed cursor into the local market store.')
+    parser.add_argument('--reconcile', action='store_true',
+                        help='Re-walk every page, upserting changes and pruning removed markets in the local store.')
+    parser.add_argument('--parquet', action='store_true',
+                        help='Stream markets page by page into ./data/markets_data.parquet instead of CSV.')
+    args = parser.parse_args()
+
+    if args.incremental or args.reconcile:
+        # Sync the local store, then write the dump from it
+        sync_markets(client, reconcile=args.reconcile)
+        if args.parquet:
+            write_markets_to_dataset(load_store_markets())
+        else:
+            write_markets_to_csv(list(load_store_markets()))
+    elif args.parquet:
+        # Each page is appended as its own row group, so memory stays bounded to one page
+        fetch_markets_to_dataset(client)
+    else:
+        # Fetch all markets and write to CSV
+        markets_list = fetch_all_markets(client)
+        write_markets_to_csv(markets_list)
@@ -3,6 +3,7 @@ import requests
 import pandas as pd
 import time  # To add delays if necessary
 from dotenv import load_dotenv
+from http_client import get_http_client
 import ast  # Import ast for safe evaluation of string to literal
 
 # Load environment variables
@@ -56,7 +57,7 @@ def fetch_timeseries_data(token_id, slug, outcome, fidelity=60, separator="_", s
 
     try:
         log_message(f"Fetching timeseries data for token_id: {token_id}, slug: '{slug}', outcome: '{outcome}'")
-        response = requests.get(endpoint, headers=headers, params=params)
+        response = get_http_client().get(endpoint, headers=headers, params=params)
         log_message(f"Request URL: {response.url}")
         log_message(f"Response Status Code: {response.status_code}")
 
@@ -3,6 +3,10 @@ import time
 import logging
 from dotenv import load_dotenv
 from py_clob_client.client import ClobClient
+from price_cache import get_price_cache
+from price_service import PriceService
+from rate_limit import HostRateLimiter
+from http_client import get_http_client
 
 # Set up logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(message)s')
@@ -21,45 +25,61 @@ print(f"Using API key: {API_KEY}")
 # Initialize the ClobClient
 client = ClobClient(host, chain_id=chain_id)
 
-# Dictionary to cache live prices
-live_price_cache = {}
+# Live prices are shared with every other script through the tiered price cache
+live_price_cache = get_price_cache()
 CACHE_DURATION = 60  # Cache live prices for 1 minute
 
+# Concurrency and request rate for live price lookups
+MAX_PRICE_WORKERS = 8
+PRICE_REQUESTS_PER_SECOND = 10
+rate_limiter = HostRateLimiter(PRICE_REQUESTS_PER_SECOND)
 
-def get_live_price(token_id):
+
+def _fetch_last_trade_price(token_id):
+    try:
+        rate_limiter.acquire(host)
+        price = get_http_client().call(host, client.get_last_trade_price, token_id=token_id).get('price')
+        logger.info(f"Fetched live price for {token_id}: {price}")
+        return price
+    except Exception as e:
+        logger.error(f"Failed to fetch live price for token {token_id}: {str(e)}")
+        return None
+
+
+# Concurrent reads of a token share one request, and stale prices are served while they refresh
+live_price_service = PriceService(_fetch_last_trade_price, live_price_cache, max_age=CACHE_DURATION,
+                                  max_workers=MAX_PRICE_WORKERS)
+
+
+def get_live_price(token_id, max_age=CACHE_DURATION):
     """
     Fetch the live price for a given token ID.
 
     Args:
         token_id (str): The token ID for which the live price is being requested.
+        max_age (float): Oldest cached price, in seconds, that may be returned instead of calling the API.
 
     Returns:
         float: The live price for the given token ID.
     """
-    cache_key = f"{token_id}"
-    current_time = time.time()
-
-    # Check if the price is in the cache and still valid
-    if cache_key in live_price_cache:
-        cached_price, timestamp = live_price_cache[cache_key]
-        if current_time - timestamp < CACHE_DURATION:
-            logger.info(f"Returning cached price for {cache_key}: {cached_price}")
-            return cached_price
-        else:
-            logger.info(f"Cache expired for {cache_key}. Fetching a new price.")
-
-    # Fetch new price from the API
-    try:
-        response = client.get_last_trade_price(token_id=token_id)
-        price = response.get('price')
+    return live_price_service.get(token_id, max_age=max_age)
 
-        # Cache the price with the current timestamp
-        live_price_cache[cache_key] = (price, current_time)
-        logger.info(f"Fetched live price for {cache_key}: {price}")
-        return price
-    except Exception as e:
-        logger.error(f"Failed to fetch live price for token {token_id}: {str(e)}")
-        return None
+
+def get_live_prices(token_ids, max_age=CACHE_DURATION):
+    """
+    Fetch live prices for many token IDs at once.
+
+    Cached prices younger than max_age are used as-is and slightly stale ones are served while
+    they refresh; the rest are fetched concurrently and written back to the cache in a single batch.
+
+    Args:
+        token_ids (iterable): Token IDs to price; duplicates are fetched once.
+        max_age (float): Oldest cached price, in seconds, that may be returned instead of calling the API.
+
+    Returns:
+        dict: token_id -> live price, for every token whose price could be found.
+    """
+    return live_price_service.get_many(token_ids, max_age=max_age)
 
 
 # If this script is executed directly, it can take command-line arguments to test the live price retrieval
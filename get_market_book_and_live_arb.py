@@ -4,18 +4,27 @@ import json
 import pandas as pd
 import logging
 import time
+import threading
 from datetime import datetime
 import pytz
 from py_clob_client.client import ClobClient
 from strategies import trades
-from get_order_book import update_books_for_trades  # Import the function
+from get_order_book import update_books_for_trades, collect_trade_tokens  # Import the function
 from dotenv import load_dotenv
 import numpy as np
-from get_live_price import get_live_price  # Import the new live price function
+from get_live_price import live_price_service
 import jinja2
 import tempfile
 import numpy as np
-import subprocess
+from market_index import get_market_index
+from market_stream import BookManager, MarketChannelFeed, clob_snapshot
+from order_book import OrderBook, book_metrics
+from executable_arb import calculate_executable_arbitrage
+from scenario_engine import build_scenario_matrix, strategy_details
+from strategy_matrix import compile_strategies
+from incremental_arb import IncrementalArbEngine
+from position_provider import get_position_provider
+from user_trade_refresh import start_user_trade_refresh
 
 # Access the environment variables
 api_key = os.getenv('API_KEY')
@@ -30,15 +39,11 @@ chain_id = 137  # Polygon Mainnet
 # Initialize the ClobClient
 client = ClobClient(host, key=api_key, chain_id=chain_id)
 
-# Dictionary to cache live prices
-live_price_cache = {}
-
 # Load environment variables
 load_dotenv()
 
 def load_market_lookup():
-    with open('./data/market_lookup.json', 'r') as f:
-        market_lookup = json.load(f)
+    market_lookup = get_market_index()
 
     slug_to_token_id = {}
     for market in market_lookup.values():
@@ -51,274 +56,91 @@ def get_actual_price(slug, outcome, user_id='JeremyRWhittaker'):
     """
     Get the actual price and size from the user's latest trade for the specified slug and outcome.
     """
-    file_path = f'./data/user_trades/{user_id}_enriched_transactions.parquet'
-    if not os.path.exists(file_path):
-        logging.warning(f"User trades file not found: {file_path}")
-        return None, None
-    try:
-        df = pd.read_parquet(file_path)
-    except Exception as e:
-        logging.error(f"Failed to read user trades file: {file_path}. Error: {e}")
-        return None, None
+    return get_position_provider(user_id).actual_price(slug, outcome)
 
-    # Parse 'timeStamp_erc1155' as datetime
-    try:
-        df['timeStamp_erc1155'] = pd.to_datetime(df['timeStamp_erc1155'])
-    except Exception as e:
-        logging.error(f"Failed to parse 'timeStamp_erc1155' as datetime: {e}")
-        return None, None
-
-    # Filter by market_slug and outcome
-    df_filtered = df[(df['market_slug'] == slug) & (df['outcome'] == outcome)]
-    if df_filtered.empty:
-        logging.info(f"No trades found for user {user_id} in market {slug} ({outcome})")
-        return None, None
-
-    # Get the row with the latest 'timeStamp_erc1155'
-    latest_trade = df_filtered.loc[df_filtered['timeStamp_erc1155'].idxmax()]
-    price = latest_trade['price_paid_per_token']
-    size = latest_trade['shares']
-
-    return price, size
-
-def get_price_and_size(df, price_type):
-    if price_type == 'ask':
-        relevant_df = df[df['side'] == 'ask']
-        if not relevant_df.empty:
-            min_price_row = relevant_df.loc[relevant_df['price'].idxmin()]
-            return min_price_row['price'], min_price_row['size']
-    elif price_type == 'bid':
-        relevant_df = df[df['side'] == 'bid']
-        if not relevant_df.empty:
-            max_price_row = relevant_df.loc[relevant_df['price'].idxmax()]
-            return max_price_row['price'], max_price_row['size']
-    elif price_type == 'mid':
-        ask_df = df[df['side'] == 'ask']
-        bid_df = df[df['side'] == 'bid']
-        if not ask_df.empty and not bid_df.empty:
-            min_ask_price = ask_df['price'].min()
-            max_bid_price = bid_df['price'].max()
-            return (min_ask_price + max_bid_price) / 2, None
-    return None, None
+def get_price_and_size(book, price_type):
+    """(price, size) at the top of an OrderBook or streamed L2Book; size is None for 'mid'."""
+    if isinstance(book, pd.DataFrame):
+        book = OrderBook.from_frame(book)
+    return book.price_and_size(price_type)
 
 def get_live_price(token_id, side):
-    cache_key = f"{token_id}_{side.upper()}"
-    current_time = time.time()  # Get the current time in seconds since the Epoch
-
-    # Check if the price is in the cache and if it's still valid (not older than 2 minutes)
-    if cache_key in live_price_cache:
-        cached_price, timestamp = live_price_cache[cache_key]
-        if current_time - timestamp < 60:
-            return cached_price
-        else:
-            logging.info(f"Cache expired for {cache_key}. Fetching a new price.")
+    """
+    The token's last trade price, from the shared live price service in get_live_price.py, or None
+    while it is still being fetched; the arb loop never waits on the network.
+    """
+    # The last trade price does not depend on the side, so both sides share one cache entry
+    return live_price_service.get(token_id, wait=False)
 
-    try:
-        response = client.get_last_trade_price(token_id=token_id)
-        price = response.get('price')
-        live_price_cache[cache_key] = (price, current_time)  # Store the price with the current timestamp
-        return price
+def load_book(slug, outcome, token_id, books=None, data_dir='./data/book_data'):
+    """
+    Return the order book for a leg, or None if it is not available.
 
-    except Exception as e:
-        logging.error(f"Failed to fetch live price for token {token_id} on side {side}: {str(e)}")
+    Uses the in-memory books from update_books_for_trades or a streaming BookManager when given,
+    otherwise the saved CSV.
+    """
+    if books is not None:
+        book = books.get(token_id)
+        if book is None:
+            logging.info(f"Book not fetched for {slug} ({outcome})")
+        return book
+
+    file_path = os.path.join(data_dir, f"{slug}_{outcome}.csv")
+    if not os.path.exists(file_path):
+        logging.info(f"File not found: {file_path}")
         return None
-def get_live_price_from_file(token_id, side):
+    return OrderBook.from_frame(pd.read_csv(file_path))
+
+def load_books(tokens, data_dir='./data/book_data'):
+    """Read the saved book of every token once. `tokens` maps token_id -> (slug, outcome)."""
+    books = {}
+    for token_id, (slug, outcome) in tokens.items():
+        book = load_book(slug, outcome, token_id, data_dir=data_dir)
+        if book is not None:
+            books[token_id] = book
+    return books
+
+def build_trade_scenarios(compiled, price_types, user_id='JeremyRWhittaker', books=None, data_dir='./data/book_data'):
     """
-    Use the external program to fetch live prices.
+    Price every token of the compiled strategies under every price type in one pass (see scenario_engine.py).
+
+    Each book is read once, from `books` when given or from data_dir otherwise. The 'actual'
+    prices come from the cached position provider, which only re-reads the user's trades file
+    when it has changed. Rows follow compiled.token_ids.
     """
-    price = get_live_price(token_id, side)
-    if price is not None:
-        return price
-    else:
-        logging.warning(f"Failed to get live price for token ID {token_id}")
-        return None
-def save_trade_details_with_prices(trade, trade_side_keys, price_type, output_dir, slug_to_token_id, user_id='JeremyRWhittaker'):
-    trade_name = trade['trade_name']
-    price_type_suffix = f"_{price_type}"
-
-    trade_data = []
-
-    for trade_side_key in trade_side_keys:
-        trade_side = trade.get(trade_side_key, [])
-
-        for slug, outcome in trade_side:
-            token_id = slug_to_token_id.get(slug, {}).get(outcome)
-            if not token_id:
-                logging.warning(f"Token ID not found for {slug} ({outcome})")
-                continue
-
-            if price_type == 'actual':
-                price, size = get_actual_price(slug, outcome, user_id)
-                if price is None:
-                    logging.warning(f"Actual price not found for {slug} ({outcome}), skipping this pair.")
-                    continue
-            elif price_type == 'live':
-                price = get_live_price_from_file(token_id, side='sell' if outcome.lower() == 'no' else 'buy')
-                size = None  # We don't have size data for live prices
-            else:
-                file_name = f"{slug}_{outcome}.csv"
-                file_path = os.path.join('./data/book_data', file_name)
-                if not os.path.exists(file_path):
-                    logging.info(f"File not found: {file_path}")
-                    continue
-                df = pd.read_csv(file_path)
-                price, size = get_price_and_size(df, price_type)
-
-            if price is not None:
-                trade_data.append({
-                    'Slug': f"{slug} ({outcome})",
-                    'Side': trade_side_key,
-                    'Price': float(price),  # Ensure price is a float
-                    'Size': size
-                })
-
-    if trade_data:
-        df_trade = pd.DataFrame(trade_data)
-        output_path = os.path.join(output_dir, f"{trade_name}{price_type_suffix}.csv")
+    tokens = compiled.tokens
+    if books is None:
+        books = load_books(tokens, data_dir)
+    actual_prices = get_position_provider(user_id).actual_prices() if 'actual' in price_types else None
+    if 'live' in price_types:
+        # Start fetching missing live prices in the background; they are priced from the next pass on
+        live_price_service.get_many(compiled.token_ids, wait=False)
+    return build_scenario_matrix(tokens, lambda slug, outcome, token_id: books.get(token_id), price_types,
+                                 get_live_price=get_live_price, actual_prices=actual_prices)
+
+def save_trade_details(trade, details, output_dir):
+    """Save a trade's per price type detail tables to {trade_name}_{price_type}.csv."""
+    for price_type, df_trade in details.items():
+        output_path = os.path.join(output_dir, f"{trade['trade_name']}_{price_type}.csv")
         df_trade.to_csv(output_path, index=False)
-        logging.info("Saved detailed trade information for %s to %s", trade_name, output_path)
+        logging.info("Saved detailed trade information for %s to %s", trade['trade_name'], output_path)
 
-def calculate_arbitrage_for_scenarios(trades, data_dir='./data/book_data', price_types=['ask', 'mid', 'live', 'bid', 'actual'], user_id='JeremyRWhittaker'):
+def calculate_arbitrage_for_scenarios(trades, data_dir='./data/book_data', price_types=['ask', 'mid', 'live', 'bid', 'actual'], user_id='JeremyRWhittaker', books=None, matrix=None, compiled=None):
     """
     Calculate arbitrage for different price types, including 'bid' and 'actual'.
-    """
-    arbitrage_info = {}
-    slug_to_token_id = load_market_lookup()
 
-    for trade in trades:
-        trade_name = trade['trade_name']
-        method = trade.get("method")
-
-        arbitrage_per_price_type = {}
-
-        if method == 'all_no':
-            positions = trade.get('positions', [])
-            if not positions:
-                logging.info(f"No positions found for trade: {trade_name}")
-                continue
-        elif method == 'balanced':
-            side_a_positions = trade.get('side_a_trades', [])
-            side_b_positions = trade.get('side_b_trades', [])
-            if not side_a_positions or not side_b_positions:
-                logging.info(f"No positions found for trade: {trade_name}")
-                continue
-        else:
-            continue
-
-        for price_type in price_types:
-            data_complete = True  # Flag to check if all required data is available
-
-            if method == 'all_no':
-                # For 'all_no' method
-                prices = []
-                for slug, outcome in positions:
-                    logging.info(f"Processing strategy: {trade_name} using {price_type} prices")
-
-                    token_id = slug_to_token_id.get(slug, {}).get(outcome)
-                    if not token_id:
-                        logging.warning(f"Token ID not found for {slug} ({outcome}), skipping this pair.")
-                        data_complete = False
-                        break
-
-                    if price_type == 'actual':
-                        price, size = get_actual_price(slug, outcome, user_id)
-                        if price is None:
-                            logging.warning(f"Actual price not found for {slug} ({outcome}), skipping this pair.")
-                            data_complete = False
-                            break
-                    elif price_type == 'live':
-                        price = get_live_price(token_id, side='sell' if outcome.lower() == 'no' else 'buy')
-                    else:
-                        file_name = f"{slug}_{outcome}.csv"
-                        file_path = os.path.join(data_dir, file_name)
-                        if not os.path.exists(file_path):
-                            logging.info(f"File not found: {file_path}, skipping this pair.")
-                            data_complete = False
-                            break
-                        df = pd.read_csv(file_path)
-                        price, _ = get_price_and_size(df, price_type)
-                        if price is None:
-                            logging.warning(f"Price not found in file for {slug} ({outcome}), skipping this pair.")
-                            data_complete = False
-                            break
-
-                    try:
-                        price = float(price)
-                    except (TypeError, ValueError) as e:
-                        logging.error(f"Failed to convert price to float for {slug} ({outcome}): {e}")
-                        data_complete = False
-                        break
-
-                    prices.append(price)
-
-                if data_complete and prices:
-                    max_price = max(prices)
-                    total_winnings = sum(1 - p for p in prices) - (1 - max_price)
-                    arb_pct = (total_winnings - max_price) * 100
-                    logging.info(f"Total winnings: {total_winnings:.4f}, max loss: {max_price:.4f}, arb: {arb_pct:.4f}%")
-                    arbitrage_per_price_type[price_type] = arb_pct
-                else:
-                    logging.warning(f"Data incomplete for trade: {trade_name}, setting arbitrage to NaN for {price_type}.")
-                    arbitrage_per_price_type[price_type] = np.nan
-
-            elif method == 'balanced':
-                # For 'balanced' method
-                total_cost = 0
-                for slug, outcome in side_a_positions + side_b_positions:
-                    logging.info(f"Processing balanced strategy: {trade_name} using {price_type} prices")
-
-                    token_id = slug_to_token_id.get(slug, {}).get(outcome)
-                    if not token_id:
-                        logging.warning(f"Token ID not found for {slug} ({outcome}), skipping this pair.")
-                        data_complete = False
-                        break
-
-                    if price_type == 'actual':
-                        price, size = get_actual_price(slug, outcome, user_id)
-                        if price is None:
-                            logging.warning(f"Actual price not found for {slug} ({outcome}), skipping this pair.")
-                            data_complete = False
-                            break
-                    elif price_type == 'live':
-                        price = get_live_price(token_id, side='sell' if outcome.lower() == 'no' else 'buy')
-                    else:
-                        file_name = f"{slug}_{outcome}.csv"
-                        file_path = os.path.join(data_dir, file_name)
-                        if not os.path.exists(file_path):
-                            logging.info(f"File not found: {file_path}, skipping this pair.")
-                            data_complete = False
-                            break
-                        df = pd.read_csv(file_path)
-                        price, _ = get_price_and_size(df, price_type)
-                        if price is None:
-                            logging.warning(f"Price not found in file for {slug} ({outcome}), skipping this pair.")
-                            data_complete = False
-                            break
-
-                    try:
-                        price = float(price)
-                    except (TypeError, ValueError) as e:
-                        logging.error(f"Failed to convert price to float for {slug} ({outcome}): {e}")
-                        data_complete = False
-                        break
-
-                    total_cost += price
-                    logging.debug(f"Adding cost of {price:.4f} for {slug} ({outcome}) to total.")
-
-                if data_complete and total_cost > 0:
-                    profit = 1 - total_cost
-                    arb_pct = profit * 100
-                    logging.info(f"Total cost: {total_cost:.4f}, profit: {profit:.4f}, arb: {arb_pct:.4f}%")
-                    arbitrage_per_price_type[price_type] = arb_pct
-                else:
-                    logging.warning(f"Data incomplete for trade: {trade_name}, setting arbitrage to NaN for {price_type}.")
-                    arbitrage_per_price_type[price_type] = np.nan
+    `books` (token_id -> OrderBook, from update_books_for_trades) is used instead of the CSVs in data_dir when given.
+    The trades are compiled into a strategy matrix (strategy_matrix.py) and evaluated for every
+    price type at once; pass `compiled` and a ScenarioMatrix `matrix` to reuse ones already built.
+    """
+    if compiled is None:
+        compiled = compile_strategies(trades, get_market_index())
+    if matrix is None:
+        matrix = build_trade_scenarios(compiled, price_types, user_id, books, data_dir)
 
-        if arbitrage_per_price_type:
-            arbitrage_info[trade_name] = arbitrage_per_price_type
-            logging.info(f"\nArbitrage opportunity for {trade_name}: {arbitrage_info[trade_name]}")
-        else:
-            logging.info(f"No arbitrage opportunities found for {trade_name}.")
+    arbitrage_info = compiled.arbitrage_info(matrix.take(compiled.token_ids), matrix.price_types)
+    for trade_name, arbitrage_per_price_type in arbitrage_info.items():
+        logging.info(f"Arbitrage opportunity for {trade_name}: {arbitrage_per_price_type}")
 
     return arbitrage_info
 def get_spread_from_api(slug, outcome, slug_to_token_id):
@@ -341,9 +163,15 @@ def get_spread_from_api(slug, outcome, slug_to_token_id):
     return None
 
 
-def process_all_trades(trades, output_dir='./strategies', include_bid=True):
+def process_all_trades(trades, output_dir='./strategies', include_bid=True, books=None, compiled=None):
     """
     Process all trades, saving the results to CSV and HTML.
+
+    `books` are the in-memory order books from update_books_for_trades; without them the saved CSVs are read.
+    `compiled` is the trades' compiled strategy matrix, if it was already built.
+
+    Returns the summary inputs (arbitrage_info, datasets, spread_info, trade_descriptions and
+    executable_info) so the summary can be re-rendered between iterations (see SummaryEmitter).
     """
     if not os.path.exists(output_dir):
         os.makedirs(output_dir)
@@ -351,21 +179,17 @@ def process_all_trades(trades, output_dir='./strategies', include_bid=True):
     # Default user ID
     user_id = 'JeremyRWhittaker'
 
-    # Run get_user_trade_prices.py as a subprocess with --run-once
-    try:
-        logging.info(f"Updating user trades for user: {user_id}")
-        subprocess.run(
-            ['python', 'get_user_trade_prices.py', user_id, './data/strategies.py'],
-            check=True
-        )
-        logging.info(f"Successfully updated user trades for user: {user_id}")
-    except subprocess.CalledProcessError as e:
-        logging.error(f"Error updating user trades: {e}")
-        return  # Exit the function if updating trades is critical
+    # User trades refresh on their own background cadence; this cycle uses the latest completed snapshot
+    refresher = start_user_trade_refresh(user_id, './data/strategies.py')
+    if refresher.last_completed is not None:
+        logging.info(f"Using user trades for {user_id} refreshed at {datetime.fromtimestamp(refresher.last_completed)}")
+    else:
+        logging.info(f"User trades for {user_id} not refreshed yet in this process, using the existing snapshot")
     if not os.path.exists(output_dir):
         os.makedirs(output_dir)
 
     slug_to_token_id = load_market_lookup()
+    market_index = get_market_index()
     arbitrage_info = {}
     datasets = {}
     spread_info = {}
@@ -378,39 +202,46 @@ def process_all_trades(trades, output_dir='./strategies', include_bid=True):
 
     user_id = 'JeremyRWhittaker'  # Default user ID
 
+    # Resolve every leg once, then load every book and price once for all trades and price types
+    if compiled is None:
+        compiled = compile_strategies(trades, market_index)
+    if books is None:
+        books = load_books(compiled.tokens)
+    matrix = build_trade_scenarios(compiled, price_types, user_id, books)
+
+    # Spread, depth, imbalance and microprice of every book in one step
+    metrics = book_metrics(books, compiled.token_ids)
+    spreads = {token_id: spread for token_id, spread, has_book in zip(
+        metrics.index, metrics['spread'], metrics['best_bid'].notna() | metrics['best_ask'].notna()) if has_book}
+    try:
+        metrics_path = os.path.join(output_dir, "book_metrics.csv")
+        metrics.to_csv(metrics_path)
+        logging.info("Book metrics exported to %s", metrics_path)
+    except Exception as e:
+        logging.error(f"Error saving book metrics: {e}", exc_info=True)
+
     for trade in trades:
         trade_name = trade['trade_name']
         trade_descriptions[trade_name] = trade.get('description', '')  # Store the description
-        trade_datasets = {}
         trade_spreads = {}
 
-        if trade['method'] == 'all_no':
-            for price_type in price_types:
-                save_trade_details_with_prices(trade, ['positions'], price_type, output_dir, slug_to_token_id, user_id)
-                # Load and store dataset
-                dataset_path = os.path.join(output_dir, f"{trade_name}_{price_type}.csv")
-                if os.path.exists(dataset_path):
-                    trade_datasets[price_type] = pd.read_csv(dataset_path)
-        elif trade['method'] == 'balanced':
-            for price_type in price_types:
-                save_trade_details_with_prices(trade, ['side_a_trades', 'side_b_trades'], price_type, output_dir,
-                                               slug_to_token_id, user_id)
-                # Load and store dataset
-                dataset_path = os.path.join(output_dir, f"{trade_name}_{price_type}.csv")
-                if os.path.exists(dataset_path):
-                    trade_datasets[price_type] = pd.read_csv(dataset_path)
-
-        # Get the spread for the trade using the token ID
+        # Detail tables come straight from the scenario matrix
+        trade_datasets = strategy_details(trade, matrix, market_index)
+        save_trade_details(trade, trade_datasets, output_dir)
+
+        # Spreads come from the local books; the API is only asked about tokens without a book
         for side in ['positions', 'side_a_trades', 'side_b_trades']:
             trade_sides = trade.get(side, [])
             for slug, outcome in trade_sides:
                 try:
-                    logging.info(f"Processing trade side {side} for slug: {slug} and outcome: {outcome}")
-                    token_id = slug_to_token_id.get(slug, {}).get(outcome)
+                    token_id = market_index.token_id(slug, outcome)
                     if token_id:
-                        logging.info(f"Token ID found for {slug} ({outcome}): {token_id}")
-                        spread = get_spread_from_api(slug, outcome, slug_to_token_id)
-                        if spread is not None:
+                        if token_id in spreads:
+                            spread = spreads[token_id]
+                        else:
+                            spread = get_spread_from_api(slug, outcome, slug_to_token_id)
+                            spreads[token_id] = spread
+                        if spread is not None and not np.isnan(spread):
                             trade_spreads[slug] = spread
                             logging.info(f"Spread for {slug} ({outcome}): {spread}")
                         else:
@@ -431,14 +262,28 @@ def process_all_trades(trades, output_dir='./strategies', include_bid=True):
     # Calculate arbitrage opportunities for all trades at once
     try:
         logging.info("Calculating arbitrage for all trades")
-        arbitrage_info = calculate_arbitrage_for_scenarios(trades, price_types=price_types, user_id=user_id)
+        arbitrage_info = calculate_arbitrage_for_scenarios(trades, price_types=price_types, user_id=user_id, matrix=matrix,
+                                                           compiled=compiled)
     except Exception as e:
         logging.error(f"Error calculating arbitrage: {e}", exc_info=True)
 
+    # Depth-aware arb: fill every leg at size by walking its ask levels
+    executable_info = None
+    try:
+        logging.info("Calculating executable arbitrage at size")
+        executable_info = calculate_executable_arbitrage(
+            trades, lambda slug, outcome: books.get(market_index.token_id(slug, outcome)))
+        executable_path = os.path.join(output_dir, "executable_arb.csv")
+        executable_info.to_csv(executable_path, index=False)
+        logging.info("Executable arbitrage exported to %s", executable_path)
+    except Exception as e:
+        logging.error(f"Error calculating executable arbitrage: {e}", exc_info=True)
+
     # Save summary and datasets to HTML, including trade descriptions
     try:
         logging.info("Saving summary and datasets to HTML")
-        save_summary_to_html_with_datasets(arbitrage_info, datasets, spread_info, output_dir, trade_descriptions)
+        save_summary_to_html_with_datasets(arbitrage_info, datasets, spread_info, output_dir, trade_descriptions,
+                                           executable_info)
     except Exception as e:
         logging.error(f"Error saving summary and datasets to HTML: {e}", exc_info=True)
 
@@ -449,6 +294,9 @@ def process_all_trades(trades, output_dir='./strategies', include_bid=True):
     except Exception as e:
         logging.error(f"Error saving summary to CSV: {e}", exc_info=True)
 
+    return {'arbitrage_info': arbitrage_info, 'datasets': datasets, 'spread_info': spread_info,
+            'trade_descriptions': trade_descriptions, 'executable_info': executable_info}
+
 def save_summary_to_csv(arbitrage_info, output_dir, datasets):
     """
     Save a summary of arbitrage opportunities to a CSV file.
@@ -476,10 +324,14 @@ def save_summary_to_csv(arbitrage_info, output_dir, datasets):
     summary_path = os.path.join(output_dir, "summary.csv")
     df_summary.to_csv(summary_path, index=False)
     logging.info("Summary results exported to %s", summary_path)
-def save_summary_to_html_with_datasets(arbitrage_info, datasets, spread_info, output_dir, trade_descriptions):
+def save_summary_to_html_with_datasets(arbitrage_info, datasets, spread_info, output_dir, trade_descriptions,
+                                       executable_info=None):
     """
     Save a summary of arbitrage opportunities to an HTML file using Jinja2 templates,
     with links to the corresponding detailed datasets.
+
+    `executable_info` is the depth-aware arb from calculate_executable_arbitrage; when given,
+    each trade shows the largest size at which the arb stays positive.
     """
     import numpy as np  # Ensure numpy is imported
 
@@ -491,6 +343,10 @@ def save_summary_to_html_with_datasets(arbitrage_info, datasets, spread_info, ou
     trades_summary = []
     trades_list = []
 
+    max_sizes = {}
+    if executable_info is not None and not executable_info.empty:
+        max_sizes = executable_info.groupby('Trade Name')['Max Size'].first().to_dict()
+
     for trade_name, arb_data in arbitrage_info.items():
         # Get the description
         description = trade_descriptions.get(trade_name, '')
@@ -547,7 +403,8 @@ def save_summary_to_html_with_datasets(arbitrage_info, datasets, spread_info, ou
             'trade_name': trade_name_with_spread,
             'description': description,
             'price_types': price_types_data,
-            'ask_arbitrage_num': ask_arbitrage_num
+            'ask_arbitrage_num': ask_arbitrage_num,
+            'max_size': f"{max_sizes[trade_name]:.2f}" if trade_name in max_sizes else None
         })
 
     # Now sort trades_summary by 'ask_arbitrage_num' descending, handling NaN values
@@ -634,6 +491,9 @@ def save_summary_to_html_with_datasets(arbitrage_info, datasets, spread_info, ou
             {% if trade.description %}
             <p class="trade-description">{{ trade.description }}</p>
             {% endif %}
+            {% if trade.max_size is not none %}
+            <p>Arb stays positive up to {{ trade.max_size }} shares at the ask.</p>
+            {% endif %}
             <table>
                 <thead>
                     <tr>
@@ -690,18 +550,116 @@ def save_summary_to_html_with_datasets(arbitrage_info, datasets, spread_info, ou
 
 
 
-def run_continuously(trades, output_dir='./strategies', include_bid=True, interval=300):
+def start_book_stream(trades, listeners=()):
+    """Subscribe to the market channel for every token in the trades and return the live BookManager."""
+    tokens = collect_trade_tokens(trades, get_market_index())
+    manager = BookManager(resync=clob_snapshot(client))
+    for listener in listeners:
+        manager.add_listener(listener)
+    MarketChannelFeed(manager, tokens).start()
+    return manager
+
+
+class SummaryEmitter:
+    """
+    Re-saves summary.csv and summary.html whenever the incremental engine recomputes strategies.
+
+    The engine only prices the book types (ask/mid/bid), so its rows are merged into the last
+    full iteration's arbitrage_info, keeping the live and actual rows and the detail tables.
+    Register `on_update` as the engine's callback: it only signals the writer thread, so the
+    book feed is never blocked on file writes, and writes are throttled to one per
+    `min_interval` seconds. Hold `lock` while a full iteration writes the same files.
+    """
+
+    def __init__(self, engine, output_dir, min_interval=1):
+        self.engine = engine
+        self.output_dir = output_dir
+        self.min_interval = min_interval
+        self.lock = threading.Lock()
+        self._summary = None
+        self._changed = threading.Event()
+        threading.Thread(target=self._run, name='summary-emitter', daemon=True).start()
+
+    def set_summary(self, summary):
+        """The latest full iteration's process_all_trades result."""
+        self._summary = summary
+
+    def on_update(self, trade_names):
+        self._changed.set()
+
+    def _run(self):
+        while True:
+            self._changed.wait()
+            self._changed.clear()
+            try:
+                self.emit()
+            except Exception as e:
+                logging.error(f"Error saving incremental summary: {e}", exc_info=True)
+            time.sleep(self.min_interval)
+
+    def emit(self):
+        with self.lock:
+            summary = self._summary
+            changed = self.engine.pop_changed()
+            if summary is None or not changed:
+                return
+            engine_info = self.engine.arbitrage_info()
+            arbitrage_info = {}
+            for trade_name, arb_data in summary['arbitrage_info'].items():
+                arb_data = dict(arb_data)
+                if trade_name in changed:
+                    arb_data.update((price_type, arb) for price_type, arb in engine_info.get(trade_name, {}).items()
+                                    if price_type in arb_data)
+                arbitrage_info[trade_name] = arb_data
+            summary['arbitrage_info'] = arbitrage_info
+
+            logging.info(f"Arbitrage updated for {len(changed)} strategies "
+                         f"(last recompute {self.engine.stats['last_latency_ms'] or 0:.3f} ms)")
+            save_summary_to_csv(arbitrage_info, self.output_dir, summary['datasets'])
+            save_summary_to_html_with_datasets(arbitrage_info, summary['datasets'], summary['spread_info'],
+                                               self.output_dir, summary['trade_descriptions'],
+                                               summary['executable_info'])
+
+
+def run_continuously(trades, output_dir='./strategies', include_bid=True, interval=300, stream=False,
+                     incremental=False):
     """
     Run the process_all_trades function every 'interval' seconds.
+
+    With `stream`, the books are kept up to date from the market channel instead of being
+    polled before each iteration. `incremental` (which implies `stream`) also recomputes the
+    arb of just the strategies holding a token whenever its book changes, and re-saves
+    summary.csv and summary.html between the full iterations.
     """
+    # Resolve the strategies to tokens once for every iteration
+    compiled = compile_strategies(trades, get_market_index())
+    engine = emitter = None
+    if incremental:
+        engine = IncrementalArbEngine(compiled)
+        emitter = SummaryEmitter(engine, output_dir)
+        engine.on_update = emitter.on_update
+    manager = None
+    if stream or incremental:
+        manager = start_book_stream(trades, listeners=[engine.on_book] if engine else [])
     while True:
         try:
-            # First, update the order books
-            logging.info("Updating order books before processing trades.")
-            update_books_for_trades()
-
-            # Run the main processing function
-            process_all_trades(trades, output_dir=output_dir, include_bid=include_bid)
+            if manager is not None:
+                books = manager
+            else:
+                # First, update the order books
+                logging.info("Updating order books before processing trades.")
+                books = update_books_for_trades(trades, save_csv=False)
+
+            # Run the main processing function on the in-memory books
+            if emitter is not None:
+                with emitter.lock:
+                    # Start the engine from the books this iteration prices, then track changes from there
+                    engine.seed(books)
+                    engine.pop_changed()
+                    emitter.set_summary(process_all_trades(trades, output_dir=output_dir, include_bid=include_bid,
+                                                           books=books, compiled=compiled))
+            else:
+                process_all_trades(trades, output_dir=output_dir, include_bid=include_bid, books=books, compiled=compiled)
 
             # Log the completion of one iteration
             logging.info("Completed one iteration of process_all_trades.")
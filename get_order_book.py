@@ -1,10 +1,15 @@
 import os
 import json
 import logging
-import pandas as pd
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from py_clob_client.client import ClobClient
+from py_clob_client.clob_types import BookParams
 from strategies import trades  # Import the trades list
 from dotenv import load_dotenv
+from market_index import get_market_index
+from order_book import OrderBook
+from rate_limit import HostRateLimiter
+from http_client import get_http_client
 
 
 # Access the environment variables
@@ -15,13 +20,69 @@ host = "https://clob.polymarket.com"
 chain_id = 137  # Polygon Mainnet
 client = ClobClient(host, key=api_key, chain_id=chain_id)
 
+# Concurrency and per-host request rate for book snapshots
+MAX_BOOK_WORKERS = 8
+BOOK_REQUESTS_PER_SECOND = 10
+BOOK_BATCH_SIZE = 100  # Token books per POST /books request when fetching in batches
+rate_limiter = HostRateLimiter(BOOK_REQUESTS_PER_SECOND)
+
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
 
 def load_market_lookup():
-    """Load the market lookup JSON to map slugs to token IDs."""
-    with open('./data/market_lookup.json', 'r') as f:
-        return json.load(f)
+    """Load the market lookup to map slugs to token IDs."""
+    return get_market_index()
+
+def save_order_book(book, slug, outcome):
+    """Save an OrderBook to ./data/book_data/{slug}_{outcome}.csv."""
+    output_dir = "./data/book_data"
+    os.makedirs(output_dir, exist_ok=True)
+    file_name = f"{slug}_{outcome}.csv"  # Use the slug and outcome for the file name
+    output_path = os.path.join(output_dir, file_name)
+    book.to_frame().to_csv(output_path, index=False)
+    logging.info(f"Book data for {slug} ({outcome}) saved to {output_path}")
+
+
+def fetch_order_book(token_id, market_id):
+    """
+    Fetch the live order book for a token ID, respecting the per-host rate limit
+    and retrying transient failures through the shared HTTP client.
+
+    Returns an OrderBook, or None if it could not be fetched.
+    """
+    try:
+        rate_limiter.acquire(host)
+        order_book = get_http_client().call(host, client.get_order_book, token_id)
+        if not hasattr(order_book, 'bids') or not hasattr(order_book, 'asks'):
+            logging.error(f"Order book structure is not as expected for token_id: {token_id}")
+            return None
+        return OrderBook.from_clob(order_book, market_id=market_id)
+    except Exception as e:
+        logging.error(f"Failed to fetch order book for token_id: {token_id}, error: {e}")
+        return None
+
+
+def fetch_order_book_batch(token_ids, tokens):
+    """
+    Fetch the live order books of several tokens in one request, respecting the per-host rate limit
+    and retrying transient failures through the shared HTTP client.
+
+    Returns a dict of token_id -> OrderBook for every book in the response.
+    """
+    try:
+        rate_limiter.acquire(host)
+        order_books = get_http_client().call(host, client.get_order_books,
+                                             [BookParams(token_id=token_id) for token_id in token_ids])
+    except Exception as e:
+        logging.error(f"Failed to fetch a batch of {len(token_ids)} order books, error: {e}")
+        return {}
+    books = {}
+    for order_book in order_books or []:
+        token_id = str(getattr(order_book, 'asset_id', ''))
+        if token_id in tokens:
+            books[token_id] = OrderBook.from_clob(order_book, market_id=tokens[token_id][0])
+    return books
+
 
 def fetch_and_save_order_book(token_id, market_id, slug, outcome):
     """
@@ -33,61 +94,86 @@ def fetch_and_save_order_book(token_id, market_id, slug, outcome):
         slug (str): The slug name of the market.
         outcome (str): The outcome ('Yes' or 'No') for the market.
     """
-    try:
-        order_book = client.get_order_book(token_id)
-        if not hasattr(order_book, 'bids') or not hasattr(order_book, 'asks'):
-            logging.error(f"Order book structure is not as expected for token_id: {token_id}")
-            return
-
-        book_data = []
-        for side, orders in [('asks', order_book.asks), ('bids', order_book.bids)]:
-            for order in orders:
-                book_data.append({
-                    'market_id': market_id,
-                    'asset_id': order_book.asset_id,
-                    'price': float(order.price),
-                    'size': float(order.size),
-                    'side': 'ask' if side == 'asks' else 'bid'
-                })
-
-        df = pd.DataFrame(book_data)
-        if not df.empty:
-            output_dir = "./data/book_data"
-            os.makedirs(output_dir, exist_ok=True)
-            file_name = f"{slug}_{outcome}.csv"  # Use the slug and outcome for the file name
-            output_path = os.path.join(output_dir, file_name)
-            df.to_csv(output_path, index=False)
-            logging.info(f"Book data for {slug} ({outcome}) saved to {output_path}")
-        else:
-            logging.warning(f"No data found for token_id: {token_id}")
-
-    except Exception as e:
-        logging.error(f"Failed to fetch or save order book for token_id: {token_id}, error: {e}")
+    book = fetch_order_book(token_id, market_id)
+    if book is not None and not book.empty:
+        save_order_book(book, slug, outcome)
+    elif book is not None:
+        logging.warning(f"No data found for token_id: {token_id}")
+    return book
 
 
-def update_books_for_trades():
-    """Update order book data for the token IDs mentioned in the trades list."""
-    market_lookup = load_market_lookup()
-    slug_to_market = {market_data['market_slug']: market_data for market_data in market_lookup.values()}
+def collect_trade_tokens(trades, market_lookup):
+    """
+    Resolve every leg of every strategy to a token ID, deduplicated across strategies.
 
+    Returns a dict of token_id -> (slug, outcome) in first-seen order.
+    """
+    tokens = {}
     for trade in trades:
         positions = trade.get('positions', []) + trade.get('side_a_trades', []) + trade.get('side_b_trades', [])
         for slug, outcome in positions:
-            market_data = slug_to_market.get(slug)
-            if not market_data:
-                logging.warning(f"Market slug {slug} not found in market lookup.")
-                continue
-
-            outcome_lower = outcome.lower()
-            token_entry = next((token for token in market_data['tokens'] if token['outcome'].lower() == outcome_lower), None)
-
-            if token_entry:
-                token_id = token_entry['token_id']
-                market_id = market_data.get('market_slug')
-                logging.info(f"Fetching order book for market_id: {market_id}, token_id: {token_id}")
-                fetch_and_save_order_book(token_id, market_id, slug, outcome)
+            token_id = market_lookup.token_id(slug, outcome)
+            if token_id:
+                tokens.setdefault(token_id, (slug, outcome))
             else:
                 logging.warning(f"Token ID not found for slug: {slug} and outcome: {outcome}")
+    return tokens
+
+
+def fetch_order_books(tokens, max_workers=MAX_BOOK_WORKERS, batch_size=None):
+    """
+    Fetch order books for many tokens concurrently on a bounded thread pool.
+
+    Args:
+        tokens (dict): token_id -> (slug, outcome), as returned by collect_trade_tokens.
+        max_workers (int): Maximum number of concurrent requests.
+        batch_size (int): Fetch this many books per request (POST /books) instead of one per
+            request, for scans over thousands of tokens.
+
+    Returns:
+        dict: token_id -> OrderBook for every book that was fetched.
+    """
+    books = {}
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        if batch_size:
+            token_ids = list(tokens)
+            futures = [executor.submit(fetch_order_book_batch, token_ids[i:i + batch_size], tokens)
+                       for i in range(0, len(token_ids), batch_size)]
+            for future in as_completed(futures):
+                books.update(future.result())
+        else:
+            futures = {executor.submit(fetch_order_book, token_id, slug): token_id
+                       for token_id, (slug, outcome) in tokens.items()}
+            for future in as_completed(futures):
+                book = future.result()
+                if book is not None:
+                    books[futures[future]] = book
+    logging.info(f"Fetched {len(books)} of {len(tokens)} order books")
+    return books
+
+
+def update_books_for_trades(trades=trades, save_csv=True, max_workers=MAX_BOOK_WORKERS):
+    """
+    Update order book data for the token IDs mentioned in the trades list.
+
+    Token IDs shared by several strategies are fetched once, and books are fetched concurrently.
+    Returns a dict of token_id -> OrderBook; with `save_csv` the books are also written to ./data/book_data.
+    """
+    market_lookup = load_market_lookup()
+    tokens = collect_trade_tokens(trades, market_lookup)
+    logging.info(f"Fetching order books for {len(tokens)} unique tokens")
+
+    books = fetch_order_books(tokens, max_workers=max_workers)
+
+    if save_csv:
+        for token_id, book in books.items():
+            slug, outcome = tokens[token_id]
+            if not book.empty:
+                save_order_book(book, slug, outcome)
+            else:
+                logging.warning(f"No data found for token_id: {token_id}")
+
+    return books
 
 
 
@@ -1,5 +1,4 @@
 import os
-import requests
 import logging
 import pandas as pd
 import subprocess
@@ -12,12 +11,19 @@ from bs4 import BeautifulSoup
 from importlib import reload
 import numpy as np
 import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor
 import os
 import subprocess
 import json
 import logging
 import pandas as pd
 from dotenv import load_dotenv
+from market_index import as_market_index, get_market_index
+from price_cache import get_price_cache
+from http_client import get_http_client
+from polygonscan_cache import OPEN_ENDBLOCK, closed_end_block, fetch_data, set_replay
+from wallet_sync import SYNC_ACTIONS, WalletCheckpoints, highest_block, load_enriched_transactions, merge_new_transfers
 
 logging.basicConfig(level=logging.DEBUG, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
@@ -37,37 +43,50 @@ NEG_RISK_CTF_EXCHANGE_SPENDER = '0xC5d563A36AE78145C45a50134d48A1215220f80a'
 NEG_RISK_ADAPTER = '0xd91E80cF2E7be2e162c6513ceD06f1dD0dA35296'
 CTF_EXCHANGE_SPENDER = '0x4bFb41d5B3570DeFd03C39a9A4D8dE6Bd8B8982E'
 
-CACHE_EXPIRATION_TIME = 60 * 30  # Cache expiration time in seconds (5 minutes)
-PRICE_CACHE_FILE = './data/live_price_cache.json'
+CACHE_EXPIRATION_TIME = 60 * 30  # Cache expiration time in seconds (30 minutes)
+PRICE_CACHE_FILE = './data/live_price_cache.json'  # Legacy JSON cache, imported once into the price cache
+MAX_RESULT_WINDOW = 10000  # Most results Polygonscan returns for one query, across its pages
+# Fields of a Polygonscan tokentx (ERC-20 transfer) result
+ERC20_TRANSFER_COLUMNS = ['blockNumber', 'timeStamp', 'hash', 'nonce', 'blockHash', 'from', 'contractAddress', 'to',
+                          'value', 'tokenName', 'tokenSymbol', 'tokenDecimal', 'transactionIndex', 'gas', 'gasPrice',
+                          'gasUsed', 'cumulativeGasUsed', 'input', 'confirmations']
 
-# Dictionary to cache live prices
-live_price_cache = {}
+# User profiles already looked up in this process, keyed by wallet ID
+user_profile_cache = {}
 
 
-def load_price_cache():
-    """Load the live price cache from a JSON file."""
-    if os.path.exists(PRICE_CACHE_FILE):
-        try:
-            with open(PRICE_CACHE_FILE, 'r') as file:
-                return json.load(file)
-        except json.JSONDecodeError as e:
-            logger.error(f"Error loading price cache: {e}")
-            return {}
-    return {}
-
-def save_price_cache(cache):
-    """Save the live price cache to a JSON file."""
-    with open(PRICE_CACHE_FILE, 'w') as file:
-        json.dump(cache, file)
-
-def is_cache_valid(cache_entry, expiration_time=CACHE_EXPIRATION_TIME):
+def import_legacy_price_cache(path=PRICE_CACHE_FILE):
+    """Move prices from the old JSON cache file into the tiered price cache, then remove the file."""
+    if not os.path.exists(path):
+        return
+    try:
+        with open(path, 'r') as file:
+            legacy = json.load(file)
+        fresh = {token_id: entry['price'] for token_id, entry in legacy.items()
+                 if time.time() - entry.get('timestamp', 0) < CACHE_EXPIRATION_TIME}
+        get_price_cache().set_many(fresh)
+        os.remove(path)
+        logger.info(f"Imported {len(fresh)} prices from {path}")
+    except (OSError, ValueError, KeyError, AttributeError) as e:
+        logger.error(f"Error importing legacy price cache: {e}")
+
+
+def fetch_live_prices(token_ids, expiration_time=CACHE_EXPIRATION_TIME):
     """
-    Check if the cache entry is still valid based on the current time and expiration time.
+    Live prices for many tokens in one in-process batch, as floats keyed by token ID.
+
+    Prices cached within expiration_time are reused; the rest are fetched concurrently.
     """
-    if not cache_entry:
-        return False
-    cached_time = cache_entry.get('timestamp', 0)
-    return (time.time() - cached_time) < expiration_time
+    # Imported here because importing get_live_price creates the CLOB client
+    from get_live_price import get_live_prices
+
+    prices = {}
+    for token_id, price in get_live_prices(token_ids, max_age=expiration_time).items():
+        try:
+            prices[token_id] = float(price)
+        except (TypeError, ValueError):
+            logger.warning(f"Unexpected live price for token {token_id}: {price}")
+    return prices
 
 
 def call_get_live_price(token_id, expiration_time=CACHE_EXPIRATION_TIME):
@@ -75,147 +94,75 @@ def call_get_live_price(token_id, expiration_time=CACHE_EXPIRATION_TIME):
     Get live price from cache or update it if expired.
     """
     logger.info(f'Getting live price for token {token_id}')
+    return fetch_live_prices([token_id], expiration_time).get(str(token_id))
 
-    # Load existing cache
-    price_cache = load_price_cache()
-    cache_key = f"{token_id}"
-
-    # Check if cache is valid
-    if cache_key in price_cache and is_cache_valid(price_cache[cache_key], expiration_time):
-        logger.info(f'Returning cached price for {cache_key}')
-        return price_cache[cache_key]['price']
-
-    # If cache is expired or doesn't exist, fetch live price
-    try:
-        result = subprocess.run(
-            ['python3', 'get_live_price.py', token_id],
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            text=True,
-            check=True
-        )
-        # Parse the live price from the subprocess output
-        output_lines = result.stdout.strip().split("\n")
-        live_price_line = next((line for line in output_lines if "Live price for token" in line), None)
-        if live_price_line:
-            live_price = float(live_price_line.strip().split(":")[-1].strip())
-        else:
-            logger.error("Live price not found in subprocess output.")
-            return None
-
-        logger.debug(f"Subprocess get_live_price output: {result.stdout}")
-
-        # Update cache with the new price and timestamp
-        price_cache[cache_key] = {'price': live_price, 'timestamp': time.time()}
-        save_price_cache(price_cache)
-
-        return live_price
-
-    except subprocess.CalledProcessError as e:
-        logger.error(f"Subprocess get_live_price error: {e.stderr}")
-        return None
-    except Exception as e:
-        logger.error(f"Error fetching live price: {str(e)}")
-        return None
-
-def update_live_price_and_pl(merged_df, contract_token_id, market_slug=None, outcome=None):
+def mark_to_market(merged_df, live_prices, market_outcomes):
     """
-    Calculate the live price and profit/loss (pl) for each trade in the DataFrame.
-    """
-    # Ensure tokenID in merged_df is string
-    merged_df['tokenID'] = merged_df['tokenID'].astype(str)
-    contract_token_id = str(contract_token_id)
+    Set live_price and pl on every row from a token -> price map, as single vectorized expressions.
 
-    # Check for NaN or empty token IDs
-    if not contract_token_id or contract_token_id == 'nan':
-        logger.warning("Encountered NaN or empty contract_token_id. Skipping.")
-        return merged_df
-
-    # Add live_price and pl columns if they don't exist
-    if 'live_price' not in merged_df.columns:
-        merged_df['live_price'] = np.nan
-    if 'pl' not in merged_df.columns:
-        merged_df['pl'] = np.nan
-
-    # Filter rows with the same contract_token_id and outcome
-    merged_df['outcome'] = merged_df['outcome'].astype(str)
-    matching_rows = merged_df[(merged_df['tokenID'] == contract_token_id) &
-                              (merged_df['outcome'].str.lower() == outcome.lower())]
-
-    if not matching_rows.empty:
-        logger.info(f'Fetching live price for token {contract_token_id}')
-        live_price = call_get_live_price(contract_token_id)
-        logger.info(f'Live price for token {contract_token_id}: {live_price}')
-
-        if live_price is not None:
-            try:
-                # Calculate profit/loss based on the live price
-                price_paid_per_token = matching_rows['price_paid_per_token']
-                total_purchase_value = matching_rows['total_purchase_value']
-                pl = ((live_price - price_paid_per_token) / price_paid_per_token) * total_purchase_value
-
-                # Update the DataFrame with live price and pl
-                merged_df.loc[matching_rows.index, 'live_price'] = live_price
-                merged_df.loc[matching_rows.index, 'pl'] = pl
-            except Exception as e:
-                logger.error(f"Error calculating live price and profit/loss: {e}")
-        else:
-            logger.warning(f"Live price not found for tokenID {contract_token_id}")
-            merged_df.loc[matching_rows.index, 'pl'] = np.nan
+    Args:
+        live_prices (dict or Series): tokenID -> live price.
+        market_outcomes (Series): tokenID -> outcome from the market lookup. Rows whose token is not
+            in the lookup get a NaN pl; rows whose outcome does not match the lookup are left unchanged.
 
+    pl is ((live_price - price_paid_per_token) / price_paid_per_token) * total_purchase_value, and is
+    NaN where no live price is available.
+    """
+    token_ids = merged_df['tokenID']
+    lookup_outcome = token_ids.map(market_outcomes).astype(object)
+    has_market = lookup_outcome.notna()
+    matched = has_market & (merged_df['outcome'].astype(str).str.lower() == lookup_outcome.astype(str).str.lower())
+
+    live_price = token_ids.map(pd.Series(live_prices, dtype=float)).astype(float)
+    price_paid_per_token = merged_df['price_paid_per_token']
+    pl = ((live_price - price_paid_per_token) / price_paid_per_token) * merged_df['total_purchase_value']
+
+    existing_live_price = merged_df['live_price'] if 'live_price' in merged_df.columns else np.nan
+    merged_df['live_price'] = np.where(matched & live_price.notna(), live_price, existing_live_price)
+    merged_df['pl'] = np.where(matched, pl, np.where(has_market, merged_df['pl'], np.nan))
     return merged_df
 
 
-
-
 def find_token_id(market_slug, outcome, market_lookup):
     """Find the token_id based on market_slug and outcome."""
-    for market in market_lookup.values():
-        if market['market_slug'] == market_slug:
-            for token in market['tokens']:
-                if token['outcome'].lower() == outcome.lower():
-                    return token['token_id']
-    return None
+    return as_market_index(market_lookup).token_id(market_slug, outcome)
 
 
-def fetch_data(url):
-    """Fetch data from a given URL and return the JSON response."""
-    try:
-        response = requests.get(url, timeout=10)  # You can specify a timeout
-        response.raise_for_status()  # Raise an error for bad responses (4xx, 5xx)
-        return response.json()
-    except requests.exceptions.RequestException as e:
-        logger.error(f"Error fetching data from URL: {url}. Exception: {e}")
-        return None
-
 def fetch_all_pages(api_key, token_ids, market_slug_outcome_map, csv_output_dir='./data/polymarket_trades/'):
-    page = 1
     offset = 100
     retry_attempts = 0
     all_data = []  # Store all data here
 
-    while True:
-        url = f"https://api.polygonscan.com/api?module=account&action=token1155tx&contractaddress={NEG_RISK_CTF_EXCHANGE}&page={page}&offset={offset}&startblock=0&endblock=99999999&sort=desc&apikey={api_key}"
-        logger.info(f"Fetching transaction data for tokens {token_ids}, page: {page}")
+    # Pages of the closed range up to a final block never change and stay cached; the blocks after it are fetched last
+    end_block = closed_end_block(fetch_data, api_key)
+    ranges = [(0, end_block), (end_block + 1, OPEN_ENDBLOCK)] if end_block is not None else [(0, OPEN_ENDBLOCK)]
 
-        data = fetch_data(url)
+    for startblock, endblock in ranges:
+        page = 1
+        while True:
+            url = f"https://api.polygonscan.com/api?module=account&action=token1155tx&contractaddress={NEG_RISK_CTF_EXCHANGE}&page={page}&offset={offset}&startblock={startblock}&endblock={endblock}&sort=asc&apikey={api_key}"
+            logger.info(f"Fetching transaction data for tokens {token_ids}, blocks {startblock}-{endblock}, page: {page}")
 
-        if data and data['status'] == '1':
-            df = pd.DataFrame(data['result'])
+            data = fetch_data(url)
 
-            if df.empty:
-                logger.info("No more transactions found, ending pagination.")
-                break  # Exit if there are no more transactions
+            if data and data['status'] == '1':
+                df = pd.DataFrame(data['result'])
 
-            all_data.append(df)
-            page += 1  # Go to the next page
-        else:
-            logger.error(f"API response error or no data found for page {page}")
-            if retry_attempts < 5:
-                retry_attempts += 1
-                time.sleep(retry_attempts)
-            else:
+                if df.empty:
+                    logger.info("No more transactions found, ending pagination.")
+                    break  # Exit if there are no more transactions
+
+                all_data.append(df)
+                page += 1  # Go to the next page
+            elif data and str(data.get('message', '')).startswith('No transactions found'):
                 break
+            else:
+                logger.error(f"API response error or no data found for page {page}")
+                if retry_attempts < 5:
+                    retry_attempts += 1
+                    time.sleep(retry_attempts)
+                else:
+                    break
 
     if all_data:
         final_df = pd.concat(all_data, ignore_index=True)  # Combine all pages
@@ -259,7 +206,7 @@ def extract_wallet_ids(leaderboard_url):
     """Scrape the Polymarket leaderboard to extract wallet IDs."""
     logging.info(f"Fetching leaderboard page: {leaderboard_url}")
 
-    response = requests.get(leaderboard_url)
+    response = get_http_client().get(leaderboard_url)
     if response.status_code != 200:
         logging.error(f"Failed to load page {leaderboard_url}, status code: {response.status_code}")
         return []
@@ -287,9 +234,8 @@ def extract_wallet_ids(leaderboard_url):
 
     return wallet_ids
 def load_market_lookup(json_path):
-    """Load market lookup data from a JSON file."""
-    with open(json_path, 'r') as json_file:
-        return json.load(json_file)
+    """Load market lookup data from a JSON file, indexed once per process."""
+    return get_market_index(json_path)
 
 
 
@@ -303,12 +249,10 @@ def find_market_info(token_id, market_lookup):
 
     logger.debug(f"Looking up market info for tokenID: {token_id}")
 
-    for market in market_lookup.values():
-        for token in market['tokens']:
-            if str(token['token_id']) == token_id:
-                logger.debug(
-                    f"Found market info for tokenID {token_id}: market_slug = {market['market_slug']}, outcome = {token['outcome']}")
-                return market['market_slug'], token['outcome']
+    _, market_slug, outcome = as_market_index(market_lookup).token_info(token_id)
+    if market_slug is not None:
+        logger.debug(f"Found market info for tokenID {token_id}: market_slug = {market_slug}, outcome = {outcome}")
+        return market_slug, outcome
 
     logger.warning(f"No market info found for tokenID: {token_id}")
     return None, None
@@ -316,13 +260,6 @@ def find_market_info(token_id, market_lookup):
 
 
 
-
-def fetch_data(url):
-    """Fetch data from a given URL and return the JSON response."""
-    response = requests.get(url)
-    return response.json()
-
-
 def save_to_csv(filename, data, headers, output_dir):
     """Save data to a CSV file in the specified output directory."""
     filepath = os.path.join(output_dir, filename)
@@ -355,26 +292,23 @@ def add_timestamps(erc1155_df, erc20_df):
 
 def enrich_erc1155_data(erc1155_df, market_lookup):
     """
-    Enrich the ERC-1155 DataFrame with market_slug and outcome based on market lookup.
+    Enrich the ERC-1155 DataFrame with market_slug, outcome, condition_id and neg_risk based on market lookup.
+
+    One hash join against the market index's token table; market_slug and outcome are categorical.
+    Tokens not in the lookup get 'Unknown' as slug and outcome.
     """
+    tokens = as_market_index(market_lookup).token_table().set_index('token_id')
+    markets = tokens.reindex(erc1155_df['tokenID'].astype(str).to_numpy())
 
-    def get_market_info(token_id):
-        if pd.isna(token_id) or str(token_id) == 'nan':
-            return 'Unknown', 'Unknown'
-        for market in market_lookup.values():
-            for token in market['tokens']:
-                if str(token['token_id']) == str(token_id):
-                    return market['market_slug'], token['outcome']
-        return 'Unknown', 'Unknown'
-
-    erc1155_df['market_slug'], erc1155_df['outcome'] = zip(
-        *erc1155_df['tokenID'].apply(lambda x: get_market_info(x))
-    )
+    for column in ('market_slug', 'outcome'):
+        values = markets[column].astype(object).fillna('Unknown').to_numpy()
+        erc1155_df[column] = pd.Categorical(values)
+    erc1155_df['condition_id'] = markets['condition_id'].to_numpy()
+    erc1155_df['neg_risk'] = markets['neg_risk'].fillna(False).astype(bool).to_numpy()
 
     return erc1155_df
 
 
-
 def get_transaction_details_by_hash(transaction_hash, api_key, output_dir='./data/polymarket_trades/'):
     """
     Fetch the transaction details by hash from Polygonscan, parse the logs, and save the flattened data as a CSV.
@@ -398,15 +332,9 @@ def get_transaction_details_by_hash(transaction_hash, api_key, output_dir='./dat
 
     try:
         # Fetch transaction details
-        response = requests.get(url)
-        logger.debug(f"Polygonscan API response status: {response.status_code}")
-
-        if response.status_code != 200:
-            logger.error(f"Non-200 status code received: {response.status_code}")
+        data = fetch_data(url)
+        if data is None:
             return None
-
-        # Parse the JSON response
-        data = response.json()
         logger.debug(f"Response JSON: {data}")
 
         # Check if the status is successful
@@ -428,10 +356,12 @@ def get_transaction_details_by_hash(transaction_hash, api_key, output_dir='./dat
     except Exception as e:
         logger.error(f"Exception occurred while fetching transaction details for hash {transaction_hash}: {e}")
         return None
-def add_financial_columns(erc1155_df, erc20_df, wallet_id, market_lookup):
+def add_financial_columns(erc1155_df, erc20_df, wallet_id, market_lookup, update_prices=True):
     """
     Merge the ERC-1155 and ERC-20 dataframes, calculate financial columns,
     including whether a trade was won or lost, and fetch the latest price for each contract and tokenID.
+
+    With update_prices=False the live price and pl columns are left for the caller to fill in.
     """
     # Merge the two dataframes on the 'hash' column
     merged_df = pd.merge(erc1155_df, erc20_df, how='outer', on='hash', suffixes=('_erc1155', '_erc20'))
@@ -477,7 +407,8 @@ def add_financial_columns(erc1155_df, erc20_df, wallet_id, market_lookup):
 
     # Fetch live prices and calculate profit/loss (pl)
     merged_df['tokenID'] = merged_df['tokenID'].astype(str)
-    merged_df = update_latest_prices(merged_df, market_lookup)
+    if update_prices:
+        merged_df = update_latest_prices(merged_df, market_lookup)
 
     return merged_df
 
@@ -501,7 +432,7 @@ def plot_profit_loss_by_trade(df, user_info):
     markets_traded = user_info.get("markets_traded", "N/A")
 
     # Combine market_slug and outcome to create a trade identifier
-    df['trade'] = df['market_slug'] + ' (' + df['outcome'] + ')'
+    df['trade'] = df['market_slug'].astype(str) + ' (' + df['outcome'].astype(str) + ')'
 
     # Aggregate the Profit/Loss (pl) for each unique trade
     aggregated_df = df.groupby('trade', as_index=False).agg({'pl': 'sum'})
@@ -601,7 +532,7 @@ def plot_shares_over_time(df, user_info):
     df = df.sort_values(by='timeStamp_erc1155')
 
     # Combine 'market_slug' and 'outcome' to create a unique label for each token
-    df['token_label'] = df['market_slug'] + " - " + df['outcome']
+    df['token_label'] = df['market_slug'].astype(str) + " - " + df['outcome'].astype(str)
 
     # Create a column for 'position_change' which adds shares for buys and subtracts shares for sells based on 'transaction_type'
     df['position_change'] = df.apply(lambda row: row['shares'] if row['transaction_type'] == 'buy' else -row['shares'], axis=1)
@@ -683,7 +614,7 @@ def plot_user_trades(df, user_info):
         axis=1
     )
 
-    grouped_df_value = df.groupby(['market_slug']).agg({
+    grouped_df_value = df.groupby(['market_slug'], observed=True).agg({
         'total_purchase_value_adjusted': 'sum',
         'shares': 'sum',
     }).reset_index()
@@ -739,7 +670,7 @@ def plot_user_trades(df, user_info):
     df['shares_adjusted'] = df.apply(
         lambda row: row['shares'] if row['transaction_type'] == 'buy' else -row['shares'], axis=1)
 
-    grouped_df_quantity = df.groupby(['market_slug']).agg({
+    grouped_df_quantity = df.groupby(['market_slug'], observed=True).agg({
         'shares_adjusted': 'sum',
         'total_purchase_value': 'sum',
     }).reset_index()
@@ -796,7 +727,7 @@ def plot_user_trades(df, user_info):
     )
 
     # Combine 'market_slug' and 'outcome' into a unique label
-    df['market_outcome_label'] = df['market_slug'] + ' (' + df['outcome'] + ')'
+    df['market_outcome_label'] = df['market_slug'].astype(str) + ' (' + df['outcome'].astype(str) + ')'
 
     # Create the scatter plot, now coloring by 'market_outcome_label'
     fig = px.scatter(
@@ -931,7 +862,7 @@ def create_and_save_pie_chart(df, user_info):
     df['shares_adjusted'] = df.apply(
         lambda row: row['shares'] if row['transaction_type'] == 'buy' else -row['shares'], axis=1)
 
-    holdings = df.groupby('market_slug').agg({'shares_adjusted': 'sum'}).reset_index()
+    holdings = df.groupby('market_slug', observed=True).agg({'shares_adjusted': 'sum'}).reset_index()
 
     holdings = holdings.sort_values('shares_adjusted', ascending=False)
     threshold = 0.02
@@ -1001,7 +932,7 @@ def create_and_save_treemap(df, user_info):
         lambda row: row['shares'] if row['transaction_type'] == 'buy' else -row['shares'], axis=1)
 
     # Group by market_slug and outcome for treemap
-    holdings = df.groupby(['market_slug', 'outcome']).agg({'shares_adjusted': 'sum'}).reset_index()
+    holdings = df.groupby(['market_slug', 'outcome'], observed=True).agg({'shares_adjusted': 'sum'}).reset_index()
 
     # Create the treemap
     fig = px.treemap(
@@ -1038,6 +969,8 @@ def update_latest_prices(merged_df, market_lookup):
     """
     Fetch and update the latest prices for each contract and tokenID pair in the merged_df,
     and calculate profit/loss (pl) based on the live price.
+
+    All tokens are priced in one batch and marked in one pass (see mark_to_market).
     """
     # Ensure 'pl' column exists in the DataFrame
     if 'pl' not in merged_df.columns:
@@ -1045,40 +978,37 @@ def update_latest_prices(merged_df, market_lookup):
 
     # Ensure tokenID is a string and filter out NaN tokenIDs
     merged_df['tokenID'] = merged_df['tokenID'].astype(str)
-    merged_df = merged_df[~merged_df['tokenID'].isnull() & (merged_df['tokenID'] != 'nan')]
-
-    unique_contract_token_pairs = merged_df[['contractAddress_erc1155', 'tokenID']].drop_duplicates()
-
-    for contract_address, token_id in unique_contract_token_pairs.itertuples(index=False):
-        # Ensure token_id is a string
-        token_id_str = str(token_id)
-        if not token_id_str or token_id_str == 'nan':
-            logger.warning("Encountered NaN or empty token_id. Skipping.")
-            continue
-
-        # Find market_slug and outcome using the market_lookup
-        market_slug, outcome = find_market_info(token_id_str, market_lookup)
+    merged_df = merged_df[~merged_df['tokenID'].isnull() & (merged_df['tokenID'] != 'nan')].copy()
 
-        if market_slug and outcome:
-            # Update live price and pl in the DataFrame
-            merged_df = update_live_price_and_pl(merged_df, token_id_str, market_slug=market_slug, outcome=outcome)
-        else:
-            logger.warning(f"Market info not found for token ID: {token_id_str}. Skipping PL calculation for these rows.")
-            # Optionally, set 'pl' to 0 or np.nan for these rows
-            merged_df.loc[merged_df['tokenID'] == token_id_str, 'pl'] = np.nan
+    market_outcomes = as_market_index(market_lookup).token_table().set_index('token_id')['outcome']
+    token_ids = pd.Index(merged_df['tokenID'].unique())
+    known = token_ids.isin(market_outcomes.index)
+    if not known.all():
+        logger.warning(f"Market info not found for {int((~known).sum())} token IDs. Skipping PL calculation for these rows.")
 
-    return merged_df
+    # Price every token in one batch instead of one lookup per token
+    live_prices = fetch_live_prices(token_ids[known])
+    missing = int(known.sum()) - len(live_prices)
+    if missing:
+        logger.warning(f"Live price not found for {missing} token IDs")
 
+    return mark_to_market(merged_df, live_prices, market_outcomes)
 
 
 def call_get_user_profile(wallet_id):
     """
     Call subprocess to get user profile data by wallet_id.
+
+    Successful lookups are cached for the life of the process, so repeated refreshes of the
+    same wallet don't launch the browser again.
     """
     if not wallet_id:
         logger.error("No wallet ID provided.")
         return None
 
+    if wallet_id in user_profile_cache:
+        return user_profile_cache[wallet_id]
+
     try:
         logger.info(f"Calling subprocess to fetch user profile for wallet ID: {wallet_id}")
 
@@ -1097,6 +1027,7 @@ def call_get_user_profile(wallet_id):
 
         # Parse the JSON response from stdout
         user_data = json.loads(result.stdout)
+        user_profile_cache[wallet_id] = user_data
         return user_data
 
     except subprocess.TimeoutExpired:
@@ -1139,7 +1070,7 @@ def replace_hex_values(df, columns):
 
 
 
-def process_wallet_data(wallet_addresses, api_key, plot=True, latest_price_mode=False):
+def process_wallet_data(wallet_addresses, api_key, plot=True, latest_price_mode=False, incremental=False):
     """
     Processes user wallet data to generate user transaction information. If `latest_price_mode` is set to True,
     the function will only retrieve the latest prices for tokens without generating user reports.
@@ -1149,10 +1080,22 @@ def process_wallet_data(wallet_addresses, api_key, plot=True, latest_price_mode=
     - api_key (str): The Polygonscan API key.
     - plot (bool): Whether to generate plots for the user data.
     - latest_price_mode (bool): If True, only retrieve the latest transaction prices for the given wallets.
+    - incremental (bool): Sync the wallets through process_and_plot_user_data instead, which only fetches
+      transfers since each wallet's last sync, saves a parquet file plus a CSV of the main columns and
+      generates all of the user's plots.
+
+    Returns:
+    - list: The wallet addresses whose transactions were saved.
     """
     # Load environment variables
     load_dotenv("keys.env")
 
+    if incremental:
+        saved = process_and_plot_user_data(wallet_addresses, api_key, plot=plot, latest_price_mode=latest_price_mode,
+                                           incremental=True)
+        logger.info("Data processing completed.")
+        return saved
+
     # Ensure the output directory exists
     output_dir = './data/user_trades/'
     os.makedirs(output_dir, exist_ok=True)
@@ -1160,6 +1103,7 @@ def process_wallet_data(wallet_addresses, api_key, plot=True, latest_price_mode=
     # Load the market lookup JSON data
     market_lookup_path = './data/market_lookup.json'
     market_lookup = load_market_lookup(market_lookup_path)
+    saved = []
 
     for wallet_address in wallet_addresses:
         # Fetch user info (username) based on wallet ID
@@ -1179,7 +1123,7 @@ def process_wallet_data(wallet_addresses, api_key, plot=True, latest_price_mode=
         erc20_response = fetch_data(erc20_url)
         erc1155_response = fetch_data(erc1155_url)
 
-        if erc20_response['status'] == '1' and erc1155_response['status'] == '1':
+        if erc20_response and erc1155_response and erc20_response['status'] == '1' and erc1155_response['status'] == '1':
             erc20_data = erc20_response['result']
             erc1155_data = erc1155_response['result']
 
@@ -1210,6 +1154,7 @@ def process_wallet_data(wallet_addresses, api_key, plot=True, latest_price_mode=
             output_file = f'{output_dir}{sanitized_username}_enriched_transactions.csv'
             merged_df.to_csv(output_file, index=False)
             logger.info(f"Enriched data saved to {output_file}")
+            saved.append(wallet_address)
 
             # Check if 'pl' column exists and has non-null values
             if 'pl' in merged_df.columns and merged_df['pl'].notnull().any():
@@ -1220,7 +1165,8 @@ def process_wallet_data(wallet_addresses, api_key, plot=True, latest_price_mode=
             else:
                 logger.warning(f"'pl' column is missing or empty for user {username}. Skipping PL plot.")
 
-        logger.info("Data processing completed.")
+    logger.info("Data processing completed.")
+    return saved
 
 def call_scrape_wallet_ids(top_volume=True, top_profit=True):
     """
@@ -1266,74 +1212,198 @@ def call_scrape_wallet_ids(top_volume=True, top_profit=True):
 
     return wallet_ids
 
-def process_and_plot_user_data(wallet_addresses, api_key, plot=True, latest_price_mode=False):
+def fetch_wallet_transfers(wallet_address, api_key, checkpoints, incremental=False, fetch=fetch_data):
     """
-    Process wallet data for each user, calculate financial data, and optionally generate plots.
+    Network stage of a wallet refresh: look up the user and fetch their ERC-20 and ERC-1155 transfers.
 
-    Args:
-        wallet_addresses (list): List of wallet addresses.
-        api_key (str): Polygonscan API key.
-        plot (bool): Whether to generate plots for the user data.
-        latest_price_mode (bool): If True, only retrieve the latest prices, no plotting.
+    With `incremental`, each action's transfers are only fetched from that action's last sync
+    (see wallet_sync.py), and the stored enriched transactions are returned alongside them. New
+    ERC-1155 transfers are kept even when no ERC-20 transfer arrived with them.
+
+    Returns:
+        dict with wallet_address, user_info, username, stored_df, start_block (where the synced rows
+        replace the stored ones), erc20_df, erc1155_df (both None when there are no new ERC-1155
+        transfers) and synced_blocks; or None if nothing could be fetched.
+    """
+    # Fetch user info (username) based on wallet ID
+    user_info = call_get_user_profile(wallet_address) or {}
+    username = user_info.get('username', "Unknown")
+
+    logger.info(f"Processing wallet for user: {username} ({wallet_address})")
+
+    # The stored transactions are keyed by username, so wallets without one would share (and merge
+    # into) the same "Unknown" file; rebuild those in full instead
+    if incremental and not user_info.get('username'):
+        logger.info(f"No username for {wallet_address}; fetching its full history")
+        incremental = False
+
+    # Resume each action from its last synced block when there is a stored dataset to append to
+    stored_df = load_enriched_transactions(wallet_output_file(username, 'parquet')) if incremental else None
+    start_blocks = checkpoints.start_blocks(wallet_address) if stored_df is not None else {}
+    if not start_blocks.get('token1155tx'):
+        stored_df = None
+        start_blocks = {}
+    else:
+        logger.info(f"Syncing transfers for {wallet_address} from blocks {start_blocks}")
+
+    # Fetch ERC-20 and ERC-1155 transactions, as closed (cacheable) ranges up to a final block and the tail after it
+    end_block = closed_end_block(fetch, api_key)
+    erc20_df, erc1155_df = fetch_user_transactions(wallet_address, api_key, startblocks=start_blocks,
+                                                   endblock=end_block, fetch=fetch)
+    if erc20_df is None or erc1155_df is None:
+        logger.error(f"Failed to fetch transaction data for wallet: {wallet_address}")
+        return None
+    if end_block is not None:
+        # Everything up to the final block is synced; the tail after it is fetched again next time
+        synced_blocks = dict.fromkeys(SYNC_ACTIONS, end_block)
+    else:
+        synced_blocks = {'tokentx': highest_block(erc20_df), 'token1155tx': highest_block(erc1155_df)}
+
+    if stored_df is None:
+        if erc20_df.empty or erc1155_df.empty:
+            logger.error(f"No transaction data found for wallet: {wallet_address}")
+            return None
+    elif erc1155_df.empty:
+        logger.info(f"No new transfers for {wallet_address} since blocks {start_blocks}")
+        erc20_df = erc1155_df = None
+    elif erc20_df.empty:
+        # Transfers without a payment (e.g. redemptions) still need the ERC-20 columns to merge against
+        erc20_df = pd.DataFrame(columns=ERC20_TRANSFER_COLUMNS)
+
+    return {
+        'wallet_address': wallet_address,
+        'user_info': user_info,
+        'username': username,
+        'stored_df': stored_df,
+        'start_block': max(start_blocks.values(), default=0),
+        'erc20_df': erc20_df,
+        'erc1155_df': erc1155_df,
+        'synced_blocks': synced_blocks,
+    }
+
+
+def enrich_wallet_transfers(erc20_df, erc1155_df, wallet_address, market_lookup_path='./data/market_lookup.json'):
+    """
+    CPU stage of a wallet refresh: enrich, timestamp and merge the transfers and add the financial
+    columns, without live prices. Takes only picklable arguments so it can run in a process pool.
     """
-    # Load market lookup data
-    market_lookup_path = './data/market_lookup.json'
     market_lookup = load_market_lookup(market_lookup_path)
 
+    # Enrich ERC-1155 data with market_slug and outcome
+    erc1155_df = enrich_erc1155_data(erc1155_df, market_lookup)
+
+    # Add timestamps
+    erc1155_df, erc20_df = add_timestamps(erc1155_df, erc20_df)
+
+    # Merge and add financial columns
+    return add_financial_columns(erc1155_df, erc20_df, wallet_address, market_lookup, update_prices=False)
+
+
+def wallet_output_file(username, extension):
+    return f'./data/user_trades/{sanitize_filename(username)}_enriched_transactions.{extension}'
+
+
+def save_wallet_data(fetched, enriched_df, market_lookup, checkpoints, plot=True, latest_price_mode=False):
+    """
+    Final stage of a wallet refresh: append the enriched transfers to the stored ones, mark P&L at
+    live prices, save the parquet and CSV, advance the sync checkpoints and generate plots.
+
+    Args:
+        fetched (dict): Result of fetch_wallet_transfers.
+        enriched_df (DataFrame): Result of enrich_wallet_transfers, or None if there were no new transfers.
+
+    Returns:
+        bool: Whether the wallet's transactions were saved.
+    """
     # Define the columns to keep
     columns_to_keep = [
         'timeStamp_erc1155', 'tokenID', 'tokenValue', 'market_slug', 'outcome',
         'value', 'tokenDecimal', 'transaction_type', 'price_paid_per_token',
         'total_purchase_value', 'shares', 'lost', 'won', 'pl', 'live_price'
     ]
+    stored_df = fetched['stored_df']
+    user_info = fetched['user_info']
 
-    for wallet_address in wallet_addresses:
-        # Fetch user info (username) based on wallet ID
-        user_info = call_get_user_profile(wallet_address)
-        username = user_info.get('username', "Unknown")
+    if enriched_df is None:
+        merged_df = stored_df
+    elif stored_df is not None:
+        merged_df = merge_new_transfers(stored_df, enriched_df, fetched['start_block'])
+    else:
+        merged_df = enriched_df
+    merged_df = update_latest_prices(merged_df, market_lookup)
 
-        logger.info(f"Processing wallet for user: {username} ({wallet_address})")
+    # Check for Profit/Loss data
+    if 'pl' in merged_df.columns and merged_df['pl'].notnull().any():
+        if not latest_price_mode and plot:
+            # Generate all plots for the user
+            generate_all_user_plots(merged_df, user_info)
+
+        # Save the merged and enriched data
+        os.makedirs('./data/user_trades/', exist_ok=True)
+
+        # Save to Parquet (default format)
+        output_file_parquet = wallet_output_file(fetched['username'], 'parquet')
+        # Write then rename so concurrent readers only ever see a complete file; the temp file is
+        # unique per wallet and writer so parallel saves never write into each other's
+        temp_file = (f"{output_file_parquet}.{fetched['wallet_address'].lower()}"
+                     f".{os.getpid()}.{threading.get_ident()}.tmp")
+        merged_df.to_parquet(temp_file, index=False)
+        os.replace(temp_file, output_file_parquet)
+        logger.info(f"Enriched data saved to {output_file_parquet}")
+
+        # Only advance the checkpoints once the synced transfers are stored
+        checkpoints.update(fetched['wallet_address'], fetched['synced_blocks'])
+
+        # Save to CSV
+        # Keep only the specified columns and sort by timeStamp_erc1155
+        merged_df = merged_df[columns_to_keep].sort_values(by='timeStamp_erc1155', ascending=True)
+        output_file_csv = wallet_output_file(fetched['username'], 'csv')
+        merged_df.to_csv(output_file_csv, index=False)
+        logger.info(f"Enriched data saved to {output_file_csv}")
+        return True
+
+    logger.warning(f"Profit/Loss column missing or empty for user: {fetched['username']}")
+    return False
+
+
+def process_and_plot_user_data(wallet_addresses, api_key, plot=True, latest_price_mode=False, incremental=False):
+    """
+    Process wallet data for each user, calculate financial data, and optionally generate plots.
 
-        # Fetch ERC-20 and ERC-1155 transactions
-        erc20_df, erc1155_df = fetch_user_transactions(wallet_address, api_key)
+    Wallets are processed one after another; wallet_scheduler.py runs the same stages for many
+    wallets concurrently.
 
-        if erc20_df is not None and erc1155_df is not None:
-            # Enrich ERC-1155 data with market_slug and outcome
-            erc1155_df = enrich_erc1155_data(erc1155_df, market_lookup)
+    Args:
+        wallet_addresses (list): List of wallet addresses.
+        api_key (str): Polygonscan API key.
+        plot (bool): Whether to generate plots for the user data.
+        latest_price_mode (bool): If True, only retrieve the latest prices, no plotting.
+        incremental (bool): Only fetch transfers since the wallet's last sync (see wallet_sync.py) and
+            append them to the stored enriched transactions instead of rebuilding them.
 
-            # Add timestamps
-            erc1155_df, erc20_df = add_timestamps(erc1155_df, erc20_df)
+    Returns:
+        list: The wallet addresses whose transactions were saved.
+    """
+    # Load market lookup data
+    market_lookup_path = './data/market_lookup.json'
+    market_lookup = load_market_lookup(market_lookup_path)
+    checkpoints = WalletCheckpoints()
+    saved = []
 
-            # Merge and add financial columns
-            merged_df = add_financial_columns(erc1155_df, erc20_df, wallet_address, market_lookup)
+    for wallet_address in wallet_addresses:
+        fetched = fetch_wallet_transfers(wallet_address, api_key, checkpoints, incremental=incremental)
+        if fetched is None:
+            continue
 
-            # Check for Profit/Loss data
-            if 'pl' in merged_df.columns and merged_df['pl'].notnull().any():
-                if not latest_price_mode and plot:
-                    # Generate all plots for the user
-                    generate_all_user_plots(merged_df, user_info)
-
-                # Save the merged and enriched data
-                sanitized_username = sanitize_filename(username)
-                output_dir = './data/user_trades/'
-                os.makedirs(output_dir, exist_ok=True)
-
-                # Save to Parquet (default format)
-                output_file_parquet = f'{output_dir}{sanitized_username}_enriched_transactions.parquet'
-                merged_df.to_parquet(output_file_parquet, index=False)
-                logger.info(f"Enriched data saved to {output_file_parquet}")
-
-                # Save to CSV
-                # Keep only the specified columns and sort by timeStamp_erc1155
-                merged_df = merged_df[columns_to_keep].sort_values(by='timeStamp_erc1155', ascending=True)
-                output_file_csv = f'{output_dir}{sanitized_username}_enriched_transactions.csv'
-                merged_df.to_csv(output_file_csv, index=False)
-                logger.info(f"Enriched data saved to {output_file_csv}")
+        enriched_df = None
+        if fetched['erc1155_df'] is not None:
+            enriched_df = enrich_wallet_transfers(fetched['erc20_df'], fetched['erc1155_df'], wallet_address,
+                                                  market_lookup_path)
+        if save_wallet_data(fetched, enriched_df, market_lookup, checkpoints, plot=plot,
+                            latest_price_mode=latest_price_mode):
+            saved.append(wallet_address)
 
-            else:
-                logger.warning(f"Profit/Loss column missing or empty for user: {username}")
-        else:
-            logger.error(f"Failed to fetch transaction data for wallet: {wallet_address}")
+    return saved
 
 
 def generate_all_user_plots(merged_df, user_info):
@@ -1362,71 +1432,94 @@ def generate_all_user_plots(merged_df, user_info):
     logger.info(f"All plots generated for user: {user_info['username']}")
 
 
-def fetch_user_transactions(wallet_address, api_key):
+def fetch_user_transactions(wallet_address, api_key, startblocks=None, endblock=None, fetch=fetch_data):
     """
     Fetch ERC-20 and ERC-1155 transaction data for a user with pagination.
 
+    The two transfer histories are paginated concurrently, oldest first. With `endblock` (see
+    polygonscan_cache.closed_end_block) each history is fetched as a closed range up to it, whose
+    pages never change and stay cached, followed by an open-ended query for the blocks after it.
+
     Args:
         wallet_address (str): Wallet address to fetch transactions for.
         api_key (str): Polygonscan API key.
+        startblocks (dict): {action: block} to only fetch an action's transfers from that block onwards.
+        endblock (int): Last block of the closed range, or None to fetch one open-ended range.
+        fetch (callable): fetch(url) -> JSON response, e.g. an API key pool's rate-limited fetch.
 
     Returns:
-        (DataFrame, DataFrame): DataFrames for ERC-20 and ERC-1155 transactions.
+        (DataFrame, DataFrame): DataFrames for ERC-20 and ERC-1155 transactions, empty when there
+        are none; either is None if its request failed.
     """
+    startblocks = startblocks or {}
+    offset = 1000  # Set the offset/page size based on the API's limits (e.g., 1000)
 
-    def fetch_paginated_data(url):
+    def fetch_paginated_data(action, startblock, endblock):
         """
-        Fetch paginated data from the provided URL.
+        Fetch every transfer of an action in [startblock, endblock], oldest first.
 
-        Args:
-            url (str): Base URL for the API request.
+        Polygonscan returns at most MAX_RESULT_WINDOW results per query (page * offset), so a
+        longer history continues with a new query from the last block reached.
 
         Returns:
-            DataFrame: DataFrame with all paginated results.
+            list: The transfers, or None if a request failed.
         """
         page = 1
-        offset = 1000  # Set the offset/page size based on the API's limits (e.g., 1000)
         all_data = []
 
         while True:
-            paginated_url = f"{url}&page={page}&offset={offset}"
-            data = fetch_data(paginated_url)
+            paginated_url = (f"https://api.polygonscan.com/api"
+                             f"?module=account"
+                             f"&action={action}"
+                             f"&address={wallet_address}"
+                             f"&startblock={startblock}"
+                             f"&endblock={endblock}"
+                             f"&page={page}"
+                             f"&offset={offset}"
+                             f"&sort=asc"
+                             f"&apikey={api_key}")
+            data = fetch(paginated_url)
             if data and data['status'] == '1' and len(data['result']) > 0:
                 all_data.extend(data['result'])
-                page += 1
-            else:
+                if len(data['result']) < offset:
+                    break  # A short page is the last one
+                if page * offset < MAX_RESULT_WINDOW:
+                    page += 1
+                    continue
+                # Restart from the last block reached; its transfers are fetched again in full
+                last_block = int(all_data[-1]['blockNumber'])
+                if last_block <= int(startblock):
+                    logger.error(f"More than {MAX_RESULT_WINDOW} {action} transfers in block {last_block}")
+                    return None
+                all_data = [row for row in all_data if int(row['blockNumber']) < last_block]
+                startblock, page = last_block, 1
+            elif data and (data['status'] == '1' or str(data.get('message', '')).startswith('No transactions found')):
                 break  # Stop if no more data is returned
+            else:
+                logger.error(f"Failed to fetch page {page} of {action} for {wallet_address}: "
+                             f"{data.get('result') if data else 'no response'}")
+                return None
 
-        return pd.DataFrame(all_data)
-
-    # Fetch ERC-20 transactions with pagination
-    erc20_url = (f"https://api.polygonscan.com/api"
-                 f"?module=account"
-                 f"&action=tokentx"
-                 f"&address={wallet_address}"
-                 f"&startblock=0"
-                 f"&endblock=99999999"
-                 f"&sort=desc"
-                 f"&apikey={api_key}")
-
-    erc20_df = fetch_paginated_data(erc20_url)
-
-    # Fetch ERC-1155 transactions with pagination
-    erc1155_url = (f"https://api.polygonscan.com/api"
-                   f"?module=account"
-                   f"&action=token1155tx"
-                   f"&address={wallet_address}"
-                   f"&startblock=0"
-                   f"&endblock=99999999"
-                   f"&sort=desc"
-                   f"&apikey={api_key}")
-
-    erc1155_df = fetch_paginated_data(erc1155_url)
-
-    if not erc20_df.empty and not erc1155_df.empty:
-        return erc20_df, erc1155_df
-    else:
-        return None, None
+        return all_data
+
+    def fetch_history(action):
+        startblock = startblocks.get(action, 0)
+        ranges = [(startblock, OPEN_ENDBLOCK)]
+        if endblock is not None and startblock <= endblock:
+            ranges = [(startblock, endblock), (endblock + 1, OPEN_ENDBLOCK)]
+
+        rows = []
+        for range_start, range_end in ranges:
+            range_rows = fetch_paginated_data(action, range_start, range_end)
+            if range_rows is None:
+                return None
+            rows.extend(range_rows)
+        return pd.DataFrame(rows)
+
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        erc20_df, erc1155_df = executor.map(fetch_history, ['tokentx', 'token1155tx'])
+
+    return erc20_df, erc1155_df
 
 
 def fetch_wallet_addresses(skip_leaderboard, top_volume, top_profit):
@@ -1455,7 +1548,8 @@ def fetch_wallet_addresses(skip_leaderboard, top_volume, top_profit):
 
     return wallet_addresses
 
-def main(wallet_addresses=None, skip_leaderboard=False, top_volume=False, top_profit=False, plot=True, latest_price_mode=False):
+def main(wallet_addresses=None, skip_leaderboard=False, top_volume=False, top_profit=False, plot=True, latest_price_mode=False,
+         incremental=False, replay=False):
 
     """
     Main function to process wallet data and generate plots.
@@ -1467,17 +1561,26 @@ def main(wallet_addresses=None, skip_leaderboard=False, top_volume=False, top_pr
         top_profit (bool): Whether to fetch top profit users.
         plot (bool): Whether to generate plots for the user data.
         latest_price_mode (bool): If True, only retrieve the latest prices, no plotting.
+        incremental (bool): Only fetch transfers since each wallet's last sync.
+        replay (bool): Serve every Polygonscan request from the response cache, without network access.
+
+    Returns:
+        list: The wallet addresses whose transactions were saved.
     """
     # Load environment variables
     load_dotenv("keys.env")
     api_key = os.getenv('POLYGONSCAN_API_KEY')
+    import_legacy_price_cache()
+    if replay:
+        set_replay()
 
     if not wallet_addresses:
         # Fetch wallet addresses if not provided
         wallet_addresses = fetch_wallet_addresses(skip_leaderboard, top_volume, top_profit)
 
     # Process wallet data and optionally generate plots
-    process_and_plot_user_data(wallet_addresses, api_key, plot=plot, latest_price_mode=latest_price_mode)
+    return process_and_plot_user_data(wallet_addresses, api_key, plot=plot, latest_price_mode=latest_price_mode,
+                                      incremental=incremental)
 
 
 if __name__ == "__main__":
@@ -1495,6 +1598,10 @@ if __name__ == "__main__":
     parser.add_argument('--no-plot', action='store_true', help='Disable plot generation.')
     parser.add_argument('--latest-price-mode', action='store_true',
                         help='Only retrieve the latest prices, no plotting.')
+    parser.add_argument('--incremental', action='store_true',
+                        help='Only fetch transfers since the last sync and append them to the stored data.')
+    parser.add_argument('--replay', action='store_true',
+                        help='Serve Polygonscan requests only from the response cache (offline runs).')
 
     args = parser.parse_args()
 
@@ -1505,5 +1612,7 @@ if __name__ == "__main__":
         top_volume=args.top_volume,
         top_profit=args.top_profit,
         plot=not args.no_plot,
-        latest_price_mode=args.latest_price_mode
+        latest_price_mode=args.latest_price_mode,
+        incremental=args.incremental,
+        replay=args.replay
     )
\ No newline at end of file
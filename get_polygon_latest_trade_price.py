@@ -1,6 +1,5 @@
 import os
 import sys
-import requests
 import logging
 import pandas as pd
 import json
@@ -8,6 +7,8 @@ import time
 from dotenv import load_dotenv
 from get_polygon_data import process_wallet_data
 from get_user_profile import get_user_info
+from market_index import as_market_index, get_market_index
+from polygonscan_cache import OPEN_ENDBLOCK, closed_end_block, fetch_data
 from tqdm import tqdm
 from strategies import trades
 
@@ -44,39 +45,49 @@ def get_slug_and_outcome_by_token_id(token_id, market_lookup):
     # Log the token ID we're looking for
     logger.debug(f"Looking for token_id: {token_id} in market lookup")
 
-    for market in market_lookup.values():
-        for token in market['tokens']:
-            logger.debug(f"Checking token_id: {token['token_id']}")
-            if token['token_id'] == str(token_id):  # Ensure both are strings
-                return market['market_slug'], token['outcome']
-
-    return None, None
+    _, market_slug, outcome = as_market_index(market_lookup).token_info(token_id)
+    if market_slug is None:
+        return None, None
+    return market_slug, outcome
 
 
 def load_market_lookup(json_path):
-    """Load market lookup data from a JSON file."""
-    with open(json_path, 'r') as json_file:
-        return json.load(json_file)
+    """Load market lookup data from a JSON file, indexed once per process."""
+    return get_market_index(json_path)
 
 
 def find_token_id(market_slug, outcome, market_lookup):
     """Find the token_id based on market_slug and outcome."""
-    for market in market_lookup.values():
-        if market['market_slug'] == market_slug:
-            for token in market['tokens']:
-                if token['outcome'].lower() == outcome.lower():
-                    return token['token_id']
-    return None
-
-
-def fetch_data(url):
-    """Fetch data from a given URL and return the JSON response."""
-    response = requests.get(url)
-    if response.status_code == 200:
-        return response.json()
+    return as_market_index(market_lookup).token_id(market_slug, outcome)
+
+
+def fetch_latest_transfers(api_key, offset):
+    """
+    The latest `offset` ERC-1155 transfers through the neg-risk exchange, newest first, as a Polygonscan response.
+
+    The blocks after polygonscan_cache.closed_end_block are an open-ended query. The rest of the window
+    comes from a closed range ending at that block, whose response stays cached until the block moves on.
+    """
+    base_url = (f"https://api.polygonscan.com/api?module=account&action=token1155tx"
+                f"&contractaddress={NEG_RISK_CTF_EXCHANGE}&page=1&offset={offset}&sort=desc&apikey={api_key}")
+    end_block = closed_end_block(fetch_data, api_key)
+    if end_block is None:
+        return fetch_data(f"{base_url}&startblock=0&endblock={OPEN_ENDBLOCK}")
+
+    latest = fetch_data(f"{base_url}&startblock={end_block + 1}&endblock={OPEN_ENDBLOCK}")
+    if latest and latest['status'] == '1':
+        result = latest['result']
+    elif latest and str(latest.get('message', '')).startswith('No transactions found'):
+        result = []
     else:
-        logger.error(f"Failed to fetch data from URL: {url}, Status Code: {response.status_code}")
-        return None
+        return latest
+
+    if len(result) < offset:
+        earlier = fetch_data(f"{base_url}&startblock=0&endblock={end_block}")
+        if not earlier or earlier['status'] != '1':
+            return earlier
+        result = result + earlier['result'][:offset - len(result)]
+    return {'status': '1', 'message': 'OK', 'result': result}
 
 
 def replace_hex_with_names(value):
@@ -175,15 +186,11 @@ def get_latest_transactions_for_markets(api_key, market_slug_outcome_list, marke
     # Replace hex with a more meaningful name for file naming
     contract_name = "NEG_RISK_CTF_EXCHANGE"
 
-    # API URL to get last 10,000 transactions
-    url = f"https://api.polygonscan.com/api?module=account&action=token1155tx&contractaddress={NEG_RISK_CTF_EXCHANGE}&page=1&offset={offset}&startblock=0&endblock=99999999&sort=desc&apikey={api_key}"
-
     logger.info(f"Fetching last {offset} transactions for the contract.")
-    logger.info(f"Request URL: {url}")
 
     try:
         # Fetch data from Polygonscan
-        data = fetch_data(url)
+        data = fetch_latest_transfers(api_key, offset)
 
         if data and data['status'] == '1':
             df = pd.DataFrame(data['result'])
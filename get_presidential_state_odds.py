@@ -8,6 +8,7 @@ from py_clob_client.client import ClobClient
 from keys import api_key  # Import only the API key
 from py_clob_client.clob_types import OpenOrderParams
 from py_clob_client.exceptions import PolyApiException
+from question_index import load_question_index, rebuild_question_index
 
 # Replace with your actual host and chain ID
 host = "https://clob.polymarket.com"
@@ -103,21 +104,13 @@ def fetch_and_save_state_odds(state_condition_map, output_csv="state_odds.csv"):
         print(f"Error writing to CSV: {e}")
 
 def search_questions(keywords):
-    update_mapping_if_needed()
-    condition_id_question_map = load_condition_id_question_mapping()
-    if not condition_id_question_map:
+    question_index = load_question_index(update_mapping_if_needed, load_condition_id_question_mapping)
+    if not len(question_index):
         print("No mapping data available.")
         return []
 
-    # Ensure all keywords must be found in the question
-    def all_keywords_in_question(question, keywords):
-        return all(keyword.lower() in question.lower() for keyword in keywords)
-
-    matched_items = [
-        (condition_id, question)
-        for condition_id, question in condition_id_question_map.items()
-        if all_keywords_in_question(question, keywords)
-    ]
+    # All keywords must be found in the question (posting-list intersection on the index)
+    matched_items = question_index.search(keywords)
 
     # Print matched condition IDs along with their corresponding questions
     print(f"Matched Condition IDs and Questions for keywords '{', '.join(keywords)}':")
@@ -142,6 +135,9 @@ def create_condition_id_question_mapping():
         json.dump(condition_id_question_map, f, indent=2)
     print(f"Condition ID to Question mapping saved to {mapping_file_path}")
 
+    # Rebuild the keyword index from the same markets
+    rebuild_question_index(markets_list)
+
 
 
 # Function to check if the mapping file needs to be updated
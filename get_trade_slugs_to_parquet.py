@@ -3,6 +3,7 @@ import requests
 import pandas as pd
 import json
 from dotenv import load_dotenv
+from http_client import get_http_client
 import argparse  # Added for argument parsing
 
 # Load environment variables from a .env file if needed
@@ -36,7 +37,7 @@ def fetch_timeseries_data(clob_token_id, slug, outcome, fidelity=60, separator="
     try:
         print(f"Preparing to fetch timeseries data for clobTokenId: {clob_token_id}, slug: '{slug}', outcome: '{outcome}'")
 
-        response = requests.get(endpoint, headers=headers, params=params)
+        response = get_http_client().get(endpoint, headers=headers, params=params)
         print(f"Request URL for clobTokenId {clob_token_id}: {response.url}")
         response.raise_for_status()
         data = response.json()
@@ -411,9 +411,11 @@ def process_wallet_data_for_user(username):
         return False
     return True
 
-def main(wallet_id_or_username, strategies_file):
+def refresh_user_trades(wallet_id_or_username, strategies_file="./data/strategies.py", generate_summary=True):
     """
-    Main function to process the user trades and strategies.
+    Refresh a user's enriched trade data in-process and optionally regenerate their trade summary HTML.
+
+    Returns True when the trade data was updated.
     """
     # Handle input to determine if it's a wallet ID or username
     if wallet_id_or_username is None:
@@ -427,7 +429,7 @@ def main(wallet_id_or_username, strategies_file):
         username = get_username_from_wallet(wallet_address)
         if username is None:
             logging.error(f"Could not resolve username from wallet address: {wallet_address}")
-            return
+            return False
     else:
         logging.info(f"Input detected as username: {wallet_id_or_username}")
         username = wallet_id_or_username
@@ -436,23 +438,28 @@ def main(wallet_id_or_username, strategies_file):
     # Check if we found a username
     if username is None:
         logging.error(f"Could not find a valid username for {wallet_id_or_username}. Exiting.")
-        return
+        return False
 
-    # Update user's trade data by running get_polygon_data.py as a subprocess
+    # Update user's trade data with get_polygon_data in this process
     try:
         logging.info(f"Updating trade data for user: {username} (wallet: {wallet_address})")
-
-        cmd = [
-            'python', 'get_polygon_data.py',
-            '--wallets', wallet_address or username,  # Use wallet address if available, otherwise username
-            '--skip-leaderboard',
-            '--no-plot'
-        ]
-        subprocess.run(cmd, check=True)
+        import get_polygon_data
+        saved = get_polygon_data.main(
+            wallet_addresses=[wallet_address or username],  # Use wallet address if available, otherwise username
+            skip_leaderboard=True,
+            plot=False,
+            incremental=True  # Only fetch transfers since the previous refresh
+        )
+        if not saved:
+            logging.error(f"Trade data for user {username} was not saved")
+            return False
         logging.info(f"Successfully updated trade data for user: {username}")
-    except subprocess.CalledProcessError as e:
+    except Exception as e:
         logging.error(f"Error updating trade data: {e}", exc_info=True)
-        return
+        return False
+
+    if not generate_summary:
+        return True
 
     # Load user transaction data
     user_data_file = f'./data/user_trades/{username}_enriched_transactions.parquet'
@@ -460,16 +467,24 @@ def main(wallet_id_or_username, strategies_file):
 
     if user_data.empty:
         logging.error(f"No transaction data found for user: {username}. Exiting.")
-        return
+        return True
 
     # Load strategies and generate HTML summary
     trades = load_strategies_from_python()
     if not trades:
         logging.error(f"No valid strategies found in {strategies_file}. Exiting.")
-        return
+        return True
 
     output_html_file = f'./strategies/{username}_last_traded_price.html'
     generate_html_summary(trades, user_data, output_html_file)
+    return True
+
+
+def main(wallet_id_or_username, strategies_file):
+    """
+    Main function to process the user trades and strategies.
+    """
+    refresh_user_trades(wallet_id_or_username, strategies_file)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,217 @@
+import logging
+import random
+import threading
+import time
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+
+try:
+    import httpx
+except ImportError:  # HTTP/2 is optional
+    httpx = None
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TIMEOUT = (5, 30)  # Connect and read timeouts in seconds
+MAX_RETRIES = 3
+RETRY_BACKOFF = 0.5  # Base delay in seconds, doubled on every retry and jittered
+MAX_BACKOFF = 30
+RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+MAX_CONNECTIONS_PER_HOST = 8
+
+# Exceptions a request through HttpClient can raise, whichever transport is in use
+HTTP_ERRORS = (requests.exceptions.RequestException,) + ((httpx.HTTPError,) if httpx is not None else ())
+
+# Clients created in this process, keyed by whether they use HTTP/2
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def _http2_available():
+    if httpx is None:
+        return False
+    try:
+        import h2  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def _is_transient(error):
+    """Whether an exception from a client library call is worth retrying: a connection error or
+    timeout, or an API error without a status or with a retryable one (e.g. py_clob_client's)."""
+    if isinstance(error, HTTP_ERRORS):
+        return True
+    if not hasattr(error, 'status_code'):
+        return False
+    return error.status_code is None or error.status_code in RETRY_STATUSES
+
+
+class HttpClient:
+    """
+    Shared HTTP transport for the Polygonscan, CLOB and Gamma REST APIs.
+
+    Connections are kept alive in a pool per host (requests.Session, or an httpx HTTP/2 client
+    when `http2` is set and httpx with h2 is installed), responses are gzip-compressed, and at
+    most `max_per_host` requests run against one host at a time. Connection errors, timeouts
+    and 429/5xx responses are retried with exponential backoff and full jitter, honouring a
+    Retry-After header.
+
+    Requests made by other client libraries (e.g. py_clob_client) can run through `call` to get
+    the same per-host limit, retries and stats.
+
+    `stats()` reports requests, retries, errors and average latency per host.
+    """
+
+    def __init__(self, timeout=DEFAULT_TIMEOUT, retries=MAX_RETRIES, backoff=RETRY_BACKOFF,
+                 max_per_host=MAX_CONNECTIONS_PER_HOST, http2=False):
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.max_per_host = max_per_host
+        self.http2 = http2 and _http2_available()
+        if http2 and not self.http2:
+            logger.info("httpx with HTTP/2 support is not installed; using HTTP/1.1 keep-alive")
+
+        if self.http2:
+            self._session = httpx.Client(http2=True, timeout=httpx.Timeout(timeout[1], connect=timeout[0]),
+                                         limits=httpx.Limits(max_connections=max_per_host * 4,
+                                                             max_keepalive_connections=max_per_host * 4),
+                                         headers={'Accept-Encoding': 'gzip'})
+        else:
+            self._session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=16, pool_maxsize=max_per_host)
+            self._session.mount('https://', adapter)
+            self._session.mount('http://', adapter)
+            self._session.headers['Accept-Encoding'] = 'gzip'
+
+        self._semaphores = {}
+        self._lock = threading.Lock()
+        self._stats = {}
+
+    def _host_state(self, host):
+        with self._lock:
+            if host not in self._semaphores:
+                self._semaphores[host] = threading.BoundedSemaphore(self.max_per_host)
+                self._stats[host] = {'requests': 0, 'retries': 0, 'errors': 0, 'latency': 0.0}
+            return self._semaphores[host], self._stats[host]
+
+    def _retry_delay(self, attempt, response=None):
+        retry_after = response.headers.get('Retry-After') if response is not None else None
+        if retry_after:
+            try:
+                return min(float(retry_after), MAX_BACKOFF)
+            except ValueError:
+                pass
+        return random.uniform(0, min(MAX_BACKOFF, self.backoff * 2 ** attempt))
+
+    def request(self, method, url, **kwargs):
+        """
+        Send a request, retrying transient failures, and return the final response.
+
+        Raises one of HTTP_ERRORS if the request still fails with a connection error or timeout
+        after all retries; HTTP error statuses are returned for the caller to check.
+        """
+        if not self.http2:
+            kwargs.setdefault('timeout', self.timeout)
+        semaphore, stats = self._host_state(urlparse(url).netloc)
+
+        for attempt in range(self.retries + 1):
+            response = None
+            started = time.perf_counter()
+            try:
+                with semaphore:
+                    response = self._session.request(method, url, **kwargs)
+            except HTTP_ERRORS as e:
+                error = e
+            else:
+                error = None
+            finally:
+                with self._lock:
+                    stats['requests'] += 1
+                    stats['latency'] += time.perf_counter() - started
+
+            if error is None and response.status_code not in RETRY_STATUSES:
+                return response
+            if attempt == self.retries:
+                with self._lock:
+                    stats['errors'] += 1
+                if error is not None:
+                    raise error
+                return response
+
+            delay = self._retry_delay(attempt, response)
+            logger.warning(f"Retrying {method} {urlparse(url).netloc}{urlparse(url).path} in {delay:.1f}s "
+                           f"({error or response.status_code})")
+            with self._lock:
+                stats['retries'] += 1
+            time.sleep(delay)
+
+    def call(self, url, fn, *args, **kwargs):
+        """
+        Return fn(*args, **kwargs), a request another client library makes to `url`'s host, with
+        the host's connection limit, retries and stats of `request`.
+
+        Transient failures (see _is_transient) are retried; any other exception, or the last
+        transient one, is raised.
+        """
+        host = urlparse(url).netloc
+        semaphore, stats = self._host_state(host)
+
+        for attempt in range(self.retries + 1):
+            started = time.perf_counter()
+            try:
+                with semaphore:
+                    return fn(*args, **kwargs)
+            except Exception as e:
+                error = e
+            finally:
+                with self._lock:
+                    stats['requests'] += 1
+                    stats['latency'] += time.perf_counter() - started
+
+            if attempt == self.retries or not _is_transient(error):
+                with self._lock:
+                    stats['errors'] += 1
+                raise error
+
+            delay = self._retry_delay(attempt)
+            logger.warning(f"Retrying {getattr(fn, '__name__', 'call')} on {host} in {delay:.1f}s ({error})")
+            with self._lock:
+                stats['retries'] += 1
+            time.sleep(delay)
+
+    def get(self, url, **kwargs):
+        return self.request('GET', url, **kwargs)
+
+    def get_json(self, url, **kwargs):
+        """GET a URL and return its JSON body, or None (logged) if the request or decoding fails."""
+        try:
+            response = self.get(url, **kwargs)
+            response.raise_for_status()
+            return response.json()
+        except HTTP_ERRORS as e:
+            logger.error(f"Error fetching data from URL: {url}. Exception: {e}")
+        except ValueError as e:
+            logger.error(f"Invalid JSON from URL: {url}. Exception: {e}")
+        return None
+
+    def stats(self):
+        """host -> requests, retries, errors and avg_latency_ms."""
+        with self._lock:
+            return {host: {'requests': stats['requests'], 'retries': stats['retries'], 'errors': stats['errors'],
+                           'avg_latency_ms': 1000 * stats['latency'] / stats['requests'] if stats['requests'] else None}
+                    for host, stats in self._stats.items()}
+
+    def close(self):
+        self._session.close()
+
+
+def get_http_client(http2=False):
+    """The process-wide HttpClient."""
+    with _clients_lock:
+        if http2 not in _clients:
+            _clients[http2] = HttpClient(http2=http2)
+        return _clients[http2]
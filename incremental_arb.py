@@ -0,0 +1,90 @@
+import logging
+import threading
+import time
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+BOOK_PRICE_TYPES = ['ask', 'mid', 'bid']
+
+
+class IncrementalArbEngine:
+    """
+    Keeps every compiled strategy's arb current as individual token prices change.
+
+    Holds the token x price type price matrix and the strategy x price type arb matrix. When a
+    token's prices change, only the strategies that hold it (from the compiled reverse index)
+    are recomputed. `on_book` can be registered as a BookManager listener so each streamed book
+    update flows straight through. `on_update(trade_names)` is called after every recompute.
+    """
+
+    def __init__(self, compiled, price_types=BOOK_PRICE_TYPES, on_update=None):
+        self.compiled = compiled
+        self.price_types = list(price_types)
+        self.on_update = on_update
+        self.prices = np.full((len(compiled.token_ids), len(self.price_types)), np.nan)
+        self.arb = compiled.evaluate(self.prices)
+        self._token_rows = {token_id: row for row, token_id in enumerate(compiled.token_ids)}
+        self._lock = threading.Lock()
+        self._changed = set()
+        self.stats = {'updates': 0, 'recomputed': 0, 'last_latency_ms': None}
+
+    def seed(self, books):
+        """Load the current prices of every token from a `books` mapping and recompute everything."""
+        rows = {self._token_rows[token_id]: self._book_prices(books[token_id])
+                for token_id in self.compiled.token_ids if books.get(token_id) is not None}
+        with self._lock:
+            for row, prices in rows.items():
+                self.prices[row] = prices
+            self.arb = self.compiled.evaluate(self.prices)
+            self._changed.update(self.compiled.trade_names)
+
+    def _book_prices(self, book):
+        prices = []
+        for price_type in self.price_types:
+            price = book.price_and_size(price_type)[0]
+            prices.append(np.nan if price is None else float(price))
+        return prices
+
+    def on_book(self, token_id, book):
+        self.update_prices(token_id, self._book_prices(book))
+
+    def update_prices(self, token_id, prices):
+        """Set one token's prices (in price_types order) and recompute the strategies holding it."""
+        started = time.perf_counter()
+        row = self._token_rows.get(str(token_id))
+        if row is None:
+            return []
+
+        prices = np.asarray(prices, dtype=float)
+        with self._lock:
+            if np.array_equal(self.prices[row], prices, equal_nan=True):
+                return []
+            self.prices[row] = prices
+            strategies = self.compiled.token_strategies.get(str(token_id))
+            if strategies is None or not len(strategies):
+                return []
+            self.arb[strategies] = self.compiled.evaluate(self.prices, strategies)
+            trade_names = [self.compiled.trade_names[i] for i in strategies]
+            self._changed.update(trade_names)
+            self.stats['updates'] += 1
+            self.stats['recomputed'] += len(strategies)
+            self.stats['last_latency_ms'] = (time.perf_counter() - started) * 1000
+
+        if self.on_update is not None:
+            self.on_update(trade_names)
+        return trade_names
+
+    def pop_changed(self):
+        """Names of the strategies recomputed since the last call."""
+        with self._lock:
+            changed, self._changed = self._changed, set()
+        return changed
+
+    def arbitrage_info(self):
+        """Current arb as {trade_name: {price_type: arb_pct}}."""
+        with self._lock:
+            arb = self.arb.tolist()
+        return {trade_name: dict(zip(self.price_types, row))
+                for trade_name, row in zip(self.compiled.trade_names, arb)}
@@ -6,6 +6,7 @@ from py_clob_client.clob_types import ApiCreds, OrderArgs, BalanceAllowanceParam
 from dotenv import load_dotenv
 from py_clob_client.order_builder.constants import BUY, SELL
 from py_clob_client.constants import AMOY
+from market_index import as_market_index, get_market_index
 
 
 # Configure logging
@@ -22,16 +23,15 @@ logging.basicConfig(
 load_dotenv('keys.env')
 
 def load_market_lookup():
-    with open('./data/market_lookup.json', 'r') as f:
-        return json.load(f)
+    return get_market_index('./data/market_lookup.json')
 
 def get_market_ids(market_lookup, slug, outcome):
-    for market_id, details in market_lookup.items():
-        if details['market_slug'] == slug:
-            for token in details['tokens']:
-                if token['outcome'].lower() == outcome.lower():
-                    return market_id, token['token_id']
-    raise ValueError(f"Market slug '{slug}' with outcome '{outcome}' not found in lookup.")
+    market_index = as_market_index(market_lookup)
+    token_id = market_index.token_id(slug, outcome)
+    if token_id is None:
+        raise ValueError(f"Market slug '{slug}' with outcome '{outcome}' not found in lookup.")
+    market_id, _, _ = market_index.token_info(token_id)
+    return market_id, token_id
 
 def get_last_trade_price(client, token_id):
     try:
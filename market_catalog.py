@@ -0,0 +1,330 @@
+import json
+import logging
+import mmap
+import os
+import struct
+import sys
+from collections.abc import Mapping
+
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+MARKET_LOOKUP_PATH = './data/market_lookup.json'
+MARKET_CATALOG_PATH = './data/market_lookup.bin'
+
+# File layout (all little-endian):
+#   header
+#   market records     fixed width, in market_lookup order
+#   token records      fixed width, grouped by market
+#   token order        uint32 token record indices sorted by token_id
+#   slug order         uint32 market record indices sorted by market_slug
+#   condition order    uint32 market record indices sorted by condition_id
+#   string table       utf-8 blob referenced by (offset, length) pairs
+MAGIC = b'PMCATLG\x00'
+VERSION = 1
+
+HEADER = struct.Struct('<8sIIIIQQQQQQ')
+# condition (off, len), slug (off, len), description (off, len), first token, token count, flags
+MARKET_RECORD = struct.Struct('<IIIIIIIII')
+# token_id as a 256-bit big-endian integer (so byte order == numeric order), market index, outcome (off, len)
+TOKEN_RECORD = struct.Struct('<32sIII')
+INDEX_ENTRY = struct.Struct('<I')
+
+FLAG_NEG_RISK = 1
+
+TOKEN_TABLE_COLUMNS = ['token_id', 'condition_id', 'market_slug', 'outcome', 'neg_risk']
+
+
+class _StringTable:
+    """Deduplicating utf-8 string table used while compiling a catalog."""
+
+    def __init__(self):
+        self._chunks = []
+        self._offsets = {}
+        self._size = 0
+
+    def add(self, value):
+        value = '' if value is None else str(value)
+        if value not in self._offsets:
+            encoded = value.encode('utf-8')
+            self._offsets[value] = (self._size, len(encoded))
+            self._chunks.append(encoded)
+            self._size += len(encoded)
+        return self._offsets[value]
+
+    def to_bytes(self):
+        return b''.join(self._chunks)
+
+
+def build_token_table(markets):
+    """
+    token_id -> condition_id, market_slug, outcome, neg_risk as a DataFrame, one row per token.
+
+    Args:
+        markets: (condition_id, market) pairs, e.g. `market_lookup.items()`.
+
+    market_slug and outcome are categorical; the first market listing a token wins.
+    """
+    rows = [(str(token['token_id']), condition_id, market.get('market_slug'), token.get('outcome'),
+             bool(market.get('neg_risk')))
+            for condition_id, market in markets for token in market.get('tokens', [])]
+    table = pd.DataFrame(rows, columns=TOKEN_TABLE_COLUMNS).drop_duplicates('token_id').reset_index(drop=True)
+    table['market_slug'] = table['market_slug'].astype('category')
+    table['outcome'] = table['outcome'].astype('category')
+    return table
+
+
+def _token_key(token_id):
+    """Encode a decimal token_id as a 32-byte sort key, or None if it is not a valid uint256."""
+    try:
+        return int(str(token_id)).to_bytes(32, 'big')
+    except (ValueError, OverflowError):
+        return None
+
+
+def compile_market_catalog(market_lookup, output_path=MARKET_CATALOG_PATH):
+    """
+    Compile a condition_id -> {description, market_slug, tokens} lookup into the binary catalog format.
+
+    The file is written to a temporary path and atomically moved into place so readers never see a partial file.
+    """
+    strings = _StringTable()
+    market_records = []
+    token_records = []
+    condition_keys = []
+    slug_keys = []
+    skipped_tokens = 0
+
+    for condition_id, market in market_lookup.items():
+        first_token = len(token_records)
+        for token in market.get('tokens', []):
+            key = _token_key(token.get('token_id'))
+            if key is None:
+                skipped_tokens += 1
+                continue
+            token_records.append((key, len(market_records), *strings.add(token.get('outcome'))))
+
+        flags = FLAG_NEG_RISK if market.get('neg_risk') else 0
+        market_records.append((
+            *strings.add(condition_id),
+            *strings.add(market.get('market_slug')),
+            *strings.add(market.get('description')),
+            first_token,
+            len(token_records) - first_token,
+            flags,
+        ))
+        condition_keys.append(str(condition_id).encode('utf-8'))
+        slug_keys.append(str(market.get('market_slug') or '').encode('utf-8'))
+
+    # Stable sorts keep lookup order for duplicate slugs, so the first market wins like the JSON scan did
+    token_order = sorted(range(len(token_records)), key=lambda i: token_records[i][0])
+    slug_order = sorted(range(len(market_records)), key=lambda i: slug_keys[i])
+    condition_order = sorted(range(len(market_records)), key=lambda i: condition_keys[i])
+
+    markets_offset = HEADER.size
+    tokens_offset = markets_offset + MARKET_RECORD.size * len(market_records)
+    token_order_offset = tokens_offset + TOKEN_RECORD.size * len(token_records)
+    slug_order_offset = token_order_offset + INDEX_ENTRY.size * len(token_order)
+    condition_order_offset = slug_order_offset + INDEX_ENTRY.size * len(slug_order)
+    strings_offset = condition_order_offset + INDEX_ENTRY.size * len(condition_order)
+
+    output_dir = os.path.dirname(output_path) or '.'
+    os.makedirs(output_dir, exist_ok=True)
+    temp_path = f"{output_path}.tmp"
+    with open(temp_path, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, VERSION, len(market_records), len(token_records), 0,
+                            markets_offset, tokens_offset, token_order_offset,
+                            slug_order_offset, condition_order_offset, strings_offset))
+        for record in market_records:
+            f.write(MARKET_RECORD.pack(*record))
+        for record in token_records:
+            f.write(TOKEN_RECORD.pack(*record))
+        for order in (token_order, slug_order, condition_order):
+            f.write(struct.pack(f'<{len(order)}I', *order))
+        f.write(strings.to_bytes())
+    os.replace(temp_path, output_path)
+
+    if skipped_tokens:
+        logger.warning(f"Skipped {skipped_tokens} tokens without a numeric token_id")
+    logger.info(f"Market catalog with {len(market_records)} markets and {len(token_records)} tokens written to {output_path}")
+
+
+def convert_market_lookup_json(json_path=MARKET_LOOKUP_PATH, output_path=MARKET_CATALOG_PATH):
+    """Convert an existing market_lookup.json into the binary catalog format."""
+    with open(json_path, 'r') as json_file:
+        market_lookup = json.load(json_file)
+    compile_market_catalog(market_lookup, output_path)
+
+
+class MarketCatalog(Mapping):
+    """
+    Read-only, memory-mapped view of a compiled market catalog.
+
+    Opening the file only maps it and reads the header; records are decoded on access.
+    Exposes the same interface as MarketIndex: a condition_id -> market mapping plus
+    `token_info` and `token_id` lookups (binary searches over the sorted index columns).
+    """
+
+    def __init__(self, path=MARKET_CATALOG_PATH):
+        self.path = path
+        self._file = open(path, 'rb')
+        self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        self._token_table = None
+        (magic, version, self._n_markets, self._n_tokens, _,
+         self._markets_offset, self._tokens_offset, self._token_order_offset,
+         self._slug_order_offset, self._condition_order_offset, self._strings_offset) = HEADER.unpack_from(self._mm, 0)
+        if magic != MAGIC or version != VERSION:
+            self.close()
+            raise ValueError(f"{path} is not a version {VERSION} market catalog")
+
+    def close(self):
+        if self._mm is not None:
+            self._mm.close()
+            self._mm = None
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    # Low-level record access
+
+    def _string(self, offset, length):
+        start = self._strings_offset + offset
+        return self._mm[start:start + length].decode('utf-8')
+
+    def _market_record(self, index):
+        return MARKET_RECORD.unpack_from(self._mm, self._markets_offset + index * MARKET_RECORD.size)
+
+    def _token_record(self, index):
+        return TOKEN_RECORD.unpack_from(self._mm, self._tokens_offset + index * TOKEN_RECORD.size)
+
+    def _order(self, base, position):
+        return INDEX_ENTRY.unpack_from(self._mm, base + position * INDEX_ENTRY.size)[0]
+
+    def _condition_id(self, index):
+        record = self._market_record(index)
+        return self._string(record[0], record[1])
+
+    def _slug(self, index):
+        record = self._market_record(index)
+        return self._string(record[2], record[3])
+
+    def _market(self, index):
+        cond_off, cond_len, slug_off, slug_len, desc_off, desc_len, first_token, token_count, flags = \
+            self._market_record(index)
+        tokens = []
+        for token_index in range(first_token, first_token + token_count):
+            key, _, outcome_off, outcome_len = self._token_record(token_index)
+            tokens.append({
+                "token_id": str(int.from_bytes(key, 'big')),
+                "outcome": self._string(outcome_off, outcome_len),
+            })
+        market = {
+            "description": self._string(desc_off, desc_len),
+            "market_slug": self._string(slug_off, slug_len),
+            "tokens": tokens,
+        }
+        if flags & FLAG_NEG_RISK:
+            market["neg_risk"] = True
+        return market
+
+    def _lower_bound(self, base, count, key_func, key):
+        lo, hi = 0, count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if key_func(self._order(base, mid)) < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def _find_market(self, condition_id):
+        key = str(condition_id).encode('utf-8')
+        position = self._lower_bound(self._condition_order_offset, self._n_markets,
+                                     lambda i: self._condition_id(i).encode('utf-8'), key)
+        if position < self._n_markets:
+            index = self._order(self._condition_order_offset, position)
+            if self._condition_id(index) == str(condition_id):
+                return index
+        return None
+
+    # Mapping interface (condition_id -> market dict)
+
+    def __getitem__(self, condition_id):
+        index = self._find_market(condition_id)
+        if index is None:
+            raise KeyError(condition_id)
+        return self._market(index)
+
+    def __contains__(self, condition_id):
+        return self._find_market(condition_id) is not None
+
+    def __iter__(self):
+        for index in range(self._n_markets):
+            yield self._condition_id(index)
+
+    def __len__(self):
+        return self._n_markets
+
+    def values(self):
+        for index in range(self._n_markets):
+            yield self._market(index)
+
+    def items(self):
+        for index in range(self._n_markets):
+            yield self._condition_id(index), self._market(index)
+
+    # Token lookups
+
+    def token_info(self, token_id):
+        """Return (condition_id, market_slug, outcome) for a token_id, or (None, None, None)."""
+        key = _token_key(token_id)
+        if key is None:
+            return None, None, None
+        position = self._lower_bound(self._token_order_offset, self._n_tokens,
+                                     lambda i: self._token_record(i)[0], key)
+        if position < self._n_tokens:
+            record_key, market_index, outcome_off, outcome_len = \
+                self._token_record(self._order(self._token_order_offset, position))
+            if record_key == key:
+                return (self._condition_id(market_index), self._slug(market_index),
+                        self._string(outcome_off, outcome_len))
+        return None, None, None
+
+    def token_table(self):
+        """Every token as a DataFrame (see build_token_table), built on first use."""
+        if self._token_table is None:
+            self._token_table = build_token_table(self.items())
+        return self._token_table
+
+    def token_id(self, market_slug, outcome):
+        """Return the token_id for a market_slug and outcome (case-insensitive), or None."""
+        key = str(market_slug).encode('utf-8')
+        outcome = str(outcome).lower()
+        position = self._lower_bound(self._slug_order_offset, self._n_markets,
+                                     lambda i: self._slug(i).encode('utf-8'), key)
+        while position < self._n_markets:
+            index = self._order(self._slug_order_offset, position)
+            if self._slug(index) != market_slug:
+                break
+            for token in self._market(index)['tokens']:
+                if token['outcome'].lower() == outcome:
+                    return token['token_id']
+            position += 1
+        return None
+
+
+def open_market_catalog(path=MARKET_CATALOG_PATH):
+    """Open a compiled market catalog for reading."""
+    return MarketCatalog(path)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    json_path = sys.argv[1] if len(sys.argv) > 1 else MARKET_LOOKUP_PATH
+    output_path = sys.argv[2] if len(sys.argv) > 2 else MARKET_CATALOG_PATH
+    convert_market_lookup_json(json_path, output_path)
@@ -0,0 +1,96 @@
+import json
+import logging
+import os
+from collections.abc import Mapping
+
+from market_catalog import MarketCatalog, build_token_table
+
+logger = logging.getLogger(__name__)
+
+MARKET_LOOKUP_PATH = './data/market_lookup.json'
+
+# Indexes built in this process, keyed by the lookup file they were loaded from
+_index_cache = {}
+
+
+class MarketIndex(Mapping):
+    """
+    Hash-map index over market_lookup.json.
+
+    Behaves like the original condition_id -> market dict (so existing code that
+    iterates `.values()` or `.items()` keeps working) and adds O(1) lookups:
+    token_id -> (condition_id, market_slug, outcome) and (market_slug, outcome) -> token_id.
+    """
+
+    def __init__(self, market_lookup):
+        self._markets = market_lookup
+        self._by_token_id = {}
+        self._by_slug_outcome = {}
+        self._token_table = None
+
+        for condition_id, market in market_lookup.items():
+            slug = market.get('market_slug')
+            for token in market.get('tokens', []):
+                token_id = str(token['token_id'])
+                outcome = token['outcome']
+                # First entry wins, as in the token table and the lookup scans this replaces
+                self._by_token_id.setdefault(token_id, (condition_id, slug, outcome))
+                # Outcome matching has always been case-insensitive, first match wins
+                self._by_slug_outcome.setdefault((slug, str(outcome).lower()), token_id)
+
+    def __getitem__(self, condition_id):
+        return self._markets[condition_id]
+
+    def __iter__(self):
+        return iter(self._markets)
+
+    def __len__(self):
+        return len(self._markets)
+
+    def token_info(self, token_id):
+        """Return (condition_id, market_slug, outcome) for a token_id, or (None, None, None)."""
+        return self._by_token_id.get(str(token_id), (None, None, None))
+
+    def token_id(self, market_slug, outcome):
+        """Return the token_id for a market_slug and outcome (case-insensitive), or None."""
+        return self._by_slug_outcome.get((market_slug, str(outcome).lower()))
+
+    def token_table(self):
+        """Every token as a DataFrame (see build_token_table), built on first use."""
+        if self._token_table is None:
+            self._token_table = build_token_table(self._markets.items())
+        return self._token_table
+
+
+def as_market_index(market_lookup):
+    """Wrap a raw market lookup dict in a MarketIndex, passing existing indexes and catalogs through unchanged."""
+    if isinstance(market_lookup, (MarketIndex, MarketCatalog)):
+        return market_lookup
+    return MarketIndex(market_lookup)
+
+
+def catalog_path_for(json_path):
+    """Path of the compiled catalog that sits next to a market lookup JSON file."""
+    return os.path.splitext(json_path)[0] + '.bin'
+
+
+def get_market_index(json_path=MARKET_LOOKUP_PATH, reload=False):
+    """
+    Load the market lookup and build its index once per process.
+
+    If a compiled catalog (see market_catalog.py) next to the JSON file is at least as new,
+    it is memory-mapped instead of parsing the JSON. Subsequent calls with the same path
+    return the cached index unless `reload` is set.
+    """
+    if reload or json_path not in _index_cache:
+        catalog_path = catalog_path_for(json_path)
+        if os.path.exists(catalog_path) and (
+                not os.path.exists(json_path) or os.path.getmtime(catalog_path) >= os.path.getmtime(json_path)):
+            _index_cache[json_path] = MarketCatalog(catalog_path)
+            logger.info(f"Opened market catalog for {len(_index_cache[json_path])} markets from {catalog_path}")
+        else:
+            with open(json_path, 'r') as json_file:
+                market_lookup = json.load(json_file)
+            _index_cache[json_path] = MarketIndex(market_lookup)
+            logger.info(f"Built market index for {len(market_lookup)} markets from {json_path}")
+    return _index_cache[json_path]
@@ -0,0 +1,418 @@
+import json
+import logging
+import threading
+import time
+
+import pandas as pd
+
+from order_book import OrderBook
+
+logger = logging.getLogger(__name__)
+
+MARKET_CHANNEL_URL = "wss://ws-subscriptions-clob.polymarket.com/ws/market"
+
+_SIDES = {'bid': 'bids', 'buy': 'bids', 'bids': 'bids', 'ask': 'asks', 'sell': 'asks', 'asks': 'asks'}
+
+
+def _levels(levels):
+    """Normalise [{'price', 'size'}] or [(price, size)] levels to (float, float) pairs."""
+    for level in levels or []:
+        if isinstance(level, dict):
+            yield float(level['price']), float(level['size'])
+        else:
+            yield float(level[0]), float(level[1])
+
+
+def _timestamp(value):
+    """A channel or REST timestamp (milliseconds, often a string) as an int, or None."""
+    try:
+        return int(value) if value is not None else None
+    except (TypeError, ValueError):
+        return None
+
+
+def _top_mismatch(book, change):
+    """How the book's top of book differs from the best_bid/best_ask a price change reports, or None."""
+    for key, (price, _) in (('best_bid', book.best_bid()), ('best_ask', book.best_ask())):
+        reported = change.get(key)
+        if reported is None or price is None:
+            continue
+        if abs(float(reported) - price) > 1e-9:
+            return f"{key} is {price} but the channel reports {reported}"
+    return None
+
+
+class L2Book:
+    """
+    Aggregated price level book for one token.
+
+    Levels are kept in price -> size dicts and the best bid/ask are cached as (price, size)
+    tuples, so reading the top of book is a plain attribute access. A book is `stale` until it
+    has received a snapshot, and again after a detected gap until it is resynced.
+    """
+
+    __slots__ = ('token_id', 'bids', 'asks', 'seq', 'timestamp', 'last_trade_price', 'stale',
+                 '_best_bid', '_best_ask')
+
+    def __init__(self, token_id):
+        self.token_id = token_id
+        self.bids = {}
+        self.asks = {}
+        self.seq = None
+        self.timestamp = None
+        self.last_trade_price = None
+        self.stale = True
+        self._best_bid = (None, None)
+        self._best_ask = (None, None)
+
+    def apply_snapshot(self, bids, asks, seq=None, timestamp=None):
+        self.bids = {price: size for price, size in _levels(bids) if size > 0}
+        self.asks = {price: size for price, size in _levels(asks) if size > 0}
+        self.seq = seq
+        self.timestamp = timestamp
+        self.stale = False
+        self._best_bid = self._top('bids')
+        self._best_ask = self._top('asks')
+
+    def apply_change(self, side, price, size):
+        """Set the size at one price level; a size of 0 removes the level."""
+        side = _SIDES[str(side).lower()]
+        levels = self.bids if side == 'bids' else self.asks
+        price, size = float(price), float(size)
+        best_price = (self._best_bid if side == 'bids' else self._best_ask)[0]
+
+        if size > 0:
+            levels[price] = size
+            better = best_price is None or (price > best_price if side == 'bids' else price < best_price)
+            if better or price == best_price:
+                self._set_best(side, (price, size))
+        elif levels.pop(price, None) is not None and price == best_price:
+            self._set_best(side, self._top(side))
+
+    def _top(self, side):
+        levels = self.bids if side == 'bids' else self.asks
+        if not levels:
+            return (None, None)
+        price = max(levels) if side == 'bids' else min(levels)
+        return (price, levels[price])
+
+    def _set_best(self, side, best):
+        if side == 'bids':
+            self._best_bid = best
+        else:
+            self._best_ask = best
+
+    def best_bid(self):
+        return self._best_bid
+
+    def best_ask(self):
+        return self._best_ask
+
+    def mid(self):
+        bid, ask = self._best_bid[0], self._best_ask[0]
+        if bid is None or ask is None:
+            return None
+        return (bid + ask) / 2
+
+    def price_and_size(self, price_type):
+        """(price, size) for 'ask', 'bid' or 'mid', matching get_price_and_size on a book DataFrame."""
+        if price_type == 'ask':
+            return self._best_ask
+        if price_type == 'bid':
+            return self._best_bid
+        if price_type == 'mid':
+            return self.mid(), None
+        return None, None
+
+    def to_order_book(self, market_id=None):
+        """Snapshot of the current levels as an array-backed OrderBook."""
+        return OrderBook(self.token_id, self.bids.items(), self.asks.items(), market_id=market_id)
+
+    def to_frame(self, market_id=None):
+        """The book in the ./data/book_data CSV layout."""
+        rows = [(market_id, self.token_id, price, size, 'ask') for price, size in sorted(self.asks.items())]
+        rows += [(market_id, self.token_id, price, size, 'bid') for price, size in sorted(self.bids.items(), reverse=True)]
+        return pd.DataFrame(rows, columns=['market_id', 'asset_id', 'price', 'size', 'side'])
+
+
+class BookManager:
+    """
+    Keeps an L2Book per token up to date from market channel messages.
+
+    Messages follow the CLOB market channel: `book` snapshots, `price_change` deltas and
+    `last_trade_price` events, singly or in lists. The channel has no sequence numbers, so a
+    book is checked against what it does send: every price change reports the token's
+    best_bid/best_ask after the change, and if the local book disagrees a message was missed.
+    The book is then marked stale and `resync(token_id)` is called for a fresh snapshot
+    ({'bids', 'asks', 'timestamp'}). Messages and snapshots older than the book's timestamp are
+    already reflected in it (e.g. deltas that raced a REST resync) and are skipped. Feeds that
+    do number their messages (`seq`, as LocalFeed does) are also checked for gaps; after a
+    snapshot without a `seq` the next delta's becomes the baseline. Listeners are called with
+    (token_id, book) after every update.
+
+    `get(token_id)` returns only books that are in sync, so the manager can be passed anywhere
+    a `books` mapping is accepted.
+    """
+
+    def __init__(self, resync=None):
+        self.resync = resync
+        self._books = {}
+        self._listeners = []
+        self._lock = threading.Lock()
+        self.stats = {'messages': 0, 'snapshots': 0, 'changes': 0, 'skipped': 0, 'gaps': 0, 'resyncs': 0}
+
+    def add_listener(self, listener):
+        self._listeners.append(listener)
+
+    def book(self, token_id):
+        token_id = str(token_id)
+        book = self._books.get(token_id)
+        if book is None:
+            book = self._books[token_id] = L2Book(token_id)
+        return book
+
+    def get(self, token_id, default=None):
+        book = self._books.get(str(token_id))
+        if book is None or book.stale:
+            return default
+        return book
+
+    def __contains__(self, token_id):
+        return self.get(token_id) is not None
+
+    def __len__(self):
+        return len(self._books)
+
+    def top_of_book(self, token_id):
+        """((bid, bid_size), (ask, ask_size)) for an in-sync book, or None."""
+        book = self.get(token_id)
+        if book is None:
+            return None
+        return book.best_bid(), book.best_ask()
+
+    def mark_all_stale(self):
+        """Invalidate every book, e.g. after a reconnect, until fresh snapshots arrive."""
+        with self._lock:
+            for book in self._books.values():
+                book.stale = True
+
+    def resync_stale(self):
+        """Fetch fresh snapshots for every stale book, e.g. after a reconnect."""
+        with self._lock:
+            stale = [token_id for token_id, book in self._books.items() if book.stale]
+        for token_id in stale:
+            self._resync(token_id)
+
+    def handle_message(self, message):
+        if isinstance(message, (str, bytes)):
+            message = json.loads(message)
+        if isinstance(message, list):
+            for item in message:
+                self.handle_message(item)
+            return
+
+        self.stats['messages'] += 1
+        event_type = message.get('event_type')
+        if event_type == 'book':
+            self.apply_snapshot(message['asset_id'], message.get('bids', message.get('buys')),
+                                message.get('asks', message.get('sells')),
+                                seq=message.get('seq'), timestamp=message.get('timestamp'))
+        elif event_type == 'price_change':
+            if 'price_changes' in message:
+                # One message per market, with a change per asset
+                for change in message['price_changes']:
+                    self.apply_changes(change['asset_id'], [change], seq=message.get('seq'),
+                                       timestamp=message.get('timestamp'))
+            else:
+                self.apply_changes(message['asset_id'], message.get('changes', []),
+                                   seq=message.get('seq'), timestamp=message.get('timestamp'))
+        elif event_type == 'last_trade_price':
+            self.book(message['asset_id']).last_trade_price = float(message['price'])
+
+    def apply_snapshot(self, token_id, bids, asks, seq=None, timestamp=None):
+        timestamp = _timestamp(timestamp)
+        with self._lock:
+            book = self.book(token_id)
+            if not book.stale and timestamp is not None and book.timestamp is not None and timestamp < book.timestamp:
+                self.stats['skipped'] += 1
+                return
+            book.apply_snapshot(bids, asks, seq=seq, timestamp=timestamp)
+            self.stats['snapshots'] += 1
+        self._notify(book)
+
+    def apply_changes(self, token_id, changes, seq=None, timestamp=None):
+        timestamp = _timestamp(timestamp)
+        with self._lock:
+            book = self.book(token_id)
+            if book.stale:
+                return
+            if timestamp is not None and book.timestamp is not None and timestamp < book.timestamp:
+                self.stats['skipped'] += 1
+                return
+            if seq is not None and book.seq is not None and int(seq) != int(book.seq) + 1:
+                gap = f"expected seq {int(book.seq) + 1}, got {seq}"
+            else:
+                for change in changes:
+                    book.apply_change(change['side'], change['price'], change['size'])
+                gap = _top_mismatch(book, changes[-1]) if changes else None
+                if seq is not None:
+                    book.seq = int(seq)
+                if timestamp is not None:
+                    book.timestamp = timestamp
+                self.stats['changes'] += 1
+            if gap:
+                logger.warning(f"Book for {token_id} is out of sync ({gap}), resyncing")
+                book.stale = True
+                self.stats['gaps'] += 1
+
+        if gap:
+            self._resync(token_id)
+        else:
+            self._notify(book)
+
+    def _resync(self, token_id):
+        if self.resync is None:
+            return
+        try:
+            snapshot = self.resync(token_id)
+        except Exception as e:
+            logger.error(f"Failed to resync book for {token_id}: {e}")
+            return
+        if snapshot is not None:
+            self.stats['resyncs'] += 1
+            self.apply_snapshot(token_id, snapshot.get('bids'), snapshot.get('asks'),
+                                seq=snapshot.get('seq'), timestamp=snapshot.get('timestamp'))
+
+    def _notify(self, book):
+        for listener in self._listeners:
+            try:
+                listener(book.token_id, book)
+            except Exception as e:
+                logger.error(f"Book listener failed for {book.token_id}: {e}", exc_info=True)
+
+
+def clob_snapshot(client):
+    """Resync callback that fetches a REST order book snapshot with a py_clob_client client."""
+    def resync(token_id):
+        order_book = client.get_order_book(token_id)
+        return {
+            'bids': [(order.price, order.size) for order in order_book.bids],
+            'asks': [(order.price, order.size) for order in order_book.asks],
+            'timestamp': getattr(order_book, 'timestamp', None),
+        }
+    return resync
+
+
+class LocalFeed:
+    """
+    Offline stand-in for the market channel.
+
+    Messages are passed straight to the manager, either one at a time or replayed from an
+    iterable or a JSON lines file recorded by MarketChannelFeed. `snapshot` and `change` build
+    messages with consecutive sequence numbers per token; `skip` simulates dropped messages.
+    """
+
+    def __init__(self, manager):
+        self.manager = manager
+        self._seq = {}
+
+    def send(self, message):
+        self.manager.handle_message(message)
+
+    def snapshot(self, token_id, bids, asks):
+        self._seq[token_id] = 0
+        self.send({'event_type': 'book', 'asset_id': token_id, 'seq': 0,
+                   'bids': [{'price': p, 'size': s} for p, s in bids],
+                   'asks': [{'price': p, 'size': s} for p, s in asks]})
+
+    def change(self, token_id, side, price, size, skip=0):
+        self._seq[token_id] = self._seq.get(token_id, 0) + 1 + skip
+        self.send({'event_type': 'price_change', 'asset_id': token_id, 'seq': self._seq[token_id],
+                   'changes': [{'side': side, 'price': price, 'size': size}]})
+
+    def replay(self, messages, delay=0):
+        if isinstance(messages, str):
+            with open(messages, 'r') as f:
+                messages = [line for line in f if line.strip()]
+        for message in messages:
+            self.send(message)
+            if delay:
+                time.sleep(delay)
+
+
+class MarketChannelFeed:
+    """
+    Subscribes to the CLOB market websocket channel for a set of tokens and feeds a BookManager
+    on a background thread, reconnecting with backoff. After a reconnect every book is stale
+    and is resynced through the manager's resync callback (on its own thread, so messages keep
+    flowing) as well as by the snapshots the channel sends on subscribe. Requires the
+    websocket-client package. Raw messages can be recorded to a JSON lines file for replay
+    with LocalFeed.
+    """
+
+    def __init__(self, manager, token_ids, url=MARKET_CHANNEL_URL, record_path=None, max_backoff=60):
+        self.manager = manager
+        self.token_ids = [str(token_id) for token_id in token_ids]
+        self.url = url
+        self.record_path = record_path
+        self.max_backoff = max_backoff
+        self._app = None
+        self._thread = None
+        self._stop = threading.Event()
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name='market-channel', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._app is not None:
+            self._app.close()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+
+    def _run(self):
+        import websocket
+
+        record_file = open(self.record_path, 'a') if self.record_path else None
+        backoff = 1
+        reconnecting = False
+
+        def on_open(ws):
+            nonlocal backoff
+            backoff = 1
+            logger.info(f"Subscribed to market channel for {len(self.token_ids)} tokens")
+            ws.send(json.dumps({'assets_ids': self.token_ids, 'type': 'market'}))
+            if reconnecting and self.manager.resync is not None:
+                threading.Thread(target=self.manager.resync_stale, name='market-resync', daemon=True).start()
+
+        def on_message(ws, message):
+            if message == 'PONG':
+                return
+            if record_file is not None:
+                record_file.write(message.strip() + '\n')
+            try:
+                self.manager.handle_message(message)
+            except Exception as e:
+                logger.error(f"Failed to apply market channel message: {e}", exc_info=True)
+
+        def on_error(ws, error):
+            logger.error(f"Market channel error: {error}")
+
+        try:
+            while not self._stop.is_set():
+                self._app = websocket.WebSocketApp(self.url, on_open=on_open, on_message=on_message,
+                                                   on_error=on_error)
+                self._app.run_forever(ping_interval=10)
+                if self._stop.is_set():
+                    break
+                # The channel re-sends snapshots on subscribe; until then the books can't be trusted
+                self.manager.mark_all_stale()
+                reconnecting = True
+                logger.warning(f"Market channel disconnected, reconnecting in {backoff}s")
+                self._stop.wait(backoff)
+                backoff = min(backoff * 2, self.max_backoff)
+        finally:
+            if record_file is not None:
+                record_file.close()
@@ -0,0 +1,204 @@
+import argparse
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import time
+
+from question_index import QUESTION_INDEX_PATH, get_question_index
+
+logger = logging.getLogger(__name__)
+
+MARKET_STORE_PATH = './data/markets_store.sqlite'
+
+# The CLOB markets endpoint pages with base64 offsets; "LTE=" (-1) marks the last page
+END_CURSOR = "LTE="
+
+
+def open_market_store(store_path=MARKET_STORE_PATH):
+    """Open (and create if needed) the local market store."""
+    os.makedirs(os.path.dirname(store_path) or '.', exist_ok=True)
+    conn = sqlite3.connect(store_path)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS markets (
+            condition_id TEXT PRIMARY KEY,
+            market_json TEXT NOT NULL,
+            marker TEXT NOT NULL,
+            page_cursor TEXT,
+            last_seen REAL NOT NULL
+        )
+    """)
+    conn.execute("CREATE TABLE IF NOT EXISTS sync_state (key TEXT PRIMARY KEY, value TEXT)")
+    return conn
+
+
+def get_sync_state(conn, key, default=None):
+    row = conn.execute("SELECT value FROM sync_state WHERE key = ?", (key,)).fetchone()
+    return row[0] if row else default
+
+
+def set_sync_state(conn, key, value):
+    conn.execute("INSERT OR REPLACE INTO sync_state (key, value) VALUES (?, ?)", (key, value))
+
+
+def market_marker(market):
+    """Update marker for a market: a hash of its canonical JSON, so any field change is detected."""
+    return hashlib.sha1(json.dumps(market, sort_keys=True).encode('utf-8')).hexdigest()
+
+
+def upsert_markets(conn, markets, page_cursor=None):
+    """
+    Insert new markets and update changed ones, leaving unchanged rows untouched.
+
+    Returns (inserted, updated, unchanged, changed_markets).
+    """
+    now = time.time()
+    condition_ids = [market['condition_id'] for market in markets]
+    existing = {}
+    # Batch the marker lookup to stay under SQLite's bound-parameter limit
+    for start in range(0, len(condition_ids), 500):
+        chunk = condition_ids[start:start + 500]
+        placeholders = ','.join('?' * len(chunk))
+        existing.update(conn.execute(
+            f"SELECT condition_id, marker FROM markets WHERE condition_id IN ({placeholders})", chunk))
+
+    inserted = updated = 0
+    changed_markets = []
+    changed_rows = []
+    unchanged_ids = []
+    for market in markets:
+        condition_id = market['condition_id']
+        marker = market_marker(market)
+        previous = existing.get(condition_id)
+        if previous == marker:
+            unchanged_ids.append((now, condition_id))
+            continue
+
+        changed_rows.append((condition_id, json.dumps(market), marker, page_cursor, now))
+        changed_markets.append(market)
+        if previous is None:
+            inserted += 1
+        else:
+            updated += 1
+
+    # Upsert in place so a market keeps its original position (rowid) in the store
+    conn.executemany(
+        "INSERT INTO markets (condition_id, market_json, marker, page_cursor, last_seen) VALUES (?, ?, ?, ?, ?) "
+        "ON CONFLICT(condition_id) DO UPDATE SET market_json = excluded.market_json, marker = excluded.marker, "
+        "page_cursor = excluded.page_cursor, last_seen = excluded.last_seen",
+        changed_rows
+    )
+    conn.executemany("UPDATE markets SET last_seen = ? WHERE condition_id = ?", unchanged_ids)
+
+    return inserted, updated, len(unchanged_ids), changed_markets
+
+
+def sync_markets(client, store_path=MARKET_STORE_PATH, reconcile=False, on_change=None,
+                 question_index_path=QUESTION_INDEX_PATH):
+    """
+    Sync the CLOB market catalog into the local store.
+
+    Incremental mode resumes from the last checkpointed cursor. That page is fetched again
+    because it may have grown since the last run, and only the pages after it are new.
+    Markets whose update marker has not changed are not rewritten.
+
+    Reconcile mode walks every page from the start. It upserts any market that changed on an
+    older page and removes markets the API no longer returns.
+
+    Changed markets are also applied to the question search index (question_index.py), unless
+    `question_index_path` is None. `on_change`, if given, is called with the list of
+    inserted/updated markets for each page. Returns a dict of sync statistics.
+    """
+    conn = open_market_store(store_path)
+    question_index = get_question_index(question_index_path) if question_index_path else None
+    stats = {'pages': 0, 'fetched': 0, 'inserted': 0, 'updated': 0, 'unchanged': 0, 'removed': 0}
+    sync_started = time.time()
+
+    cursor = None if reconcile else get_sync_state(conn, 'last_cursor')
+    completed = False
+    logger.info(f"Starting {'reconciliation' if reconcile else 'incremental'} market sync from cursor: {cursor}")
+
+    try:
+        while True:
+            if cursor is None:
+                response = client.get_markets()
+            else:
+                response = client.get_markets(next_cursor=cursor)
+
+            if 'data' not in response:
+                logger.error("No data found in markets response.")
+                break
+
+            markets = response['data']
+            inserted, updated, unchanged, changed_markets = upsert_markets(conn, markets, page_cursor=cursor)
+            stats['pages'] += 1
+            stats['fetched'] += len(markets)
+            stats['inserted'] += inserted
+            stats['updated'] += updated
+            stats['unchanged'] += unchanged
+            logger.info(f"Page {cursor}: {len(markets)} markets, {inserted} new, {updated} changed")
+
+            if changed_markets and question_index is not None:
+                question_index.update(changed_markets)
+            if changed_markets and on_change is not None:
+                on_change(changed_markets)
+
+            next_cursor = response.get("next_cursor")
+            if not next_cursor or next_cursor == END_CURSOR:
+                # Checkpoint the last page itself so the next run picks up markets appended to it
+                if cursor is not None:
+                    set_sync_state(conn, 'last_cursor', cursor)
+                conn.commit()
+                completed = True
+                break
+
+            set_sync_state(conn, 'last_cursor', next_cursor)
+            conn.commit()
+            cursor = next_cursor
+
+        # Only prune after a complete walk, otherwise unvisited pages would look removed
+        if reconcile and completed:
+            removed_ids = [row[0] for row in conn.execute(
+                "SELECT condition_id FROM markets WHERE last_seen < ?", (sync_started,))]
+            removed = conn.execute("DELETE FROM markets WHERE last_seen < ?", (sync_started,)).rowcount
+            stats['removed'] = removed
+            if question_index is not None:
+                question_index.remove(removed_ids)
+            set_sync_state(conn, 'last_reconciled', str(sync_started))
+            logger.info(f"Reconciliation removed {removed} markets no longer returned by the API")
+
+        set_sync_state(conn, 'last_synced', str(time.time()))
+        conn.commit()
+    finally:
+        conn.close()
+        if question_index is not None and (stats['inserted'] or stats['updated'] or stats['removed']):
+            question_index.save(question_index_path)
+
+    logger.info(f"Market sync complete: {stats}")
+    return stats
+
+
+def load_store_markets(store_path=MARKET_STORE_PATH):
+    """Yield every market in the local store, in the order they were first seen."""
+    conn = open_market_store(store_path)
+    try:
+        for (market_json,) in conn.execute("SELECT market_json FROM markets ORDER BY rowid"):
+            yield json.loads(market_json)
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    from py_clob_client.client import ClobClient
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    parser = argparse.ArgumentParser(description='Incrementally sync the Polymarket market catalog.')
+    parser.add_argument('--reconcile', action='store_true', help='Walk every page and prune removed markets.')
+    parser.add_argument('--store', default=MARKET_STORE_PATH, help='Path to the local market store.')
+    args = parser.parse_args()
+
+    client = ClobClient("https://clob.polymarket.com", chain_id=137)
+    sync_markets(client, store_path=args.store, reconcile=args.reconcile)
@@ -0,0 +1,230 @@
+import json
+import logging
+import os
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+
+from market_sync import END_CURSOR
+
+logger = logging.getLogger(__name__)
+
+MARKETS_DATASET_PATH = './data/markets_data.parquet'
+
+TOKEN_TYPE = pa.struct([
+    ('token_id', pa.string()),
+    ('outcome', pa.string()),
+    ('price', pa.float64()),
+    ('winner', pa.bool_()),
+])
+
+# Fixed schema for the CLOB /markets payload. Unknown fields are dropped, nested
+# objects without a stable shape (rewards) are kept as JSON strings.
+MARKETS_SCHEMA = pa.schema([
+    ('condition_id', pa.string()),
+    ('question_id', pa.string()),
+    ('question', pa.string()),
+    ('description', pa.string()),
+    ('market_slug', pa.string()),
+    ('end_date_iso', pa.string()),
+    ('game_start_time', pa.string()),
+    ('active', pa.bool_()),
+    ('closed', pa.bool_()),
+    ('archived', pa.bool_()),
+    ('accepting_orders', pa.bool_()),
+    ('accepting_order_timestamp', pa.string()),
+    ('enable_order_book', pa.bool_()),
+    ('neg_risk', pa.bool_()),
+    ('neg_risk_market_id', pa.string()),
+    ('neg_risk_request_id', pa.string()),
+    ('is_50_50_outcome', pa.bool_()),
+    ('notifications_enabled', pa.bool_()),
+    ('minimum_order_size', pa.float64()),
+    ('minimum_tick_size', pa.float64()),
+    ('maker_base_fee', pa.float64()),
+    ('taker_base_fee', pa.float64()),
+    ('seconds_delay', pa.float64()),
+    ('fpmm', pa.string()),
+    ('icon', pa.string()),
+    ('image', pa.string()),
+    ('tags', pa.list_(pa.string())),
+    ('rewards', pa.string()),
+    ('tokens', pa.list_(TOKEN_TYPE)),
+])
+
+
+def _to_str(value):
+    if value is None or value == '':
+        return None
+    return str(value)
+
+
+def _to_float(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _to_bool(value):
+    if value is None or value == '':
+        return None
+    if isinstance(value, str):
+        return value.strip().lower() == 'true'
+    return bool(value)
+
+
+def _to_tokens(tokens):
+    return [{
+        'token_id': _to_str(token.get('token_id')),
+        'outcome': _to_str(token.get('outcome')),
+        'price': _to_float(token.get('price')),
+        'winner': _to_bool(token.get('winner')),
+    } for token in (tokens or [])]
+
+
+def _to_tags(tags):
+    return [str(tag) for tag in tags] if tags else []
+
+
+def _to_json(value):
+    return json.dumps(value) if value is not None else None
+
+
+_CONVERTERS = {
+    pa.string(): _to_str,
+    pa.float64(): _to_float,
+    pa.bool_(): _to_bool,
+}
+
+
+def _converter(field):
+    if field.name == 'tokens':
+        return _to_tokens
+    if field.name == 'tags':
+        return _to_tags
+    if field.name == 'rewards':
+        return _to_json
+    return _CONVERTERS[field.type]
+
+
+_FIELD_CONVERTERS = [(field.name, _converter(field)) for field in MARKETS_SCHEMA]
+
+
+def markets_page_to_table(markets):
+    """Convert one page of /markets results into an Arrow table with the fixed schema."""
+    columns = {name: [convert(market.get(name)) for market in markets] for name, convert in _FIELD_CONVERTERS}
+    return pa.Table.from_pydict(columns, schema=MARKETS_SCHEMA)
+
+
+class MarketsDatasetWriter:
+    """
+    Append pages of markets to a Parquet file, one row group per page.
+
+    Only the current page is held in memory. The file is written under a temporary name and
+    moved into place on close, so readers never see a half-written dataset.
+    """
+
+    def __init__(self, path=MARKETS_DATASET_PATH):
+        self.path = path
+        self.rows = 0
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self._temp_path = f"{path}.tmp"
+        self._writer = pq.ParquetWriter(self._temp_path, MARKETS_SCHEMA)
+
+    def write_page(self, markets):
+        if not markets:
+            return
+        self._writer.write_table(markets_page_to_table(markets))
+        self.rows += len(markets)
+
+    def close(self):
+        self._writer.close()
+        os.replace(self._temp_path, self.path)
+        logger.info(f"Wrote {self.rows} markets to {self.path}")
+
+    def abort(self):
+        self._writer.close()
+        os.remove(self._temp_path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+
+def fetch_markets_to_dataset(client, path=MARKETS_DATASET_PATH):
+    """Page through every CLOB market, streaming each page into the Parquet dataset."""
+    next_cursor = None
+    with MarketsDatasetWriter(path) as writer:
+        while True:
+            logger.info(f"Fetching markets with next_cursor: {next_cursor}")
+            if next_cursor is None:
+                response = client.get_markets()
+            else:
+                response = client.get_markets(next_cursor=next_cursor)
+
+            if 'data' not in response:
+                logger.error("No data found in markets response.")
+                break
+
+            writer.write_page(response['data'])
+            next_cursor = response.get("next_cursor")
+            if not next_cursor or next_cursor == END_CURSOR:
+                break
+    return writer.rows
+
+
+def write_markets_to_dataset(markets, path=MARKETS_DATASET_PATH, page_size=500):
+    """Stream an iterable of markets (e.g. the local market store) into the dataset in page-sized chunks."""
+    with MarketsDatasetWriter(path) as writer:
+        page = []
+        for market in markets:
+            page.append(market)
+            if len(page) >= page_size:
+                writer.write_page(page)
+                page = []
+        writer.write_page(page)
+    return writer.rows
+
+
+def read_market_lookup(path=MARKETS_DATASET_PATH):
+    """
+    Build the condition_id -> {description, market_slug, tokens} lookup from the dataset.
+
+    Reads only the needed columns and flattens the nested tokens column in Arrow,
+    keeping the first occurrence of each condition_id.
+    """
+    table = pq.read_table(path, columns=['condition_id', 'description', 'market_slug', 'neg_risk', 'tokens'])
+
+    condition_ids = table['condition_id'].to_numpy(zero_copy_only=False)
+    _, first_rows = np.unique(condition_ids.astype(str), return_index=True)
+    table = table.take(pa.array(np.sort(first_rows)))
+
+    tokens = table['tokens'].combine_chunks()
+    flat_tokens = pc.list_flatten(tokens)
+    token_ids = flat_tokens.field('token_id').to_pylist()
+    outcomes = flat_tokens.field('outcome').to_pylist()
+    # Offsets of each market's slice of the flattened tokens (null lists count as empty)
+    offsets = np.concatenate([[0], np.cumsum(pc.list_value_length(tokens).fill_null(0).to_numpy())])
+
+    lookup_dict = {}
+    for i, (condition_id, description, market_slug, neg_risk) in enumerate(zip(
+            table['condition_id'].to_pylist(), table['description'].to_pylist(),
+            table['market_slug'].to_pylist(), table['neg_risk'].to_pylist())):
+        market = {
+            "description": description,
+            "market_slug": market_slug,
+            "tokens": [{"token_id": token_ids[j], "outcome": outcomes[j]} for j in range(offsets[i], offsets[i + 1])],
+        }
+        if neg_risk:
+            market["neg_risk"] = True
+        lookup_dict[condition_id] = market
+
+    return lookup_dict
@@ -0,0 +1,157 @@
+import numpy as np
+import pandas as pd
+
+BOOK_COLUMNS = ['market_id', 'asset_id', 'price', 'size', 'side']
+
+
+def _sorted_levels(levels, descending):
+    """Split (price, size) levels into price/size arrays sorted best first."""
+    levels = [(float(price), float(size)) for price, size in levels]
+    if not levels:
+        return np.empty(0), np.empty(0)
+    prices, sizes = np.array(levels).T
+    order = np.argsort(-prices if descending else prices, kind='stable')
+    return prices[order], sizes[order]
+
+
+class OrderBook:
+    """
+    Order book snapshot for one token held as NumPy arrays.
+
+    Bids are sorted by descending price and asks by ascending price, so the best level is
+    always at index 0. Cumulative depth per side is computed once on first use.
+    """
+
+    __slots__ = ('token_id', 'market_id', 'bid_prices', 'bid_sizes', 'ask_prices', 'ask_sizes',
+                 '_bid_depth', '_ask_depth')
+
+    def __init__(self, token_id, bids=(), asks=(), market_id=None):
+        self.token_id = token_id
+        self.market_id = market_id
+        self.bid_prices, self.bid_sizes = _sorted_levels(bids, descending=True)
+        self.ask_prices, self.ask_sizes = _sorted_levels(asks, descending=False)
+        self._bid_depth = None
+        self._ask_depth = None
+
+    @classmethod
+    def from_clob(cls, order_book, market_id=None):
+        """Build from a py_clob_client OrderBookSummary."""
+        return cls(order_book.asset_id,
+                   [(order.price, order.size) for order in order_book.bids],
+                   [(order.price, order.size) for order in order_book.asks],
+                   market_id=market_id)
+
+    @classmethod
+    def from_frame(cls, df):
+        """Build from a DataFrame in the ./data/book_data CSV layout."""
+        token_id = str(df['asset_id'].iloc[0]) if not df.empty else None
+        market_id = df['market_id'].iloc[0] if not df.empty else None
+        bids = df[df['side'] == 'bid']
+        asks = df[df['side'] == 'ask']
+        return cls(token_id, zip(bids['price'], bids['size']), zip(asks['price'], asks['size']),
+                   market_id=market_id)
+
+    def to_frame(self):
+        """The book in the ./data/book_data CSV layout, asks then bids."""
+        rows = [(self.market_id, self.token_id, price, size, 'ask')
+                for price, size in zip(self.ask_prices.tolist(), self.ask_sizes.tolist())]
+        rows += [(self.market_id, self.token_id, price, size, 'bid')
+                 for price, size in zip(self.bid_prices.tolist(), self.bid_sizes.tolist())]
+        return pd.DataFrame(rows, columns=BOOK_COLUMNS)
+
+    @property
+    def empty(self):
+        return not len(self.bid_prices) and not len(self.ask_prices)
+
+    def best_bid(self):
+        if not len(self.bid_prices):
+            return (None, None)
+        return (float(self.bid_prices[0]), float(self.bid_sizes[0]))
+
+    def best_ask(self):
+        if not len(self.ask_prices):
+            return (None, None)
+        return (float(self.ask_prices[0]), float(self.ask_sizes[0]))
+
+    def mid(self):
+        if not len(self.bid_prices) or not len(self.ask_prices):
+            return None
+        return float(self.bid_prices[0] + self.ask_prices[0]) / 2
+
+    def spread(self):
+        if not len(self.bid_prices) or not len(self.ask_prices):
+            return None
+        return float(self.ask_prices[0] - self.bid_prices[0])
+
+    def price_and_size(self, price_type):
+        """(price, size) for 'ask', 'bid' or 'mid'; size is None for mid."""
+        if price_type == 'ask':
+            return self.best_ask()
+        if price_type == 'bid':
+            return self.best_bid()
+        if price_type == 'mid':
+            return self.mid(), None
+        return None, None
+
+    def depth(self, side):
+        """Cumulative size per level, best level first, for 'bid' or 'ask'."""
+        if side == 'bid':
+            if self._bid_depth is None:
+                self._bid_depth = np.cumsum(self.bid_sizes)
+            return self._bid_depth
+        if self._ask_depth is None:
+            self._ask_depth = np.cumsum(self.ask_sizes)
+        return self._ask_depth
+
+    def depth_at(self, side, price):
+        """Total size available at `price` or better on one side."""
+        if side == 'bid':
+            levels = np.searchsorted(-self.bid_prices, -price, side='right')
+        else:
+            levels = np.searchsorted(self.ask_prices, price, side='right')
+        return float(self.depth(side)[levels - 1]) if levels else 0.0
+
+
+def book_metrics(books, token_ids, depth_levels=5):
+    """
+    Spread, depth, imbalance and microprice for many tokens at once.
+
+    Args:
+        books (dict): token_id -> OrderBook (or any book with `to_order_book()`, e.g. a streamed L2Book).
+        token_ids (list): Tokens to report on; tokens without a book get NaN rows.
+        depth_levels (int): Number of levels per side summed into bid_depth/ask_depth.
+
+    Returns:
+        pd.DataFrame indexed by token_id with best_bid, best_ask, spread, bid_depth, ask_depth,
+        imbalance (top-of-book size imbalance in [-1, 1]) and microprice.
+    """
+    n = len(token_ids)
+    top = np.full((n, 4), np.nan)  # bid, bid size, ask, ask size
+    depth = np.full((n, 2), np.nan)
+    for i, token_id in enumerate(token_ids):
+        book = books.get(token_id)
+        if book is None:
+            continue
+        if not isinstance(book, OrderBook):
+            book = book.to_order_book()
+        if len(book.bid_prices):
+            top[i, 0:2] = book.bid_prices[0], book.bid_sizes[0]
+        if len(book.ask_prices):
+            top[i, 2:4] = book.ask_prices[0], book.ask_sizes[0]
+        depth[i] = book.bid_sizes[:depth_levels].sum(), book.ask_sizes[:depth_levels].sum()
+
+    bid, bid_size, ask, ask_size = top.T
+    with np.errstate(invalid='ignore', divide='ignore'):
+        top_size = bid_size + ask_size
+        imbalance = (bid_size - ask_size) / top_size
+        microprice = (ask * bid_size + bid * ask_size) / top_size
+
+    return pd.DataFrame({
+        'best_bid': bid,
+        'best_ask': ask,
+        'spread': ask - bid,
+        'bid_depth': depth[:, 0],
+        'ask_depth': depth[:, 1],
+        'imbalance': imbalance,
+        'microprice': microprice,
+    }, index=pd.Index(token_ids, name='token_id'))
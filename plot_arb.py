@@ -8,6 +8,7 @@ import pytz
 import logging
 from strategies import trades
 import json
+from market_index import get_market_index
 # Setup logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
@@ -20,8 +21,7 @@ def load_market_lookup():
     """
     Loads the market lookup JSON and maps slugs to token IDs based on outcomes.
     """
-    with open('./data/market_lookup.json', 'r') as f:
-        market_lookup = json.load(f)
+    market_lookup = get_market_index()
 
     slug_to_token_id = {}
     for market in market_lookup.values():
@@ -48,10 +48,9 @@ def process_and_fetch_data(trade_slug, outcome):
     """
     Fetches the token_id for the given trade_slug and outcome and runs the get_trade_slugs_to_parquet function.
     """
-    market_lookup = load_market_lookup()  # Load the market lookup from JSON
+    token_id = get_market_index().token_id(trade_slug, outcome)  # Indexed once per process
 
-    if trade_slug in market_lookup and outcome in market_lookup[trade_slug]:
-        token_id = market_lookup[trade_slug][outcome]
+    if token_id:
         run_get_trade_slugs_to_parquet(token_id, trade_slug, outcome)
     else:
         logging.error(f"Slug '{trade_slug}' or outcome '{outcome}' not found in the lookup.")
@@ -0,0 +1,189 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from urllib.parse import parse_qsl, urlsplit
+
+from http_client import get_http_client
+
+logger = logging.getLogger(__name__)
+
+POLYGONSCAN_CACHE_DIR = './data/polygonscan_cache'
+POLYGONSCAN_HOST = 'api.polygonscan.com'
+POLYGONSCAN_API_URL = f'https://{POLYGONSCAN_HOST}/api'
+OPEN_RANGE_TTL = 60  # Seconds an open-ended query's response is reused
+OPEN_ENDBLOCK = 99999999  # The endblock callers pass to mean "up to the latest block"
+FINALITY_MARGIN_BLOCKS = 200  # Blocks below the chain head that could still be reorganised
+CLOSED_BLOCK_STEP = 1000  # Closed ranges end on a multiple of this, so their pages are reused between runs
+IMMUTABLE_ACTIONS = frozenset({'eth_getTransactionReceipt', 'eth_getTransactionByHash'})
+EXCLUDED_PARAMS = frozenset({'apikey'})
+
+# Caches created in this process, keyed by directory
+_caches = {}
+_caches_lock = threading.Lock()
+
+
+def request_key(url):
+    """
+    Normalised request parameters of a URL (host, path and sorted query minus the API key) and
+    the SHA-256 digest that addresses its cached response.
+    """
+    parts = urlsplit(url)
+    params = sorted((name, value) for name, value in parse_qsl(parts.query, keep_blank_values=True)
+                    if name.lower() not in EXCLUDED_PARAMS)
+    request = {'host': parts.netloc.lower(), 'path': parts.path, 'params': params}
+    digest = hashlib.sha256(json.dumps(request, separators=(',', ':')).encode('utf-8')).hexdigest()
+    return request, digest
+
+
+def is_closed_request(params):
+    """
+    Whether a request's answer can never change: a lookup by transaction hash, or a block range
+    that ends at an explicit block rather than the open-ended OPEN_ENDBLOCK.
+    """
+    params = dict(params)
+    if params.get('action') in IMMUTABLE_ACTIONS:
+        return True
+    try:
+        return int(params['endblock']) < OPEN_ENDBLOCK
+    except (KeyError, ValueError):
+        return False
+
+
+def closed_end_block(fetch, api_key='', margin=FINALITY_MARGIN_BLOCKS, step=CLOSED_BLOCK_STEP):
+    """
+    The block a historical query should end at to be closed: the chain head (eth_blockNumber)
+    less `margin` blocks that could still be reorganised, rounded down to a multiple of `step`.
+
+    Pages of a range ending here never change, so they are cached for good; callers fetch the
+    blocks after it as a separate open-ended query. Returns None if the head could not be fetched.
+    """
+    data = fetch(f"{POLYGONSCAN_API_URL}?module=proxy&action=eth_blockNumber&apikey={api_key}")
+    try:
+        head = int(data['result'], 16)
+    except (TypeError, KeyError, ValueError):
+        logger.error(f"Could not fetch the latest block number: {data}")
+        return None
+    return max(0, (head - margin) // step * step)
+
+
+def is_cacheable_response(data):
+    """Successful responses and genuine empty results; never rate-limit or other API errors."""
+    if not isinstance(data, dict):
+        return False
+    if 'jsonrpc' in data:
+        return data.get('result') is not None
+    if data.get('status') == '1':
+        return True
+    return data.get('message', '').startswith('No transactions found')
+
+
+class ResponseCache:
+    """
+    Content-addressed on-disk cache of Polygonscan JSON responses.
+
+    Each response is stored in `directory` under the SHA-256 of its normalised request (see
+    request_key), so the same query made with different API keys or parameter orders shares one
+    entry. Closed block ranges and hash lookups are kept forever; open-ended queries are reused
+    for `open_ttl` seconds.
+
+    In replay mode every request is answered from the cache regardless of age and the network
+    is never used, so the wallet pipeline can be run offline and deterministically from a
+    previously recorded cache. Replay is also enabled by setting POLYGONSCAN_REPLAY=1.
+    """
+
+    def __init__(self, directory=POLYGONSCAN_CACHE_DIR, open_ttl=OPEN_RANGE_TTL, replay=None):
+        self.directory = directory
+        self.open_ttl = open_ttl
+        self.replay = os.getenv('POLYGONSCAN_REPLAY') == '1' if replay is None else replay
+        self._lock = threading.Lock()
+        self.stats = {'hits': 0, 'misses': 0, 'stores': 0, 'replay_misses': 0}
+
+    def _path(self, digest):
+        return os.path.join(self.directory, digest[:2], f'{digest}.json')
+
+    def _read(self, digest):
+        try:
+            with open(self._path(digest), 'r') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _write(self, digest, entry):
+        path = self._path(digest)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temp_path = f'{path}.{threading.get_ident()}.tmp'
+        with open(temp_path, 'w') as f:
+            json.dump(entry, f)
+        os.replace(temp_path, path)
+
+    def _count(self, stat):
+        with self._lock:
+            self.stats[stat] += 1
+
+    def get(self, url):
+        """The cached response for a URL if it is still valid (any age in replay mode), else None."""
+        _, digest = request_key(url)
+        entry = self._read(digest)
+        if entry is None:
+            return None
+        if self.replay or entry['closed'] or time.time() - entry['stored_at'] < self.open_ttl:
+            return entry['response']
+        return None
+
+    def put(self, url, data):
+        """Store a response if it is cacheable."""
+        if not is_cacheable_response(data):
+            return
+        request, digest = request_key(url)
+        self._write(digest, {'request': request, 'closed': is_closed_request(request['params']),
+                             'stored_at': time.time(), 'response': data})
+        self._count('stores')
+
+    def fetch_json(self, url, fetch):
+        """
+        A Polygonscan response from the cache, or from `fetch(url)` (then stored) on a miss.
+
+        URLs on other hosts are passed straight to fetch. In replay mode a miss returns None.
+        """
+        if urlsplit(url).netloc.lower() != POLYGONSCAN_HOST:
+            return fetch(url)
+
+        data = self.get(url)
+        if data is not None:
+            self._count('hits')
+            return data
+        if self.replay:
+            self._count('replay_misses')
+            logger.warning(f"Replay mode: no cached response for {request_key(url)[0]['params']}")
+            return None
+
+        self._count('misses')
+        data = fetch(url)
+        self.put(url, data)
+        return data
+
+
+def get_response_cache(directory=POLYGONSCAN_CACHE_DIR):
+    """The process-wide Polygonscan response cache."""
+    with _caches_lock:
+        if directory not in _caches:
+            _caches[directory] = ResponseCache(directory)
+        return _caches[directory]
+
+
+def fetch_data(url, fetch=None):
+    """
+    Fetch data from a given URL and return the JSON response, or None if the request fails.
+
+    Polygonscan responses are served from the on-disk response cache when possible; misses go to
+    `fetch(url)` (default: the shared HTTP client's get_json).
+    """
+    return get_response_cache().fetch_json(url, fetch or get_http_client().get_json)
+
+
+def set_replay(enabled=True, directory=POLYGONSCAN_CACHE_DIR):
+    """Serve every Polygonscan request in this process from the cache only."""
+    get_response_cache(directory).replay = enabled
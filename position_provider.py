@@ -0,0 +1,119 @@
+import logging
+import os
+import threading
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+USER_TRADES_DIR = './data/user_trades'
+
+Position = namedtuple('Position', ['latest_price', 'latest_size', 'average_cost', 'net_shares'])
+
+# Providers created in this process, keyed by user ID
+_providers = {}
+_providers_lock = threading.Lock()
+
+
+def user_trades_path(user_id):
+    return os.path.join(USER_TRADES_DIR, f'{user_id}_enriched_transactions.parquet')
+
+
+def aggregate_positions(df):
+    """
+    Per (market_slug, outcome) position summary from enriched user transactions.
+
+    latest_price/latest_size come from the most recent fill by timeStamp_erc1155. average_cost
+    is the share-weighted price of the buys and net_shares is buys minus sells.
+    """
+    df = df.dropna(subset=['timeStamp_erc1155', 'market_slug', 'outcome'])
+    if df.empty:
+        return {}
+    keys = ['market_slug', 'outcome']
+
+    latest = df.loc[df.groupby(keys, observed=True)['timeStamp_erc1155'].idxmax()].set_index(keys)
+
+    is_buy = (df['transaction_type'] == 'buy').to_numpy()
+    is_sell = (df['transaction_type'] == 'sell').to_numpy()
+    shares = df['shares'].fillna(0).to_numpy(dtype=float)
+    totals = pd.DataFrame({
+        'market_slug': df['market_slug'].to_numpy(),
+        'outcome': df['outcome'].to_numpy(),
+        'bought': np.where(is_buy, shares, 0.0),
+        'paid': np.where(is_buy, shares * df['price_paid_per_token'].fillna(0).to_numpy(dtype=float), 0.0),
+        # Transfers, redemptions and other non-trade rows don't change the net position
+        'net': np.select([is_buy, is_sell], [shares, -shares], 0.0),
+    }).groupby(keys).sum()
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        average_cost = np.where(totals['bought'] > 0, totals['paid'] / totals['bought'], np.nan)
+    totals['average_cost'] = average_cost
+    totals = totals.join(latest[['price_paid_per_token', 'shares']])
+
+    return {key: Position(row.price_paid_per_token, row.shares,
+                          None if np.isnan(row.average_cost) else row.average_cost, row.net)
+            for key, row in zip(totals.index, totals.itertuples(index=False))}
+
+
+class PositionProvider:
+    """
+    A user's positions, loaded from their enriched transactions file only when it changes.
+
+    The file's mtime is checked on each access; the parquet is re-read and re-aggregated only
+    when it has been rewritten, so repeated lookups within and across cycles are dict reads.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._mtime = None
+        self._positions = {}
+        self._lock = threading.Lock()
+
+    def positions(self):
+        """(market_slug, outcome) -> Position, reloaded if the file changed."""
+        try:
+            mtime = os.path.getmtime(self.path)
+        except OSError:
+            logger.warning(f"User trades file not found: {self.path}")
+            self._mtime, self._positions = None, {}
+            return self._positions
+
+        if mtime != self._mtime:
+            with self._lock:
+                if mtime != self._mtime:
+                    try:
+                        df = pd.read_parquet(self.path, columns=[
+                            'market_slug', 'outcome', 'timeStamp_erc1155', 'transaction_type',
+                            'price_paid_per_token', 'shares'])
+                        df['timeStamp_erc1155'] = pd.to_datetime(df['timeStamp_erc1155'])
+                        self._positions = aggregate_positions(df)
+                        logger.info(f"Loaded {len(self._positions)} positions from {self.path}")
+                    except Exception as e:
+                        logger.error(f"Failed to read user trades file: {self.path}. Error: {e}")
+                        self._positions = {}
+                    self._mtime = mtime
+        return self._positions
+
+    def position(self, slug, outcome):
+        return self.positions().get((slug, outcome))
+
+    def actual_price(self, slug, outcome):
+        """(price, size) of the user's latest fill in a market outcome, or (None, None)."""
+        position = self.position(slug, outcome)
+        if position is None:
+            return None, None
+        return position.latest_price, position.latest_size
+
+    def actual_prices(self):
+        """(market_slug, outcome) -> (latest price, latest size) for every position."""
+        return {key: (position.latest_price, position.latest_size) for key, position in self.positions().items()}
+
+
+def get_position_provider(user_id='JeremyRWhittaker'):
+    """The process-wide PositionProvider for a user."""
+    with _providers_lock:
+        if user_id not in _providers:
+            _providers[user_id] = PositionProvider(user_trades_path(user_id))
+        return _providers[user_id]
@@ -0,0 +1,189 @@
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+PRICE_CACHE_PATH = './data/price_cache.sqlite'
+LIVE_PRICE_TTL = 60  # Seconds a live price is fresh unless a caller asks for a different max age
+
+# Caches created in this process, keyed by (namespace, path)
+_caches = {}
+_caches_lock = threading.Lock()
+
+
+class TieredCache:
+    """
+    Two-level cache for small JSON-serialisable values such as live prices.
+
+    L1 is an in-process LRU; L2 is a SQLite database in WAL mode shared by every script and
+    process on the machine. Entries keep the time they were stored, so each lookup can apply
+    its own max age (falling back to the cache's `ttl`). An L2 hit is promoted into L1.
+
+    `stats` counts l1_hits, l2_hits, misses, stale (entries found but too old) and writes.
+    """
+
+    def __init__(self, namespace, path=PRICE_CACHE_PATH, ttl=LIVE_PRICE_TTL, max_entries=10000):
+        self.namespace = namespace
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._l1 = OrderedDict()  # key -> (value, stored_at)
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self.stats = {'l1_hits': 0, 'l2_hits': 0, 'misses': 0, 'stale': 0, 'writes': 0}
+
+        if path:
+            os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+            conn = self._conn()
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS cache (
+                    namespace TEXT NOT NULL,
+                    key TEXT NOT NULL,
+                    value TEXT NOT NULL,
+                    stored_at REAL NOT NULL,
+                    PRIMARY KEY (namespace, key)
+                )
+            """)
+            conn.commit()
+
+    def _conn(self):
+        """One SQLite connection per thread."""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = self._local.conn = sqlite3.connect(self.path, timeout=10)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def _remember(self, key, value, stored_at):
+        with self._lock:
+            self._l1[key] = (value, stored_at)
+            self._l1.move_to_end(key)
+            while len(self._l1) > self.max_entries:
+                self._l1.popitem(last=False)
+
+    def get_entry(self, key, max_age=None):
+        """
+        Return (value, age_in_seconds) for a key, or None if it has never been stored.
+
+        Unlike `get`, entries older than max_age are returned (and counted as stale) so callers
+        can serve them while refreshing.
+        """
+        key = str(key)
+        now = time.time()
+        max_age = self.ttl if max_age is None else max_age
+
+        with self._lock:
+            entry = self._l1.get(key)
+            if entry is not None:
+                self._l1.move_to_end(key)
+        if entry is not None and now - entry[1] < max_age:
+            self.stats['l1_hits'] += 1
+            return entry[0], now - entry[1]
+
+        # L1 miss or too old: another process may have stored a fresher value
+        if self.path:
+            row = self._conn().execute("SELECT value, stored_at FROM cache WHERE namespace = ? AND key = ?",
+                                       (self.namespace, key)).fetchone()
+            if row is not None and (entry is None or row[1] > entry[1]):
+                entry = (json.loads(row[0]), row[1])
+                self._remember(key, *entry)
+                if now - entry[1] < max_age:
+                    self.stats['l2_hits'] += 1
+                    return entry[0], now - entry[1]
+
+        if entry is None:
+            self.stats['misses'] += 1
+            return None
+        self.stats['stale'] += 1
+        return entry[0], now - entry[1]
+
+    def get(self, key, max_age=None):
+        """Return the cached value if it is younger than max_age (default: the cache TTL), else None."""
+        max_age = self.ttl if max_age is None else max_age
+        entry = self.get_entry(key, max_age)
+        if entry is None or entry[1] >= max_age:
+            return None
+        return entry[0]
+
+    def get_entries(self, keys, max_age=None):
+        """
+        {key: (value, age_in_seconds)} for every stored key: `get_entry` for many keys, with L2
+        queried once for all keys missing or too old in L1.
+        """
+        max_age = self.ttl if max_age is None else max_age
+        now = time.time()
+        entries, missing = {}, []
+        with self._lock:
+            for key in map(str, keys):
+                entry = self._l1.get(key)
+                if entry is not None:
+                    self._l1.move_to_end(key)
+                    entries[key] = entry
+                if entry is None or now - entry[1] >= max_age:
+                    missing.append(key)
+
+        # L1 misses or too old: another process may have stored fresher values
+        from_l2 = set()
+        if missing and self.path:
+            conn = self._conn()
+            for start in range(0, len(missing), 500):
+                chunk = missing[start:start + 500]
+                placeholders = ','.join('?' * len(chunk))
+                for key, value, stored_at in conn.execute(
+                        f"SELECT key, value, stored_at FROM cache WHERE namespace = ? AND key IN ({placeholders})",
+                        [self.namespace] + chunk):
+                    if key not in entries or stored_at > entries[key][1]:
+                        entries[key] = (json.loads(value), stored_at)
+                        self._remember(key, *entries[key])
+                        from_l2.add(key)
+
+        for key, (_, stored_at) in entries.items():
+            if now - stored_at >= max_age:
+                self.stats['stale'] += 1
+            elif key in from_l2:
+                self.stats['l2_hits'] += 1
+            else:
+                self.stats['l1_hits'] += 1
+        self.stats['misses'] += len(set(missing) - entries.keys())
+        return {key: (value, now - stored_at) for key, (value, stored_at) in entries.items()}
+
+    def get_many(self, keys, max_age=None):
+        """{key: value} for every key with a fresh value; L2 is queried once for all L1 misses."""
+        max_age = self.ttl if max_age is None else max_age
+        return {key: value for key, (value, age) in self.get_entries(keys, max_age).items() if age < max_age}
+
+    def set(self, key, value):
+        self.set_many({key: value})
+
+    def set_many(self, items):
+        """Store several values in L1 and in one L2 transaction."""
+        now = time.time()
+        rows = []
+        for key, value in items.items():
+            self._remember(str(key), value, now)
+            rows.append((self.namespace, str(key), json.dumps(value), now))
+        if rows and self.path:
+            conn = self._conn()
+            with conn:
+                conn.executemany("INSERT OR REPLACE INTO cache (namespace, key, value, stored_at) VALUES (?, ?, ?, ?)",
+                                 rows)
+        self.stats['writes'] += len(rows)
+
+    def hit_rate(self):
+        hits = self.stats['l1_hits'] + self.stats['l2_hits']
+        total = hits + self.stats['misses'] + self.stats['stale']
+        return hits / total if total else None
+
+
+def get_price_cache(namespace='live_price', path=PRICE_CACHE_PATH, ttl=LIVE_PRICE_TTL):
+    """The process-wide cache for a namespace (live prices by default)."""
+    with _caches_lock:
+        if (namespace, path) not in _caches:
+            _caches[(namespace, path)] = TieredCache(namespace, path=path, ttl=ttl)
+        return _caches[(namespace, path)]
@@ -0,0 +1,128 @@
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+MAX_STALE_AGE = 600  # Seconds a stale price may still be served while it is refreshed
+
+
+class PriceService:
+    """
+    Cached price reads with single-flight fetching and stale-while-revalidate.
+
+    Prices live in a TieredCache (see price_cache.py). A price younger than `max_age` is
+    returned straight from the cache. One older than `max_age` but younger than `max_stale` is
+    returned immediately while a refresh runs in the background. Only a price that is missing
+    (or older than `max_stale`) makes the caller wait for the network.
+
+    Concurrent requests for the same key share one in-flight fetch, so many strategies or
+    wallets asking for the same token at once cost a single API call.
+
+    `stats` counts fetches, coalesced (requests that joined an in-flight fetch), stale_served,
+    and errors.
+    """
+
+    def __init__(self, fetch, cache, max_age=60, max_stale=MAX_STALE_AGE, max_workers=8):
+        """
+        Args:
+            fetch (callable): fetch(key) -> value, or None when the value is unavailable.
+            cache (TieredCache): Where fetched values are stored.
+        """
+        self.fetch = fetch
+        self.cache = cache
+        self.max_age = max_age
+        self.max_stale = max_stale
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='price-service')
+        self._in_flight = {}  # key -> Future
+        self._lock = threading.Lock()
+        self.stats = {'fetches': 0, 'coalesced': 0, 'stale_served': 0, 'errors': 0}
+
+    def _load(self, key, store):
+        try:
+            value = self.fetch(key)
+            if value is not None and store:
+                self.cache.set(key, value)
+            return value
+        except Exception as e:
+            self.stats['errors'] += 1
+            logger.error(f"Failed to fetch price for {key}: {e}")
+            return None
+        finally:
+            with self._lock:
+                self._in_flight.pop(key, None)
+
+    def _submit(self, key, store=True):
+        """(future, owner): the in-flight fetch for a key, started if there was none."""
+        with self._lock:
+            future = self._in_flight.get(key)
+            if future is not None:
+                self.stats['coalesced'] += 1
+                return future, False
+            self.stats['fetches'] += 1
+            future = self._in_flight[key] = self._executor.submit(self._load, key, store)
+            return future, True
+
+    def _cached(self, key, max_age):
+        """The cached value if fresh or servable stale (refreshing it in the background), else None."""
+        return self._servable(key, self.cache.get_entry(key, max_age), max_age)
+
+    def _servable(self, key, entry, max_age):
+        """The value of a cache entry (value, age) if fresh or servable stale, else None."""
+        if entry is None:
+            return None
+        value, age = entry
+        if age < max_age:
+            return value
+        if age < max(self.max_stale, max_age):
+            self.stats['stale_served'] += 1
+            self._submit(key)
+            return value
+        return None
+
+    def get(self, key, max_age=None, wait=True):
+        """
+        The value for a key.
+
+        Args:
+            max_age (float): Freshness for this read, in seconds (default: the service's max_age).
+            wait (bool): Wait for the fetch when nothing servable is cached; otherwise start it and return None.
+        """
+        key = str(key)
+        max_age = self.max_age if max_age is None else max_age
+        value = self._cached(key, max_age)
+        if value is not None:
+            return value
+        future, _ = self._submit(key)
+        return future.result() if wait else None
+
+    def get_many(self, keys, max_age=None, wait=True):
+        """
+        {key: value} for many keys; missing keys are fetched concurrently and stored in one cache write.
+
+        Keys whose value could not be fetched are left out.
+        """
+        keys = list(dict.fromkeys(str(key) for key in keys))
+        max_age = self.max_age if max_age is None else max_age
+        # One cache read for every key, fresh or stale
+        entries = self.cache.get_entries(keys, max_age=max_age)
+
+        values, pending = {}, {}
+        for key in keys:
+            value = self._servable(key, entries.get(key), max_age)
+            if value is not None:
+                values[key] = value
+            else:
+                pending[key] = self._submit(key, store=not wait)
+
+        if wait and pending:
+            fetched = {key: future.result() for key, (future, _) in pending.items()}
+            self.cache.set_many({key: value for key, value in fetched.items()
+                                 if value is not None and pending[key][1]})
+            values.update((key, value) for key, value in fetched.items() if value is not None)
+        return values
+
+    def refresh(self, keys):
+        """Start background fetches for keys without waiting for them."""
+        for key in keys:
+            self._submit(str(key))
@@ -0,0 +1,247 @@
+import bisect
+import json
+import logging
+import os
+import re
+
+logger = logging.getLogger(__name__)
+
+QUESTION_INDEX_PATH = './data/question_index.json'
+FIELDS = ('question', 'description')
+
+_TOKEN_PATTERN = re.compile(r'\w+')
+
+# Indexes loaded in this process, keyed by file path
+_index_cache = {}
+# Whether the scripts' condition_id -> question mapping file has been checked for freshness
+_mapping_checked = False
+
+
+def tokenize(text):
+    """Lowercase word tokens of a string."""
+    return _TOKEN_PATTERN.findall(str(text or '').lower())
+
+
+class QuestionIndex:
+    """
+    Inverted index over market questions and descriptions.
+
+    Each field maps term -> set of document ids. A multi-keyword search intersects the
+    posting lists, smallest first. Keyword terms match word prefixes, so "democrat" finds
+    "Democrats", and a keyword's first term also matches inside words ("ump" finds "Trump"),
+    as the old substring scan did. Candidates are then checked against the full keyword so
+    phrases like "Presidential Election" keep their meaning.
+    """
+
+    def __init__(self):
+        self._condition_ids = []   # doc id -> condition_id
+        self._doc_ids = {}         # condition_id -> doc id
+        self._texts = {field: [] for field in FIELDS}
+        self._postings = {field: {} for field in FIELDS}
+        self._vocabulary = {}      # field -> sorted terms, rebuilt lazily after updates
+
+    @classmethod
+    def from_markets(cls, markets):
+        index = cls()
+        index.update(markets)
+        return index
+
+    def __len__(self):
+        return len(self._doc_ids)
+
+    def update(self, markets):
+        """Add new markets and re-index changed ones (dicts with condition_id, question, description)."""
+        for market in markets:
+            condition_id = market.get('condition_id')
+            if not condition_id:
+                continue
+            doc_id = self._doc_ids.get(condition_id)
+            if doc_id is None:
+                doc_id = len(self._condition_ids)
+                self._doc_ids[condition_id] = doc_id
+                self._condition_ids.append(condition_id)
+                for field in FIELDS:
+                    self._texts[field].append('')
+
+            for field in FIELDS:
+                old_text = self._texts[field][doc_id]
+                new_text = market.get(field) or ''
+                if old_text == new_text:
+                    continue
+                self._unindex(field, doc_id, old_text)
+                self._texts[field][doc_id] = new_text
+                for term in set(tokenize(new_text)):
+                    self._postings[field].setdefault(term, set()).add(doc_id)
+        self._vocabulary.clear()
+
+    def remove(self, condition_ids):
+        """Drop markets from the index (their doc ids are left empty)."""
+        for condition_id in condition_ids:
+            doc_id = self._doc_ids.pop(condition_id, None)
+            if doc_id is None:
+                continue
+            for field in FIELDS:
+                self._unindex(field, doc_id, self._texts[field][doc_id])
+                self._texts[field][doc_id] = ''
+            self._condition_ids[doc_id] = None
+        self._vocabulary.clear()
+
+    def _unindex(self, field, doc_id, text):
+        postings = self._postings[field]
+        for term in set(tokenize(text)):
+            docs = postings.get(term)
+            if docs is not None:
+                docs.discard(doc_id)
+                if not docs:
+                    del postings[term]
+
+    def _sorted_vocabulary(self, field):
+        vocabulary = self._vocabulary.get(field)
+        if vocabulary is None:
+            vocabulary = self._vocabulary[field] = sorted(self._postings[field])
+        return vocabulary
+
+    def _prefix_docs(self, field, prefix):
+        """Union of the posting lists of every term starting with `prefix`."""
+        vocabulary = self._sorted_vocabulary(field)
+        postings = self._postings[field]
+        start = bisect.bisect_left(vocabulary, prefix)
+        end = bisect.bisect_left(vocabulary, prefix + '\uffff', lo=start)
+        if end - start == 1:
+            return postings[vocabulary[start]]
+        docs = set()
+        for term in vocabulary[start:end]:
+            docs |= postings[term]
+        return docs
+
+    def _substring_docs(self, field, fragment):
+        """Union of the posting lists of every term containing `fragment`."""
+        postings = self._postings[field]
+        docs = set()
+        for term in self._sorted_vocabulary(field):
+            if fragment in term:
+                docs |= postings[term]
+        return docs
+
+    def search(self, keywords, fields=('question',)):
+        """
+        Return [(condition_id, question)] for markets whose fields contain every keyword.
+
+        Results keep the order markets were first indexed in.
+        """
+        keywords = [keyword.lower() for keyword in keywords]
+        term_docs = []
+        for keyword in keywords:
+            for i, term in enumerate(tokenize(keyword)):
+                # Later terms follow a separator in the keyword, so they start a word in the text too;
+                # the first one can sit anywhere inside a word unless the keyword starts with a separator
+                mid_word = i == 0 and _TOKEN_PATTERN.match(keyword) is not None
+                docs = set()
+                for field in fields:
+                    docs |= self._substring_docs(field, term) if mid_word else self._prefix_docs(field, term)
+                if not docs:
+                    return []
+                term_docs.append(docs)
+
+        if term_docs:
+            term_docs.sort(key=len)
+            candidates = set(term_docs[0])
+            for docs in term_docs[1:]:
+                candidates &= docs
+                if not candidates:
+                    return []
+        else:
+            # No keywords, or none with word characters (e.g. "?"): every market is a candidate
+            candidates = {doc_id for doc_id, condition_id in enumerate(self._condition_ids) if condition_id is not None}
+
+        matches = []
+        for doc_id in sorted(candidates):
+            text = ' '.join(self._texts[field][doc_id] for field in fields).lower()
+            if all(keyword in text for keyword in keywords):
+                matches.append((self._condition_ids[doc_id], self._texts['question'][doc_id]))
+        return matches
+
+    def question(self, condition_id):
+        doc_id = self._doc_ids.get(condition_id)
+        return self._texts['question'][doc_id] if doc_id is not None else None
+
+    def save(self, path=QUESTION_INDEX_PATH):
+        """Persist documents and posting lists as JSON."""
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        data = {
+            'condition_ids': self._condition_ids,
+            'texts': self._texts,
+            'postings': {field: {term: sorted(docs) for term, docs in postings.items()}
+                         for field, postings in self._postings.items()},
+        }
+        temp_path = f"{path}.tmp"
+        with open(temp_path, 'w') as f:
+            json.dump(data, f)
+        os.replace(temp_path, path)
+        logger.info(f"Question index with {len(self._doc_ids)} markets saved to {path}")
+
+    @classmethod
+    def load(cls, path=QUESTION_INDEX_PATH):
+        with open(path, 'r') as f:
+            data = json.load(f)
+        index = cls()
+        index._condition_ids = data['condition_ids']
+        index._doc_ids = {cid: doc_id for doc_id, cid in enumerate(index._condition_ids) if cid is not None}
+        index._texts = data['texts']
+        index._postings = {field: {term: set(docs) for term, docs in postings.items()}
+                           for field, postings in data['postings'].items()}
+        return index
+
+
+def get_question_index(path=QUESTION_INDEX_PATH, reload=False):
+    """
+    Load the question index once per process.
+
+    If the index file does not exist yet it is built from the local market store
+    (see market_sync.py), if there is one, and saved.
+    """
+    if reload or path not in _index_cache:
+        if os.path.exists(path):
+            _index_cache[path] = QuestionIndex.load(path)
+        else:
+            from market_sync import MARKET_STORE_PATH, load_store_markets
+            index = QuestionIndex()
+            if os.path.exists(MARKET_STORE_PATH):
+                index.update(load_store_markets())
+                index.save(path)
+            _index_cache[path] = index
+        logger.info(f"Loaded question index with {len(_index_cache[path])} markets")
+    return _index_cache[path]
+
+
+def rebuild_question_index(markets, path=QUESTION_INDEX_PATH):
+    """Build a fresh index from a full market list, save it and make it the process-wide index."""
+    index = QuestionIndex.from_markets(markets)
+    index.save(path)
+    _index_cache[path] = index
+    return index
+
+
+def load_question_index(update_mapping=None, load_mapping=None, path=QUESTION_INDEX_PATH):
+    """
+    The question index for the market scripts' keyword searches.
+
+    Args:
+        update_mapping (callable): Refreshes the condition_id -> question mapping file if it is
+            stale; called once per process.
+        load_mapping (callable): Returns that {condition_id: question} mapping, used to seed the
+            index when none exists yet.
+    """
+    global _mapping_checked
+    if update_mapping is not None and not _mapping_checked:
+        update_mapping()
+        _mapping_checked = True
+
+    question_index = get_question_index(path)
+    if not len(question_index) and load_mapping is not None:
+        # No index yet, seed it from the existing condition_id -> question mapping
+        question_index = rebuild_question_index(
+            ({'condition_id': condition_id, 'question': question}
+             for condition_id, question in load_mapping().items()),
+            path)
+    return question_index
@@ -0,0 +1,62 @@
+import threading
+import time
+from urllib.parse import urlparse
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket.
+
+    `rate` tokens are added per second up to `capacity`; `acquire` blocks until a token is available.
+    """
+
+    def __init__(self, rate, capacity=None):
+        self.rate = float(rate)
+        self.capacity = float(capacity if capacity is not None else max(rate, 1))
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def try_acquire(self, tokens=1):
+        with self._lock:
+            self._refill(time.monotonic())
+            if self._tokens >= tokens:
+                self._tokens -= tokens
+                return True
+            return False
+
+    def acquire(self, tokens=1):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._refill(now)
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return
+                wait = (tokens - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+class HostRateLimiter:
+    """One token bucket per host, created on first use."""
+
+    def __init__(self, rate, capacity=None, host_rates=None):
+        self.rate = rate
+        self.capacity = capacity
+        self.host_rates = host_rates or {}
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def bucket(self, url_or_host):
+        host = urlparse(url_or_host).netloc or url_or_host
+        with self._lock:
+            if host not in self._buckets:
+                self._buckets[host] = TokenBucket(self.host_rates.get(host, self.rate), self.capacity)
+            return self._buckets[host]
+
+    def acquire(self, url_or_host, tokens=1):
+        self.bucket(url_or_host).acquire(tokens)
@@ -0,0 +1,129 @@
+import logging
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+PRICE_TYPES = ['ask', 'mid', 'live', 'bid', 'actual']
+BOOK_PRICE_TYPES = ('ask', 'mid', 'bid')
+
+
+def _to_float(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return np.nan
+
+
+def trade_side_keys(trade):
+    """The keys holding a strategy's legs, in the order the detail tables list them."""
+    if trade.get('method') == 'all_no':
+        return ['positions']
+    if trade.get('method') == 'balanced':
+        return ['side_a_trades', 'side_b_trades']
+    return []
+
+
+class ScenarioMatrix:
+    """
+    Price and size of every token under every price type (scenario).
+
+    Rows are tokens, columns are price types; missing prices are NaN. Each token's book is
+    read once to fill all the book-based columns.
+    """
+
+    def __init__(self, token_ids, price_types, prices, sizes):
+        self.token_ids = list(token_ids)
+        self.price_types = list(price_types)
+        self.prices = prices
+        self.sizes = sizes
+        self._rows = {token_id: row for row, token_id in enumerate(self.token_ids)}
+
+    def rows(self, token_ids):
+        """Row numbers of token_ids, or None if any token is not in the matrix."""
+        try:
+            return np.array([self._rows[token_id] for token_id in token_ids], dtype=np.intp)
+        except KeyError:
+            return None
+
+    def take(self, token_ids):
+        """Price rows for token_ids in that order, NaN for tokens not in the matrix."""
+        prices = np.full((len(token_ids), len(self.price_types)), np.nan)
+        for i, token_id in enumerate(token_ids):
+            row = self._rows.get(token_id)
+            if row is not None:
+                prices[i] = self.prices[row]
+        return prices
+
+    def to_frame(self):
+        return pd.DataFrame(self.prices, index=self.token_ids, columns=self.price_types)
+
+
+def build_scenario_matrix(tokens, get_book, price_types=PRICE_TYPES, get_live_price=None, actual_prices=None):
+    """
+    Build the token x price type matrix for a set of legs.
+
+    Args:
+        tokens (dict): token_id -> (slug, outcome).
+        get_book (callable): get_book(slug, outcome, token_id) -> order book or None.
+        price_types (list): Columns to fill.
+        get_live_price (callable): get_live_price(token_id, side) -> price, for 'live'.
+        actual_prices (dict): (slug, outcome) -> (price, size) of the user's latest trade, for 'actual'.
+    """
+    prices = np.full((len(tokens), len(price_types)), np.nan)
+    sizes = np.full((len(tokens), len(price_types)), np.nan)
+    book_columns = [(col, price_type) for col, price_type in enumerate(price_types) if price_type in BOOK_PRICE_TYPES]
+
+    for row, (token_id, (slug, outcome)) in enumerate(tokens.items()):
+        if book_columns:
+            book = get_book(slug, outcome, token_id)
+            if book is not None:
+                for col, price_type in book_columns:
+                    price, size = book.price_and_size(price_type)
+                    prices[row, col] = _to_float(price)
+                    sizes[row, col] = _to_float(size)
+
+        for col, price_type in enumerate(price_types):
+            if price_type == 'live' and get_live_price is not None:
+                prices[row, col] = _to_float(get_live_price(token_id, side='sell' if outcome.lower() == 'no' else 'buy'))
+            elif price_type == 'actual' and actual_prices is not None:
+                price, size = actual_prices.get((slug, outcome), (None, None))
+                prices[row, col] = _to_float(price)
+                sizes[row, col] = _to_float(size)
+
+    return ScenarioMatrix(tokens.keys(), price_types, prices, sizes)
+
+
+def strategy_details(trade, matrix, market_lookup):
+    """
+    Per price type detail tables (Slug, Side, Price, Size) for one strategy, from the matrix.
+
+    Legs without a price under a price type are left out of that table, and price types with
+    no priced legs are omitted.
+    """
+    legs = []
+    for key in trade_side_keys(trade):
+        for slug, outcome in trade.get(key, []):
+            rows = matrix.rows([market_lookup.token_id(slug, outcome)])
+            if rows is not None:
+                legs.append((f"{slug} ({outcome})", key, rows[0]))
+    if not legs:
+        return {}
+
+    labels, sides, rows = zip(*legs)
+    rows = np.array(rows, dtype=np.intp)
+    details = {}
+    for col, price_type in enumerate(matrix.price_types):
+        prices = matrix.prices[rows, col]
+        priced = ~np.isnan(prices)
+        if not priced.any():
+            continue
+        sizes = matrix.sizes[rows, col]
+        details[price_type] = pd.DataFrame({
+            'Slug': np.array(labels)[priced],
+            'Side': np.array(sides)[priced],
+            'Price': prices[priced],
+            'Size': [None if np.isnan(size) else size for size in sizes[priced]],
+        })
+    return details
@@ -0,0 +1,147 @@
+import logging
+
+import numpy as np
+
+from scenario_engine import trade_side_keys
+
+logger = logging.getLogger(__name__)
+
+
+class CompiledStrategies:
+    """
+    A strategy set compiled into a sparse strategy x token weight matrix.
+
+    The matrix is held in COO form: one entry per leg with its strategy row, token column and
+    weight (1 per share bought). Balanced arb is 1 - W @ p for every strategy at once. All-no
+    arb uses the grouped sum and max of its legs' prices, following the original formula.
+    `token_strategies` is the reverse index from a token to the strategies that hold it.
+
+    Strategies whose legs could not all be resolved to a token are kept with `resolved` False
+    and evaluate to NaN.
+    """
+
+    def __init__(self, trades, market_lookup):
+        self.trade_names = []
+        self.is_all_no = []
+        self.resolved = []
+        self.tokens = {}      # token_id -> (slug, outcome), in column order
+        leg_strategy, leg_token, leg_weight = [], [], []
+
+        columns = {}
+        for trade in trades:
+            keys = trade_side_keys(trade)
+            legs = [leg for key in keys for leg in trade.get(key, [])]
+            if not legs or (trade['method'] == 'balanced'
+                            and (not trade.get('side_a_trades') or not trade.get('side_b_trades'))):
+                logger.info(f"No positions found for trade: {trade['trade_name']}")
+                continue
+
+            row = len(self.trade_names)
+            resolved = True
+            for slug, outcome in legs:
+                token_id = market_lookup.token_id(slug, outcome)
+                if not token_id:
+                    logger.warning(f"Token ID not found for {slug} ({outcome}) in {trade['trade_name']}")
+                    resolved = False
+                    continue
+                if token_id not in columns:
+                    columns[token_id] = len(columns)
+                    self.tokens[token_id] = (slug, outcome)
+                leg_strategy.append(row)
+                leg_token.append(columns[token_id])
+                leg_weight.append(1.0)
+
+            self.trade_names.append(trade['trade_name'])
+            self.is_all_no.append(trade['method'] == 'all_no')
+            self.resolved.append(resolved)
+
+        self.token_ids = list(self.tokens)
+        self.is_all_no = np.array(self.is_all_no, dtype=bool)
+        self.resolved = np.array(self.resolved, dtype=bool)
+        self.leg_strategy = np.array(leg_strategy, dtype=np.intp)
+        self.leg_token = np.array(leg_token, dtype=np.intp)
+        self.leg_weight = np.array(leg_weight)
+        self.leg_count = np.bincount(self.leg_strategy, minlength=len(self.trade_names))
+        # Legs are stored strategy by strategy, so each strategy's legs are one slice
+        self.leg_offsets = np.concatenate([[0], np.cumsum(self.leg_count)])
+
+        # Reverse index: token_id -> rows of the strategies that hold it
+        order = np.lexsort((self.leg_strategy, self.leg_token))
+        tokens, strategies = self.leg_token[order], self.leg_strategy[order]
+        bounds = np.flatnonzero(np.diff(tokens)) + 1
+        self.token_strategies = {self.token_ids[group_tokens[0]]: np.unique(group_strategies)
+                                 for group_tokens, group_strategies in zip(np.split(tokens, bounds),
+                                                                           np.split(strategies, bounds))
+                                 if len(group_tokens)}
+
+    def __len__(self):
+        return len(self.trade_names)
+
+    def strategies_for(self, token_ids):
+        """Rows of every strategy holding any of token_ids."""
+        rows = [self.token_strategies[token_id] for token_id in token_ids if token_id in self.token_strategies]
+        return np.unique(np.concatenate(rows)) if rows else np.empty(0, dtype=np.intp)
+
+    def evaluate(self, prices, strategies=None):
+        """
+        Arb % of every strategy (or only the rows in `strategies`) under every price column.
+
+        Args:
+            prices (np.ndarray): tokens x price types, rows in `token_ids` order, NaN where missing.
+            strategies (np.ndarray): Optional strategy rows to evaluate.
+
+        Returns:
+            np.ndarray: strategies x price types of arb %, NaN where a leg has no price.
+        """
+        prices = np.asarray(prices, dtype=float)
+        if strategies is None:
+            legs = slice(None)
+            leg_strategy = self.leg_strategy
+            strategies = np.arange(len(self.trade_names))
+        else:
+            strategies = np.asarray(strategies, dtype=np.intp)
+            counts = self.leg_count[strategies]
+            starts = self.leg_offsets[strategies]
+            # Leg positions of the selected strategies, and each leg's position in the selection
+            leg_strategy = np.repeat(np.arange(len(strategies)), counts)
+            legs = np.repeat(starts - np.concatenate([[0], np.cumsum(counts)[:-1]]), counts) + np.arange(counts.sum())
+
+        n = len(strategies)
+        leg_prices = prices[self.leg_token[legs]] * self.leg_weight[legs][:, None]
+
+        missing = _grouped_sum(leg_strategy, np.isnan(leg_prices).astype(float), n) > 0
+        total_cost = _grouped_sum(leg_strategy, np.nan_to_num(leg_prices), n)
+
+        max_price = np.full((n, prices.shape[1]), -np.inf)
+        np.maximum.at(max_price, leg_strategy, np.nan_to_num(leg_prices, nan=-np.inf))
+
+        leg_count = self.leg_count[strategies][:, None]
+        with np.errstate(invalid='ignore'):
+            # sum(1 - p) - (1 - max_p) - max_p
+            all_no_arb = ((leg_count - total_cost) - (1 - max_price) - max_price) * 100
+            balanced_arb = np.where(total_cost > 0, (1 - total_cost) * 100, np.nan)
+
+        arb = np.where(self.is_all_no[strategies][:, None], all_no_arb, balanced_arb)
+        arb[missing | ~self.resolved[strategies][:, None]] = np.nan
+        return arb
+
+    def arbitrage_info(self, prices, price_types):
+        """evaluate() as {trade_name: {price_type: arb_pct}}."""
+        arb = self.evaluate(prices)
+        return {trade_name: dict(zip(price_types, row)) for trade_name, row in zip(self.trade_names, arb.tolist())}
+
+
+def _grouped_sum(groups, values, n):
+    """Sum of per-leg values for each of n groups, for every column of `values` (legs x k)."""
+    if not values.shape[1]:
+        return np.empty((n, 0))
+    return np.column_stack([np.bincount(groups, weights=values[:, col], minlength=n)
+                            for col in range(values.shape[1])])
+
+
+def compile_strategies(trades, market_lookup):
+    """Resolve every leg of a strategy set to a token once and compile the weight matrix."""
+    compiled = CompiledStrategies(trades, market_lookup)
+    logger.info(f"Compiled {len(compiled)} strategies over {len(compiled.token_ids)} tokens "
+                f"({len(compiled.leg_strategy)} legs)")
+    return compiled
@@ -0,0 +1,77 @@
+import logging
+import threading
+import time
+
+from get_user_trade_prices import refresh_user_trades
+
+logger = logging.getLogger(__name__)
+
+USER_TRADE_REFRESH_INTERVAL = 600  # Seconds between user trade refreshes
+
+# Refreshers running in this process, keyed by user ID
+_refreshers = {}
+_refreshers_lock = threading.Lock()
+
+
+class UserTradeRefresher:
+    """
+    Refreshes a user's enriched trades on a background thread, every `interval` seconds.
+
+    The enriched parquet is replaced atomically when a refresh completes, so readers such as
+    the position provider always see the latest completed snapshot and never wait on a refresh.
+    """
+
+    def __init__(self, user_id, strategies_file="./data/strategies.py", interval=USER_TRADE_REFRESH_INTERVAL):
+        self.user_id = user_id
+        self.strategies_file = strategies_file
+        self.interval = interval
+        self.last_completed = None
+        self.last_error = None
+        self.refreshes = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        if not self.running:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name=f'user-trades-{self.user_id}', daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+
+    def refresh(self):
+        """Run one refresh in the calling thread."""
+        started = time.time()
+        try:
+            if refresh_user_trades(self.user_id, self.strategies_file):
+                self.last_completed = time.time()
+                self.last_error = None
+                self.refreshes += 1
+                logger.info(f"User trades for {self.user_id} refreshed in {self.last_completed - started:.1f}s")
+            else:
+                self.last_error = "refresh failed"
+        except Exception as e:
+            self.last_error = str(e)
+            logger.error(f"Error refreshing user trades for {self.user_id}: {e}", exc_info=True)
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.refresh()
+            self._stop.wait(self.interval)
+
+
+def start_user_trade_refresh(user_id, strategies_file="./data/strategies.py", interval=USER_TRADE_REFRESH_INTERVAL):
+    """Start (once per process) the background refresh of a user's trades and return its refresher."""
+    with _refreshers_lock:
+        refresher = _refreshers.get(user_id)
+        if refresher is None:
+            refresher = _refreshers[user_id] = UserTradeRefresher(user_id, strategies_file, interval)
+    return refresher.start()
@@ -0,0 +1,161 @@
+import argparse
+import itertools
+import logging
+import multiprocessing
+import os
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+from dotenv import load_dotenv
+
+from get_polygon_data import (enrich_wallet_transfers, fetch_wallet_addresses, fetch_wallet_transfers,
+                              load_market_lookup, save_wallet_data)
+from http_client import get_http_client
+from polygonscan_cache import fetch_data, set_replay
+from rate_limit import TokenBucket
+from wallet_sync import WalletCheckpoints
+
+logger = logging.getLogger(__name__)
+
+POLYGONSCAN_REQUESTS_PER_SECOND = 5  # Polygonscan's per-key call rate limit
+MAX_WALLET_WORKERS = 8  # Wallets fetched at once
+MARKET_LOOKUP_PATH = './data/market_lookup.json'
+
+
+def load_api_keys():
+    """Polygonscan API keys from POLYGONSCAN_API_KEYS (comma separated) or POLYGONSCAN_API_KEY."""
+    load_dotenv("keys.env")
+    keys = [key.strip() for key in os.getenv('POLYGONSCAN_API_KEYS', '').split(',') if key.strip()]
+    if not keys and os.getenv('POLYGONSCAN_API_KEY'):
+        keys = [os.getenv('POLYGONSCAN_API_KEY')]
+    return keys
+
+
+def with_api_key(url, api_key):
+    """The URL with its apikey query parameter set to api_key."""
+    parts = urlsplit(url)
+    query = [(name, value) for name, value in parse_qsl(parts.query, keep_blank_values=True) if name != 'apikey']
+    query.append(('apikey', api_key))
+    return urlunsplit(parts._replace(query=urlencode(query)))
+
+
+class ApiKeyPool:
+    """
+    Polygonscan API keys, each limited to its own per-key request rate.
+
+    Every request takes a token from the next key with one available (round robin), waiting on a
+    key only when all of them are exhausted, so N keys give N times the throughput of one.
+    """
+
+    def __init__(self, api_keys, rate=POLYGONSCAN_REQUESTS_PER_SECOND):
+        if not api_keys:
+            raise ValueError("At least one Polygonscan API key is required")
+        self.api_keys = list(api_keys)
+        self._buckets = [TokenBucket(rate) for _ in self.api_keys]
+        self._next = itertools.count()
+
+    def acquire(self):
+        """Take a request token and return the key it belongs to."""
+        start = next(self._next)
+        for i in range(len(self.api_keys)):
+            index = (start + i) % len(self.api_keys)
+            if self._buckets[index].try_acquire():
+                return self.api_keys[index]
+        index = start % len(self.api_keys)
+        self._buckets[index].acquire()
+        return self.api_keys[index]
+
+    def fetch_data(self, url):
+        """
+        Drop-in for polygonscan_cache.fetch_data that waits for a key and signs the URL with it.
+
+        Cached responses are returned without using any key's quota.
+        """
+        return fetch_data(
+            url, lambda request_url: get_http_client().get_json(with_api_key(request_url, self.acquire())))
+
+
+def ingest_wallets(wallet_addresses, api_keys=None, plot=False, latest_price_mode=False, incremental=True,
+                   max_workers=MAX_WALLET_WORKERS, processes=None):
+    """
+    Refresh many wallets concurrently.
+
+    Wallet transfers are fetched on a thread pool under the API key pool's rate limits; each
+    fetched wallet is enriched in a process pool while other wallets are still downloading, and
+    saved (P&L marking, parquet, checkpoints, plots) as soon as its enrichment finishes.
+
+    Args:
+        api_keys (list): Polygonscan API keys (default: load_api_keys()).
+        incremental (bool): Only fetch transfers since each wallet's last sync.
+        max_workers (int): Wallets fetched at once.
+        processes (int): Enrichment worker processes (default: CPU count).
+
+    Returns:
+        list: The wallet addresses whose transactions were saved.
+    """
+    key_pool = ApiKeyPool(api_keys or load_api_keys())
+    market_lookup = load_market_lookup(MARKET_LOOKUP_PATH)
+    checkpoints = WalletCheckpoints()
+    refreshed = []
+
+    # Spawn rather than fork: this process already runs fetch and price threads
+    with ThreadPoolExecutor(max_workers=max_workers) as threads, \
+            ProcessPoolExecutor(max_workers=processes, mp_context=multiprocessing.get_context('spawn')) as cpu:
+        fetches = {threads.submit(fetch_wallet_transfers, wallet_address, key_pool.api_keys[0], checkpoints,
+                                  incremental, key_pool.fetch_data): wallet_address
+                   for wallet_address in dict.fromkeys(wallet_addresses)}
+        enrichments = {}
+        pending = set(fetches)
+
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                # Look the wallet up before anything can raise, so errors are logged against it
+                wallet_address = fetches[future] if future in fetches else enrichments[future]['wallet_address']
+                try:
+                    if future in fetches:
+                        fetched = future.result()
+                        if fetched is None:
+                            continue
+                        if fetched['erc1155_df'] is None:
+                            if save_wallet_data(fetched, None, market_lookup, checkpoints, plot, latest_price_mode):
+                                refreshed.append(wallet_address)
+                            continue
+                        enrichment = cpu.submit(enrich_wallet_transfers, fetched['erc20_df'], fetched['erc1155_df'],
+                                                wallet_address, MARKET_LOOKUP_PATH)
+                        enrichments[enrichment] = fetched
+                        pending.add(enrichment)
+                    else:
+                        fetched = enrichments.pop(future)
+                        if save_wallet_data(fetched, future.result(), market_lookup, checkpoints, plot,
+                                            latest_price_mode):
+                            refreshed.append(wallet_address)
+                except Exception as e:
+                    logger.error(f"Error refreshing wallet {wallet_address}: {e}", exc_info=True)
+
+    logger.info(f"Refreshed {len(refreshed)} of {len(fetches)} wallets")
+    return refreshed
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    parser = argparse.ArgumentParser(description='Refresh many wallets concurrently under Polygonscan rate limits.')
+    parser.add_argument('--wallets', nargs='+', help='Wallet addresses to refresh.')
+    parser.add_argument('--skip-leaderboard', action='store_true', help='Skip leaderboard fetching.')
+    parser.add_argument('--top-volume', action='store_true', help='Fetch top volume users.')
+    parser.add_argument('--top-profit', action='store_true', help='Fetch top profit users.')
+    parser.add_argument('--plot', action='store_true', help='Generate plots for each wallet.')
+    parser.add_argument('--full', action='store_true', help='Fetch full histories instead of syncing incrementally.')
+    parser.add_argument('--workers', type=int, default=MAX_WALLET_WORKERS, help='Wallets fetched at once.')
+    parser.add_argument('--processes', type=int, default=None, help='Enrichment worker processes.')
+    parser.add_argument('--replay', action='store_true',
+                        help='Serve Polygonscan requests only from the response cache (offline runs).')
+    args = parser.parse_args()
+
+    if args.replay:
+        set_replay()
+
+    wallets = args.wallets or fetch_wallet_addresses(args.skip_leaderboard, args.top_volume, args.top_profit)
+    ingest_wallets(wallets, plot=args.plot, incremental=not args.full, max_workers=args.workers,
+                   processes=args.processes)
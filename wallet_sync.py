@@ -0,0 +1,97 @@
+import json
+import logging
+import os
+import threading
+
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+SYNC_CHECKPOINTS_PATH = './data/user_trades/sync_checkpoints.json'
+SYNC_ACTIONS = ('tokentx', 'token1155tx')  # Polygonscan actions for ERC-20 and ERC-1155 transfers
+REORG_OVERLAP_BLOCKS = 200  # Blocks re-fetched below the checkpoint in case recent ones were reorganised
+
+
+class WalletCheckpoints:
+    """
+    Highest block synced per wallet and Polygonscan action, persisted as JSON.
+
+    Each action's sync restarts REORG_OVERLAP_BLOCKS below its own checkpoint, so transfers in
+    recently reorganised blocks are fetched again and replace the stored ones.
+    """
+
+    def __init__(self, path=SYNC_CHECKPOINTS_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._checkpoints = {}
+        if os.path.exists(path):
+            try:
+                with open(path, 'r') as f:
+                    self._checkpoints = json.load(f)
+            except (OSError, ValueError) as e:
+                logger.error(f"Error loading sync checkpoints from {path}, starting a full sync: {e}")
+
+    def last_block(self, wallet_address, action):
+        return self._checkpoints.get(wallet_address.lower(), {}).get(action)
+
+    def start_block(self, wallet_address, action, overlap=REORG_OVERLAP_BLOCKS):
+        """First block of an action to fetch for a wallet: 0 if the action has no checkpoint."""
+        block = self.last_block(wallet_address, action)
+        return 0 if block is None else max(0, block - overlap)
+
+    def start_blocks(self, wallet_address, actions=SYNC_ACTIONS, overlap=REORG_OVERLAP_BLOCKS):
+        """{action: first block to fetch} for a wallet."""
+        return {action: self.start_block(wallet_address, action, overlap) for action in actions}
+
+    def update(self, wallet_address, blocks):
+        """Record {action: highest block seen} for a wallet and save the checkpoints file."""
+        blocks = {action: int(block) for action, block in blocks.items() if block is not None}
+        if not blocks:
+            return
+        with self._lock:
+            wallet = self._checkpoints.setdefault(wallet_address.lower(), {})
+            for action, block in blocks.items():
+                wallet[action] = max(block, wallet.get(action, 0))
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            with open(f'{self.path}.tmp', 'w') as f:
+                json.dump(self._checkpoints, f, indent=4)
+            os.replace(f'{self.path}.tmp', self.path)
+
+    def reset(self, wallet_address):
+        """Forget a wallet's checkpoints so its next sync fetches the full history."""
+        with self._lock:
+            self._checkpoints.pop(wallet_address.lower(), None)
+
+
+def highest_block(df, column='blockNumber'):
+    """Highest block number in a Polygonscan transfer frame, or None if it is empty."""
+    if df is None or df.empty or column not in df.columns:
+        return None
+    block = pd.to_numeric(df[column], errors='coerce').max()
+    return None if pd.isna(block) else int(block)
+
+
+def load_enriched_transactions(path):
+    """A wallet's stored enriched transactions, or None if there are none yet."""
+    if not os.path.exists(path):
+        return None
+    try:
+        return pd.read_parquet(path)
+    except Exception as e:
+        logger.error(f"Failed to read enriched transactions from {path}, starting a full sync: {e}")
+        return None
+
+
+def merge_new_transfers(stored_df, new_df, start_block, block_column='blockNumber_erc1155'):
+    """
+    Append newly synced enriched rows to the stored ones.
+
+    Stored rows from start_block onwards were fetched again (the reorg overlap), so they are
+    replaced by the new rows rather than duplicated. start_block is the highest of the actions'
+    start blocks: below it, a row's other action was not fetched again, so the stored row is
+    the complete one and new rows there are dropped.
+    """
+    refetched = pd.to_numeric(stored_df[block_column], errors='coerce') >= start_block
+    new_df = new_df[pd.to_numeric(new_df[block_column], errors='coerce') >= start_block]
+    logger.info(f"Replacing {int(refetched.sum())} stored rows from block {start_block} with {len(new_df)} synced rows")
+    return pd.concat([stored_df[~refetched], new_df], ignore_index=True)